@@ -1,36 +1,82 @@
 # Copyright (c) 2020 All Rights Reserved
 # Author: William H. Guss, Brandon Houghton
-import copy
 import logging
-import os
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, Sequence, Tuple, Union
 
 from lxml import etree
-import json
 import numpy as np
 from minerl.env._multiagent import _MultiAgentEnv
 from minerl.env._singleagent import _SingleAgentEnv
-from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.env.payloads import HeroPayloadGenerator
+from minerl.herobraine.wrapper import EnvWrapper
 
 logger = logging.getLogger(__name__)
 
+StatTrajectory = Union[Callable[[int], Any], Sequence[Any]]
+
 
 class _FakeEnvMixin(object):
     """A fake environment for unit testing.
 
-    Uses the info from a single agent environment.
+    Serves the no-op observation of any env spec with one of a few cached random POV frames, without a
+    Minecraft instance. The frames are encoded once and decoded by the handlers without copies, so the
+    observed POV is read-only.
+
+    Stats can be scripted with trajectories keyed by their observation path, e.g.::
+
+        env = gym.make('MineRLPunchCow-v0', fake=True, fake_stats={
+            'damage_dealt': lambda tick: 2 * tick,
+            'mob_kills': [0] * 20 + [1],
+        })
+
+    A trajectory is either a function of the tick (0 on reset, incremented by every step) or a sequence
+    indexed by the tick, which holds its last value once exhausted.
+
+    Args:
+        fake_stats (Dict[str, StatTrajectory], optional): The scripted stat trajectories. Groups of a single
+            observation can be addressed by their own name (``'mob_kills'`` for ``'mob_kills/mob_kills'``).
+        fake_episode_length (int, optional): The number of steps after which the episode is done.
+        fake_seed (int, optional): Seeds the POV frames.
     """
 
-    def __init__(self, *args, **kwargs):
-        super(_FakeEnvMixin, self).__init__(*args, **kwargs)
+    NUM_FAKE_FRAMES = 8
 
-        # This NPZ was generated by navigate.
-        # TODO: Make github issue for expanding pre_recored envs.
-        # TODO: Fake envs should use env.sample and pre_recorded envs should feature real sampled data!
-        # TODO: Move fake environments.
-        self._fake_malmo_data = np.load(
-            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'info.npz'),
-            allow_pickle=True)['arr_0'].tolist()
+    def __init__(self, *args, fake_stats: Dict[str, StatTrajectory] = None, fake_episode_length: int = None,
+                 fake_seed: int = None, **kwargs):
+        super(_FakeEnvMixin, self).__init__(*args, **kwargs)
+        self._fake_episode_length = fake_episode_length
+        self._fake_tick = 0
+
+        bottom_env_spec = self.task
+        while isinstance(bottom_env_spec, EnvWrapper):
+            bottom_env_spec = bottom_env_spec.env_to_wrap
+        self._fake_generator = HeroPayloadGenerator.from_env_spec(bottom_env_spec)
+
+        frames = [None]
+        pov_handler = self._fake_generator.pov_handler
+        if pov_handler is not None:
+            rng = np.random.RandomState(fake_seed)
+            frames = [rng.randint(0, 256, size=pov_handler.raw_shape, dtype=np.uint8)
+                      for _ in range(self.NUM_FAKE_FRAMES)]
+
+        # The info dicts are built once; steps only replace the scripted stats along their paths.
+        monitor_generator = HeroPayloadGenerator(self.task.monitors)
+        self._fake_payloads = []
+        for frame in frames:
+            pov, info = self._fake_generator.payload(self._fake_generator.no_op(frame))
+            monitor_generator.payload(monitor_generator.no_op(), info)
+            frame = np.frombuffer(pov, dtype=np.uint8)
+            frame.setflags(write=False)
+            info['pov'] = frame
+            self._fake_payloads.append(info)
+
+        paths = self._fake_generator.hero_paths()
+        self._fake_stats = []
+        for name, trajectory in (fake_stats or {}).items():
+            if name not in paths:
+                raise ValueError("Cannot script {}; the scriptable stats of {} are {}.".format(
+                    name, bottom_env_spec.name, sorted(paths)))
+            self._fake_stats.append((paths[name], trajectory))
 
     def _setup_instances(self) -> None:
         self.instances = [NotImplemented for _ in range(self.task.agent_count)]
@@ -43,40 +89,64 @@ class _FakeEnvMixin(object):
     def _TO_MOVE_find_ip_and_port(self, _, token_in: str) -> Tuple[str, str]:
         return "1", "1"
 
+    def close(self):
+        # Fake envs have no instances to disconnect from or kill.
+        self.instances = []
+        super().close()
+
+    def reset(self) -> Any:
+        self._fake_tick = 0
+        return super().reset()
+
     def _peek_obs(self) -> Dict[str, Any]:
         r, _ = self._get_fake_obs()
         return r
 
     def step(self, action) -> Tuple[
         Dict[str, Dict[str, Any]], Dict[str, float], Dict[str, bool], Dict[str, Dict[str, Any]]]:
-        fobs, monitor = self._get_fake_obs()
-        done = False
-        reward = {a: 0.0 for a in self.task.agent_names}
+        if self.done:
+            raise RuntimeError("Attempted to step an environment server with done=True")
         for actor_name in self.task.agent_names:
-            cmd = self._process_action(actor_name, action[actor_name])
-        # TODO: Abstract the malmo communication out of the step function.p
+            self._process_action(actor_name, action[actor_name])
+        done = False
+        for _ in range(self.action_repeat):
+            self._fake_tick += 1
+            done = self._fake_episode_length is not None and self._fake_tick >= self._fake_episode_length
+            if done:
+                break
+        self._episode_steps += 1
+        self.done = done
 
+        fobs, monitor = self._get_fake_obs()
+        reward = {a: 0.0 for a in self.task.agent_names}
         return fobs, reward, done, monitor
 
-    def _get_fake_obs(self) -> Dict[str, Any]:
-
+    def _get_fake_obs(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         obs = {}
         info = {}
+        payload = self._get_fake_payload()
         for agent in self.task.agent_names:
-            malmo_data = self._get_fake_malmo_data()
-            pov = malmo_data['pov']
-            del malmo_data['pov']
-            pov = pov[::-1, :, :]
-            _json_info = json.dumps(malmo_data)
-
-            obs[agent], info[agent] = self._process_observation(agent, pov, _json_info)
-        # TODO: UPDATE INFO FOR MONITORS!
+            obs[agent], info[agent] = self._process_hero_observation(agent, payload)
         return obs, info
 
-    def _get_fake_malmo_data(self) -> Dict[str, Any]:
-        assert isinstance(self.task, Navigate), (
-            "the data for fake environments was generated by Navigate")
-        return copy.deepcopy(self._fake_malmo_data)
+    def _get_fake_payload(self) -> Dict[str, Any]:
+        payload = self._fake_payloads[self._fake_tick % len(self._fake_payloads)]
+        if not self._fake_stats:
+            return payload
+
+        payload = dict(payload)
+        for keys, trajectory in self._fake_stats:
+            if callable(trajectory):
+                value = trajectory(self._fake_tick)
+            else:
+                value = trajectory[min(self._fake_tick, len(trajectory) - 1)]
+            # Copy the dicts along the path so the cached payload is left untouched.
+            d = payload
+            for key in keys[:-1]:
+                d[key] = dict(d.get(key, {}))
+                d = d[key]
+            d[keys[-1]] = value
+        return payload
 
 
 class _FakeMultiAgentEnv(_FakeEnvMixin, _MultiAgentEnv):
@@ -4,7 +4,6 @@ import traceback
 from copy import deepcopy
 import json
 import logging
-from minerl.env.comms import retry
 from minerl.env.exceptions import MissionInitException
 import os
 from minerl.herobraine.wrapper import EnvWrapper
@@ -16,12 +15,14 @@ import gym
 import socket
 import time
 from lxml import etree
-from minerl.env import comms
+from minerl.env import broker, comms, events
+from minerl.env.events import EventType
 import xmltodict
 from concurrent.futures import ThreadPoolExecutor
 import cv2
 
 from minerl.herobraine.env_spec import EnvSpec
+from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 NS = "{http://ProjectMalmo.microsoft.com}"
@@ -69,6 +70,7 @@ class _MultiAgentEnv(gym.Env):
                  verbose: bool = False,
                  _xml_mutator_to_be_deprecated: Optional[Callable] = None,
                  refresh_instances_every: Optional[int] = None,
+                 action_repeat: int = 1,
                  ):
         """
         Constructor of MineRLEnv.
@@ -80,8 +82,14 @@ class _MultiAgentEnv(gym.Env):
         :param _xml_mutator_to_be_deprecated: A function which mutates the mission XML when called.
         :param refresh_instances_every: As a band-aid to memory leaks, completely kill and rebuild the instances every
            N setups.
+        :param action_repeat: Repeat every action for this many ticks. Only the observation of the last tick is
+           decoded; the POV and info of the ticks before are read and dropped, and their Malmo rewards summed.
+           The full stats are cumulative, so rewards computed from them (e.g. by the combat envs) see every tick.
         """
+        assert action_repeat >= 1, "Actions must be repeated for at least one tick."
+        self.action_repeat = action_repeat
         self.task = env_spec
+        self._cached_handler_tables = None
         self.instances = instances if instances is not None else []  # type: List[MinecraftInstance]
 
         # TO DEPRECATE (FOR ENV_SPECS)
@@ -123,6 +131,13 @@ class _MultiAgentEnv(gym.Env):
         self._is_fault_tolerant = is_fault_tolerant
         self._last_obs = {}
         self._already_closed = False
+        self._episode_start = None
+        self._episode_steps = 0
+        self._reconnect_attempts = 4
+        self._reconnect_backoff = 0.5
+        self._reconnect_max_delay = 8
+        self._restart_episode_on_failure = False
+        self._fault_injector = None
 
     def _init_logging(self, verbose: bool) -> None:
         if verbose:
@@ -199,6 +214,38 @@ class _MultiAgentEnv(gym.Env):
 
         # TODO: TEST
 
+    def configure_fault_tolerance(self, reconnect_attempts=None, backoff=None, max_delay=None,
+                                  restart_episode=None):
+        """Configures how the environment recovers when communication with an instance fails during a step.
+
+        On a failure the environment first tries to reconnect to its instances, pausing with bounded exponential
+        backoff between attempts, and replaces every instance it cannot reconnect to with a new one from the
+        instance manager. The step then reports the failure in `info['error']`, a dict containing the `cause`,
+        the `recovery_time` in seconds and whether the instances were `recovered`.
+
+        Args:
+            reconnect_attempts (int, optional): The number of connection attempts before an instance is replaced.
+            backoff (float, optional): The pause before the second attempt; every following pause doubles.
+            max_delay (float, optional): The longest pause between two attempts.
+            restart_episode (bool, optional): If true the step restarts the episode and returns its first
+                observation with done=False. Otherwise (the default) the step returns the last observation with
+                done=True, leaving warm instances for the next reset.
+        """
+        if reconnect_attempts is not None:
+            assert reconnect_attempts > 0, "At least one connection attempt is needed."
+            self._reconnect_attempts = reconnect_attempts
+        if backoff is not None:
+            self._reconnect_backoff = backoff
+        if max_delay is not None:
+            self._reconnect_max_delay = max_delay
+        if restart_episode is not None:
+            self._restart_episode_on_failure = restart_episode
+
+    def set_fault_injector(self, injector):
+        """Sets a callable (e.g. a minerl.env.faults.FaultInjector) which is called with an injection point and
+        an instance before the environment communicates with the instance, and may raise socket errors."""
+        self._fault_injector = injector
+
     ########## STEP METHOD ###########
 
     def _process_observation(self, actor_name, pov, info) -> Dict[str, Any]:
@@ -211,27 +258,32 @@ class _MultiAgentEnv(gym.Env):
             info = {}
 
         info['pov'] = pov
+        return self._process_hero_observation(actor_name, info)
 
-        bottom_env_spec = self.task
-        while isinstance(bottom_env_spec, EnvWrapper):
-            bottom_env_spec = bottom_env_spec.env_to_wrap
+    def _process_hero_observation(self, actor_name, info) -> Dict[str, Any]:
+        """
+        Process an already decoded info dict (with its POV under 'pov') into the proper dict space.
+        """
+        observables, _, monitors = self._handler_tables()
 
         # Process all of the observations using handlers.
         obs_dict = {}
         monitor_dict = {}
-        for h in bottom_env_spec.observables:
-            obs_dict[h.to_string()] = h.from_hero(info)
+        for name, h in observables:
+            obs_dict[name] = h.from_hero(info)
 
         # Now we wrap
         if isinstance(self.task, EnvWrapper):
             obs_dict = self.task.wrap_observation(obs_dict)
 
-        self._last_pov[actor_name] = obs_dict['pov']
+        # State-only env specs observe no POV.
+        if 'pov' in obs_dict:
+            self._last_pov[actor_name] = obs_dict['pov']
         self._last_obs[actor_name] = obs_dict
 
         # Process all of the monotors (aux info) using THIS env spec.
-        for m in self.task.monitors:
-            monitor_dict[m.to_string()] = m.from_hero(info)
+        for name, m in monitors:
+            monitor_dict[name] = m.from_hero(info)
 
         return obs_dict, monitor_dict
 
@@ -240,32 +292,41 @@ class _MultiAgentEnv(gym.Env):
         Process the actions into a proper command.
         """
         self._last_ac[actor_name] = action_in
-        action_in = deepcopy(action_in)
 
         # TODO(wguss): Clean up the envSpec wrapper paradigm,
         # the env shouldn't be doing this IMO.
         # TODO (R): Make wrappers compatible with mutliple agents.
         if isinstance(self.task, EnvWrapper):
-            action_in = self.task.unwrap_action(action_in)
-
-        bottom_env_spec = self.task
-        while isinstance(bottom_env_spec, EnvWrapper):
-            bottom_env_spec = bottom_env_spec.env_to_wrap
-
-        act_space = bottom_env_spec.action_space[actor_name] if self.task.agent_count > 1 else (
-            bottom_env_spec.action_space
-        )
+            # Unwrapping may modify the action in place; the handlers below only read it.
+            action_in = self.task.unwrap_action(deepcopy(action_in))
 
         # TODO this will be fixed when moved into env spec
         # assert self._check_action(actor_name, action_in, bottom_env_spec)
 
         action_str = []
-        for h in bottom_env_spec.actionables:
-            if h.to_string() in action_in:
-                action_str.append(h.to_hero(action_in[h.to_string()]))
+        for name, h in self._handler_tables()[1]:
+            if name in action_in:
+                action_str.append(h.to_hero(action_in[name]))
 
         return "\n".join(action_str)
 
+    def _handler_tables(self) -> Tuple[Tuple[Tuple[str, Any], ...], ...]:
+        """The observables and actionables of the bottom env spec and the monitors of the task, each as
+        (to_string(), handler) pairs.
+
+        The tables are built once and again only when the env spec is reset with new handlers.
+        """
+        bottom_env_spec = self.task
+        while isinstance(bottom_env_spec, EnvWrapper):
+            bottom_env_spec = bottom_env_spec.env_to_wrap
+        handlers = (bottom_env_spec.observables, bottom_env_spec.actionables, self.task.monitors)
+
+        cached = self._cached_handler_tables
+        if cached is None or any(a is not b for a, b in zip(cached[0], handlers)):
+            tables = tuple(tuple((h.to_string(), h) for h in hs) for hs in handlers)
+            self._cached_handler_tables = cached = (handlers, tables)
+        return cached[1]
+
     def _check_action(self, actor_name, action, env_spec):
         # TODO (R): Move this to env_spec in some reasonable way.
         return action in env_spec.action_space[actor_name]
@@ -276,99 +337,96 @@ class _MultiAgentEnv(gym.Env):
             assert STEP_OPTIONS == 0 or STEP_OPTIONS == 2
 
             multi_obs = {}
-            multi_reward = {}
+            multi_reward = {actor_name: 0.0 for actor_name in self.task.agent_names}
             everyone_is_done = True
             multi_monitor = {}
 
-            # TODO (R): Randomly iterate over this.
-            # Process multi-agent actions, apply and process multi-agent observations
-            for role, (actor_name, instance) in enumerate(zip(self.task.agent_names, self.instances)):
-                try:  # TODO - we could wrap entire function in try, if sockets don't need to individually clean
-
-                    if not self.has_finished[actor_name]:
-                        malmo_command = self._process_action(actor_name, actions[actor_name])
-                        step_message = "<StepClient" + str(STEP_OPTIONS) + ">" + \
-                                       malmo_command + \
-                                       "</StepClient" + str(STEP_OPTIONS) + " >"
-
-                        # Send Actions.
-                        comms.send_message(instance.client_socket, step_message.encode())
-
-                        # Receive the observation.
-                        obs = comms.recv_message(instance.client_socket)
-
-                        # Receive reward done and sent.
-                        reply = comms.recv_message(instance.client_socket)
-                        reward, done, sent = struct.unpack("!dbb", reply)
-                        # TODO: REFACTOR TO USE REWARD HANDLERS INSTEAD OF MALMO REWARD.
-                        done = (done == 1)
-                        if done:
-                            logger.info("Agent {} has finished".format(actor_name))
-
-                        self.has_finished[actor_name] = self.has_finished[actor_name] or done
-
-                        # Receive info from the environment.
-                        _malmo_json = comms.recv_message(instance.client_socket).decode("utf-8")
-
-                        # Process the observation and done state.
-                        out_obs, monitor = self._process_observation(actor_name, obs, _malmo_json)
-                    else:
-                        # IF THIS PARTICULAR AGENT IS DONE THEN:
-                        reward = 0.0
-                        out_obs = self._last_obs[actor_name]
-                        done = True
-                        monitor = {}
-
-                    # concatenate multi-agent obs, rew, done
-                    multi_obs[actor_name] = out_obs
-                    multi_reward[actor_name] = reward
-                    everyone_is_done = everyone_is_done and done
-                    multi_monitor[actor_name] = monitor
+            step_messages = {}
+            # The last (POV, info) payload of every agent. With action repeat the payloads of the intermediate
+            # ticks are read off the socket and dropped; only the last one is decoded.
+            payloads = {}
+            for _ in range(self.action_repeat):
+                everyone_is_done = True
+                # TODO (R): Randomly iterate over this.
+                # Process multi-agent actions, apply and process multi-agent observations
+                for role, (actor_name, instance) in enumerate(zip(self.task.agent_names, self.instances)):
+                    try:  # TODO - we could wrap entire function in try, if sockets don't need to individually clean
+
+                        if not self.has_finished[actor_name]:
+                            self._inject_fault('step', instance)
+                            if actor_name not in step_messages:
+                                malmo_command = self._process_action(actor_name, actions[actor_name])
+                                step_messages[actor_name] = (
+                                    "<StepClient" + str(STEP_OPTIONS) + ">" +
+                                    malmo_command +
+                                    "</StepClient" + str(STEP_OPTIONS) + " >").encode()
+
+                            # Send Actions.
+                            comms.send_message(instance.client_socket, step_messages[actor_name])
+
+                            # Receive the observation.
+                            obs = comms.recv_message(instance.client_socket)
+
+                            # Receive reward done and sent.
+                            reply = comms.recv_message(instance.client_socket)
+                            reward, done, sent = struct.unpack("!dbb", reply)
+                            # TODO: REFACTOR TO USE REWARD HANDLERS INSTEAD OF MALMO REWARD.
+                            done = (done == 1)
+                            if done:
+                                logger.info("Agent {} has finished".format(actor_name))
+
+                            self.has_finished[actor_name] = self.has_finished[actor_name] or done
+                            multi_reward[actor_name] += reward
+
+                            # Receive info from the environment.
+                            payloads[actor_name] = (obs, comms.recv_message(instance.client_socket))
+                        else:
+                            # IF THIS PARTICULAR AGENT IS DONE THEN:
+                            done = True
+
+                        everyone_is_done = everyone_is_done and done
+                    except (socket.timeout, socket.error, TypeError) as e:
+                        # If the socket times out some how! We need to recover the instances.
+                        return self._handle_step_failure(e, instance, 'step', actions, multi_reward)
+
+                # STEP THE SERVER!
+                instance = self.instances[0]
+                try:
+                    self._inject_fault('step_server', instance)
+                    step_message = "<StepServer></StepServer>"
+
+                    # Send Actions.
+                    comms.send_message(instance.client_socket, step_message.encode())
+
                 except (socket.timeout, socket.error, TypeError) as e:
-                    # If the socket times out some how! We need to catch this and reset the environment.
-                    # TODO this is not implemented
-                    self._clean_connection()
-                    self.done = True
-                    logger.error(
-                        f"Failed to take a step (error {e}). Terminating episode and sending random observation, be aware. "
-                        "To account for this failure case in your code check to see if `'error' in info` where info is "
-                        "the info dictionary returned by the step function."
-                    )
-                    logger.error(traceback.format_exc())
-                    return (
-                        {agent: self.observation_space.sample() for agent in actions},
-                        {agent: 0 for agent in actions},
-                        self.done,
-                        {agent: {"error": "Connection timed out!"} for agent in actions},
-                    )
+                    # If the socket times out some how! We need to recover the instances.
+                    return self._handle_step_failure(e, instance, 'step_server', actions, multi_reward)
+
+                # synchronize with real time
+                if self._is_real_time:
+                    t0 = time.time()
+                    # Todo: Add catch-up
+                    time.sleep(max(0, TICK_LENGTH - (t0 - self._last_step_time)))
+                    self._last_step_time = time.time()
+
+                if everyone_is_done:
+                    break
+
+            for actor_name in self.task.agent_names:
+                if actor_name in payloads:
+                    # Process the observation and done state.
+                    pov, info = payloads[actor_name]
+                    multi_obs[actor_name], multi_monitor[actor_name] = self._process_observation(
+                        actor_name, pov, info)
+                else:
+                    multi_obs[actor_name] = self._last_obs[actor_name]
+                    multi_monitor[actor_name] = {}
 
             # this will currently only consider the env done when all agents report done individually
             self.done = everyone_is_done
-
-            # STEP THE SERVER!
-            instance = self.instances[0]
-            try:
-                step_message = "<StepServer></StepServer>"
-
-                # Send Actions.
-                comms.send_message(instance.client_socket, step_message.encode())
-
-            except (socket.timeout, socket.error, TypeError) as e:
-                # If the socket times out some how! We need to catch this and reset the environment.
-                self._TO_MOVE_clean_connection()
-                self.done = True
-                logger.error(
-                    "Failed to take a step (timeout or error). Terminating episode and sending random observation, be aware. "
-                    "To account for this failure case in your code check to see if `'error' in info` where info is "
-                    "the info dictionary returned by the step function.")
-                # return self.observation_space.sample(), 0, self.done, {"error": "Connection timed out!"}
-
-            # synchronize with real time
-            if self._is_real_time:
-                t0 = time.time()
-                # Todo: Add catch-up
-                time.sleep(max(0, TICK_LENGTH - (t0 - self._last_step_time)))
-                self._last_step_time = time.time()
+            self._episode_steps += 1
+            if self.done:
+                self._publish_mission_ended()
         else:
             raise RuntimeError("Attempted to step an environment server with done=True")
 
@@ -403,12 +461,20 @@ class _MultiAgentEnv(gym.Env):
         assert len(self.task.agent_names) == 1, "Render only supports single agent for now."
         if mode == 'human':
             obs = self._last_obs[self.task.agent_names[0]]
-            pov = obs["pov"]
-            cv2.imshow("MineRL Render", pov[:, :, ::-1])
-            cv2.waitKey(1)
+            pov_handler = self._pov_handler()
+            if pov_handler is not None:
+                pov = pov_handler.image(obs["pov"])
+                cv2.imshow("MineRL Render", pov[:, :, ::-1])
+                cv2.waitKey(1)
 
         return self._last_pov
 
+    def _pov_handler(self) -> Optional[POVObservation]:
+        bottom_env_spec = self.task
+        while isinstance(bottom_env_spec, EnvWrapper):
+            bottom_env_spec = bottom_env_spec.env_to_wrap
+        return next((h for h in bottom_env_spec.observables if isinstance(h, POVObservation)), None)
+
     ########### RESET METHODS #########
 
     def reset(self) -> Any:
@@ -421,6 +487,10 @@ class _MultiAgentEnv(gym.Env):
             The first observation of the environment. 
         """
         try:
+            reset_start = time.time()
+            if self._episode_start is not None and not self.done:
+                self._publish_mission_ended()
+
             # First reset the env spec and its handlers
             self.task.reset()
 
@@ -434,6 +504,8 @@ class _MultiAgentEnv(gym.Env):
 
             # Start missing instances, quit episodes, and make socket connections
             self._setup_instances()
+            for instance in self.instances:
+                self._inject_fault('reset', instance)
 
             # Episodic state variables
             self.done = False
@@ -454,7 +526,14 @@ class _MultiAgentEnv(gym.Env):
                     self._send_mission(slave_instance, slave_xml, self._get_token(role, ep_uid))
 
             # Finally, peek all of the observations.
-            return self._peek_obs()
+            obs = self._peek_obs()
+
+            self._episode_start = time.time()
+            self._episode_steps = 0
+            for instance in self.instances:
+                self._publish_event(instance, EventType.MISSION_STARTED,
+                                    duration=self._episode_start - reset_start, episode=ep_uid)
+            return obs
 
         finally:
 
@@ -464,6 +543,18 @@ class _MultiAgentEnv(gym.Env):
             # the episode in a cascading fashion
             self._seed = None
 
+    @staticmethod
+    def _publish_event(instance, type, duration=None, **details):
+        if events.has_sinks() and hasattr(instance, 'publish_event'):
+            instance.publish_event(type, duration=duration, **details)
+
+    def _publish_mission_ended(self):
+        duration = time.time() - self._episode_start
+        for instance in self.instances:
+            self._publish_event(instance, EventType.MISSION_ENDED, duration=duration, steps=self._episode_steps,
+                                done=self.done)
+        self._episode_start = None
+
     def _setup_spaces(self) -> None:
         self.observation_space = self.task.observation_space
         self.action_space = self.task.action_space
@@ -543,21 +634,19 @@ class _MultiAgentEnv(gym.Env):
         # Refresh old instances every N setups
         if self._refresh_inst_every is not None and self._inst_setup_cntr % self._refresh_inst_every == 0:
             for i in reversed(range(num_old_instances)):
+                restart_start = time.time()
                 self.instances[i].kill()
                 self.instances[i] = self._get_new_instance(instance_id=self.instances[i].instance_id)
+                self._publish_event(self.instances[i], EventType.RESTARTED,
+                                    duration=time.time() - restart_start, reason='refresh')
         self._inst_setup_cntr += 1
 
         # Now let's clean and establish new socket connections.
         # Note: it is important that all clients are informed of the episode end BEFORE the
         #  server. Since the first client is the one that communicates to the server, we
         #  inform it last by iterating backwards.
-        for instance in reversed(self.instances):
-            self._TO_MOVE_clean_connection(instance)
-            self._TO_MOVE_create_connection(instance)
-            # The socket could be failed here. This method
-            # will throw a socket exception if this is the case.
-            # TODO: Properly rewrite fault tolerance.
-            self._TO_MOVE_quit_current_episode(instance)
+        for i in reversed(range(len(self.instances))):
+            self._connect_or_replace(i)
 
         # Now we should have clean instances with clean sockets ready to recieve a mission.
 
@@ -619,6 +708,8 @@ class _MultiAgentEnv(gym.Env):
             logger.debug("Peeking the clients.")
             peek_message = "<Peek/>"
             multi_done = True
+            # Without a POV every frame is empty, so an empty frame does not mean the mission is still starting.
+            observes_pov = self._pov_handler() is not None
             for actor_name, instance in zip(self.task.agent_names, self.instances):
                 start_time = time.time()
                 comms.send_message(instance.client_socket, peek_message.encode())
@@ -629,7 +720,7 @@ class _MultiAgentEnv(gym.Env):
                 done, = struct.unpack('!b', reply)
                 self.has_finished[actor_name] = self.has_finished[actor_name] or done
                 multi_done = multi_done and done == 1
-                if obs is None or len(obs) == 0:
+                if observes_pov and (obs is None or len(obs) == 0):
                     if time.time() - start_time > MAX_WAIT:
                         instance.client_socket.close()
                         instance.client_socket = None
@@ -706,29 +797,46 @@ class _MultiAgentEnv(gym.Env):
                     comms.send_message(instance.client_socket, "<Disconnect/>".encode())
                 except:
                     pass
-                instance.client_socket.shutdown(socket.SHUT_RDWR)
-                instance.client_socket.close()
+                try:
+                    instance.client_socket.shutdown(socket.SHUT_RDWR)
+                finally:
+                    instance.client_socket.close()
         except (BrokenPipeError, OSError, socket.error):
             # There is no connection left!
             pass
 
-            instance.client_socket = None
+        instance.client_socket = None
 
-    def _TO_MOVE_handle_frozen_minecraft(self, instance):
-        if instance.had_to_clean:
-            # Connect to a new instance!!
-            logger.error(
-                "Connection with Minecraft client {} cleaned "
-                "more than once; restarting.".format(instance))
+    def _TO_MOVE_replace_instance(self, index, reason):
+        """Kills the instance at index and replaces it with a new one of the same kind.
 
+        Instances leased from a broker are discarded, so the broker stops them, and replaced by a new lease.
+        Local instances added by port (e.g. stand-in servers) were not launched by the instance manager, so they
+        are replaced by an instance at the same port rather than by a newly launched Minecraft.
+        """
+        instance = self.instances[index]
+        logger.error("Replacing Minecraft client {} ({}).".format(instance, reason))
+        restart_start = time.time()
+        if isinstance(instance, broker.LeasedInstance):
+            # Killing the instance would release it to the broker's idle pool for other clients.
+            instance.discard()
+            self.instances[index] = self._get_new_instance(
+                instance_id=instance.instance_id, broker_client=instance.client)
+        elif instance.existing:
             instance.kill()
-            instance = self._get_new_instance(instance_id=self.instance.instance_id)
+            if instance in InstanceManager._instance_pool:
+                InstanceManager._instance_pool.remove(instance)
+            self.instances[index] = self._get_new_instance(port=instance.port)
         else:
-            instance.had_to_clean = True
+            instance.kill()
+            self.instances[index] = self._get_new_instance(instance_id=instance.instance_id)
+        self._publish_event(self.instances[index], EventType.RESTARTED, duration=time.time() - restart_start,
+                            reason=reason)
+        return self.instances[index]
 
-    @retry
     def _TO_MOVE_create_connection(self, instance: MinecraftInstance) -> None:
         try:
+            self._inject_fault('connect', instance)
             logger.debug("Creating socket connection {instance}".format(instance=instance))
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
@@ -739,13 +847,85 @@ class _MultiAgentEnv(gym.Env):
 
             instance.client_socket = sock
         except (socket.timeout, socket.error, ConnectionRefusedError) as e:
+            self._publish_event(instance, EventType.SOCKET_ERROR, error=repr(e), during='connect')
             instance.had_to_clean = True
-            logger.error("Failed to reset (socket error), trying again!")
-            logger.error("Cleaning connection! Something must have gone wrong.")
+            logger.error("Failed to connect to {} (socket error {}).".format(instance, e))
             self._TO_MOVE_clean_connection(instance)
-            self._TO_MOVE_handle_frozen_minecraft(instance)
+            self._publish_event(instance, EventType.CLEANED, during='connect')
             raise e
 
+    def _connect_or_replace(self, index):
+        """Connects to the instance at index and quits its current episode, retrying with backoff.
+        An instance which cannot be reached is replaced with a new one."""
+        instance = self.instances[index]
+
+        def connect():
+            self._TO_MOVE_clean_connection(instance)
+            self._TO_MOVE_create_connection(instance)
+            self._TO_MOVE_quit_current_episode(instance)
+
+        try:
+            comms.call_with_backoff(
+                connect, count=self._reconnect_attempts, base=self._reconnect_backoff,
+                max_delay=self._reconnect_max_delay, exceptions=(socket.timeout, socket.error, TypeError))
+        except (socket.timeout, socket.error, TypeError) as e:
+            self._TO_MOVE_clean_connection(instance)
+            instance = self._TO_MOVE_replace_instance(index, reason=repr(e))
+            # A fresh instance which cannot be reached is a fatal error.
+            self._TO_MOVE_create_connection(instance)
+            self._TO_MOVE_quit_current_episode(instance)
+        return self.instances[index]
+
+    def _inject_fault(self, point, instance):
+        if self._fault_injector is not None:
+            self._fault_injector(point, instance)
+
+    def _handle_step_failure(self, cause, instance, during, actions, rewards):
+        """Recovers the instances after communication failed during a step and produces the step's result.
+
+        The step's rewards are those of the ticks (of its action repeat) before the failure.
+        """
+        self._publish_event(instance, EventType.SOCKET_ERROR, error=repr(cause), during=during)
+        logger.error("Failed to take a step ({}: {}); recovering the instances.".format(during, cause))
+        logger.debug(traceback.format_exc())
+        recovery_start = time.time()
+        self.done = True
+        if self._episode_start is not None:
+            self._publish_mission_ended()
+        for inst in self.instances:
+            self._TO_MOVE_clean_connection(inst)
+        self._publish_event(instance, EventType.CLEANED, during=during)
+
+        error = {'cause': repr(cause), 'during': during, 'recovered': False, 'episode_restarted': False}
+        obs = None
+        try:
+            if self._restart_episode_on_failure:
+                obs = _MultiAgentEnv.reset(self)
+                error['episode_restarted'] = True
+            else:
+                # Leave connected instances with no running episode behind so that the next reset is fast.
+                for i in reversed(range(len(self.instances))):
+                    self._connect_or_replace(i)
+            error['recovered'] = True
+        except Exception as e:
+            logger.error("Failed to recover from the step failure: {}".format(e))
+            error['recovery_error'] = repr(e)
+        error['recovery_time'] = time.time() - recovery_start
+        logger.info("Recovery after step failure took {:.2f}s (recovered={}).".format(
+            error['recovery_time'], error['recovered']))
+
+        if obs is None:
+            obs = {agent: self._last_obs[agent] if agent in self._last_obs else self.observation_space.sample()
+                   for agent in actions}
+        else:
+            obs = {agent: obs[agent] for agent in actions}
+        return (
+            obs,
+            {agent: rewards[agent] for agent in actions},
+            self.done,
+            {agent: {'error': error} for agent in actions},
+        )
+
     def _TO_MOVE_quit_current_episode(self, instance: MinecraftInstance) -> None:
         has_quit = False
 
@@ -789,13 +969,17 @@ class _MultiAgentEnv(gym.Env):
     def _TO_MOVE_hello(sock):
         comms.send_message(sock, ("<MalmoEnv" + malmo_version + "/>").encode())
 
-    def _get_new_instance(self, port=None, instance_id=None):
+    def _get_new_instance(self, port=None, instance_id=None, broker_client=None):
         """
         Gets a new instance and sets up a logger if need be. 
         """
 
         if port is not None:
             instance = InstanceManager.add_existing_instance(port)
+        elif broker_client is not None:
+            instance = broker_client.get_instance(instance_id=instance_id)
+        elif broker.is_enabled():
+            instance = broker.get_client().get_instance(instance_id=instance_id)
         else:
             instance = InstanceManager.get_instance(os.getpid(), instance_id=instance_id)
 
@@ -0,0 +1,576 @@
+"""A multi-host Minecraft instance broker.
+
+The broker tracks the capacity of several hosts, each running a :class:`HostAgent`,
+and hands out time-bounded leases on Minecraft instances. Clients must renew their
+leases before they expire; a lease which is not renewed in time (e.g. because the
+client died) is reclaimed by the broker, which stops its instance to free the slot. New lease
+requests are balanced across hosts by load.
+
+Typical setup (see ``scripts/launch_instance_broker.py`` and ``scripts/launch_host_agent.py``)::
+
+    # On the broker node.
+    python3 scripts/launch_instance_broker.py --host 0.0.0.0 --port 9090
+
+    # On every worker node.
+    python3 scripts/launch_host_agent.py --broker PYRO:minerl.instance_broker@<broker>:9090 --capacity 8
+
+    # On the training nodes.
+    export MINERL_INSTANCE_BROKER=PYRO:minerl.instance_broker@<broker>:9090
+"""
+
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+import Pyro4
+
+from minerl.env.malmo import InstanceManager, MinecraftInstance
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_BROKER_PYRO = 'minerl.instance_broker'
+HOST_AGENT_PYRO = 'minerl.host_agent'
+MINERL_INSTANCE_BROKER = 'MINERL_INSTANCE_BROKER'
+
+DEFAULT_LEASE_TTL = 60
+DEFAULT_REAP_INTERVAL = 5
+
+
+def _launch_minecraft_instance(instance_id):
+    """The default instance factory of host agents."""
+    instance = MinecraftInstance(InstanceManager._get_valid_port(), instance_id=instance_id)
+    instance.launch(replaceable=True)
+    return instance
+
+
+@Pyro4.expose
+@Pyro4.behavior(instance_mode="single")
+class HostAgent(object):
+    """Starts and stops Minecraft instances on a single host on behalf of the broker.
+
+    Args:
+        capacity (int): The maximum number of instances this host runs at once.
+        instance_factory (callable, optional): Creates an instance given its id. The returned
+            object must have a ``port`` and a ``kill()`` method. Defaults to launching a
+            MinecraftInstance.
+    """
+
+    def __init__(self, capacity, instance_factory=_launch_minecraft_instance):
+        assert capacity > 0, "Host capacity must be more than zero!"
+        self._capacity = capacity
+        self._instance_factory = instance_factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def ping(self):
+        return True
+
+    def capacity(self):
+        return self._capacity
+
+    def running(self):
+        with self._lock:
+            return len(self._instances)
+
+    def start_instance(self, instance_id):
+        """Launches an instance and returns the port its MalmoEnv server listens on.
+
+        Raises:
+            RuntimeError: If the host is at capacity.
+        """
+        with self._lock:
+            if len(self._instances) >= self._capacity:
+                raise RuntimeError("Host is at capacity ({} instances).".format(self._capacity))
+            # Reserve the slot while the (slow) launch happens.
+            self._instances[instance_id] = None
+        try:
+            instance = self._instance_factory(instance_id)
+        except:
+            with self._lock:
+                del self._instances[instance_id]
+            raise
+        with self._lock:
+            self._instances[instance_id] = instance
+        return instance.port
+
+    def stop_instance(self, instance_id):
+        with self._lock:
+            instance = self._instances.pop(instance_id, None)
+        if instance is not None:
+            instance.kill()
+        return instance is not None
+
+    def shutdown(self):
+        for instance_id in list(self._instances):
+            self.stop_instance(instance_id)
+
+
+class _Host(object):
+    """The broker's bookkeeping for a single host."""
+
+    def __init__(self, name, address, agent, capacity):
+        self.name = name
+        self.address = address
+        self.agent = agent
+        self.capacity = capacity
+        # instance_id -> port of running instances which are not leased.
+        self.idle = {}
+        # instance_id -> port of leased instances.
+        self.leased = {}
+        # Number of instances being launched.
+        self.pending = 0
+
+    @property
+    def launched(self):
+        return len(self.idle) + len(self.leased) + self.pending
+
+    @property
+    def load(self):
+        return (len(self.leased) + self.pending) / self.capacity
+
+    def available(self):
+        return len(self.idle) > 0 or self.launched < self.capacity
+
+    def status(self):
+        return {
+            'name': self.name,
+            'address': self.address,
+            'capacity': self.capacity,
+            'leased': len(self.leased),
+            'idle': len(self.idle),
+            'pending': self.pending,
+        }
+
+
+class _Lease(object):
+
+    def __init__(self, lease_id, client_id, host, instance_id, port, ttl, expires_at):
+        self.lease_id = lease_id
+        self.client_id = client_id
+        self.host = host
+        self.instance_id = instance_id
+        self.port = port
+        self.ttl = ttl
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return {
+            'lease_id': self.lease_id,
+            'client_id': self.client_id,
+            'host_name': self.host.name,
+            'host': self.host.address,
+            'port': self.port,
+            'instance_id': self.instance_id,
+            'ttl': self.ttl,
+        }
+
+
+@Pyro4.expose
+@Pyro4.behavior(instance_mode="single")
+class InstanceBroker(object):
+    """Grants time-bounded leases on Minecraft instances running on several hosts.
+
+    Args:
+        lease_ttl (float, optional): The default lease duration in seconds.
+        clock (callable, optional): The monotonic clock used for lease expiry.
+        connect (callable, optional): Turns the agent URI given to ``register_host`` into an
+            agent. Defaults to a Pyro4 proxy; a new one is made for every call since Pyro4
+            proxies are owned by the thread which created them.
+    """
+
+    def __init__(self, lease_ttl=DEFAULT_LEASE_TTL, clock=time.monotonic, connect=Pyro4.Proxy):
+        self.lease_ttl = lease_ttl
+        self._clock = clock
+        self._connect = connect
+        self._hosts = {}
+        self._leases = {}
+        self._lock = threading.RLock()
+        self._reaper_stop = threading.Event()
+
+    ###########################
+    ##### HOSTS ###############
+    ###########################
+    def register_host(self, name, agent, address, capacity=None):
+        """Adds a host (or replaces a re-registering one).
+
+        Args:
+            name (str): A unique name for the host.
+            agent: The agent URI (or the agent itself when ``connect`` is the identity).
+            address (str): The address clients use to reach instances on the host.
+            capacity (int, optional): Defaults to the agent's capacity.
+        """
+        capacity = self._connect(agent).capacity() if capacity is None else capacity
+        with self._lock:
+            old = self._hosts.get(name)
+            if old is not None:
+                self._drop_host(old)
+            self._hosts[name] = _Host(name, address, agent, capacity)
+        logger.info("Registered host {} at {} with capacity {}.".format(name, address, capacity))
+
+    def unregister_host(self, name):
+        with self._lock:
+            host = self._hosts.get(name)
+            if host is not None:
+                self._drop_host(host)
+                del self._hosts[name]
+        return host is not None
+
+    def _drop_host(self, host):
+        for lease_id in [l.lease_id for l in self._leases.values() if l.host is host]:
+            del self._leases[lease_id]
+
+    def status(self):
+        with self._lock:
+            return [host.status() for host in self._hosts.values()]
+
+    ###########################
+    ##### LEASES ##############
+    ###########################
+    def acquire(self, client_id, ttl=None):
+        """Leases an instance on the least loaded host, launching one if no warm instance is idle.
+
+        Returns:
+            dict: The lease, containing the ``lease_id`` and the ``host`` and ``port`` of the instance.
+
+        Raises:
+            RuntimeError: If no host has capacity left or every launch failed.
+        """
+        ttl = self.lease_ttl if ttl is None else ttl
+        tried = set()
+        while True:
+            with self._lock:
+                candidates = [h for h in self._hosts.values() if h.available() and h.name not in tried]
+                if not candidates:
+                    raise RuntimeError("No available instances on any host!")
+                # Least loaded first, preferring hosts with warm instances.
+                host = min(candidates, key=lambda h: (h.load, -len(h.idle), h.name))
+
+                if host.idle:
+                    instance_id, port = host.idle.popitem()
+                    return self._grant(client_id, host, instance_id, port, ttl)
+                host.pending += 1
+
+            instance_id = uuid.uuid4().hex
+            try:
+                port = self._connect(host.agent).start_instance(instance_id)
+            except Exception as e:
+                logger.error("Failed to launch an instance on {}: {}".format(host.name, e))
+                with self._lock:
+                    host.pending -= 1
+                tried.add(host.name)
+                continue
+
+            with self._lock:
+                host.pending -= 1
+                if self._hosts.get(host.name) is host:
+                    return self._grant(client_id, host, instance_id, port, ttl)
+            # The host was unregistered during the launch.
+            tried.add(host.name)
+
+    def _grant(self, client_id, host, instance_id, port, ttl):
+        lease = _Lease(uuid.uuid4().hex, client_id, host, instance_id, port, ttl, self._clock() + ttl)
+        host.leased[instance_id] = port
+        self._leases[lease.lease_id] = lease
+        logger.debug("Leased instance {} on {} to {}.".format(instance_id, host.name, client_id))
+        return lease.to_dict()
+
+    def renew(self, lease_id):
+        """Extends a lease by its ttl.
+
+        Raises:
+            KeyError: If the lease is unknown, e.g. because it already expired.
+        """
+        with self._lock:
+            lease = self._leases[lease_id]
+            lease.expires_at = self._clock() + lease.ttl
+        return True
+
+    def renew_all(self, lease_ids):
+        """Renews several leases at once and returns the ids of those which are no longer valid."""
+        with self._lock:
+            now = self._clock()
+            lost = []
+            for lease_id in lease_ids:
+                lease = self._leases.get(lease_id)
+                if lease is None:
+                    lost.append(lease_id)
+                else:
+                    lease.expires_at = now + lease.ttl
+        return lost
+
+    def release(self, lease_id):
+        """Returns a leased instance to its host's idle pool."""
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None:
+                return False
+            port = lease.host.leased.pop(lease.instance_id)
+            lease.host.idle[lease.instance_id] = port
+        logger.debug("Released instance {} on {}.".format(lease.instance_id, lease.host.name))
+        return True
+
+    def discard(self, lease_id):
+        """Stops a leased instance which its client found broken, instead of returning it to the idle pool."""
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None:
+                return False
+            lease.host.leased.pop(lease.instance_id, None)
+            lease.host.pending += 1
+        logger.warning("Instance {} on {} was reported broken by {}; stopping it.".format(
+            lease.instance_id, lease.host.name, lease.client_id))
+        self._stop_instance(lease)
+        return True
+
+    def reap_expired(self):
+        """Reclaims the instances of expired leases.
+
+        The state of an instance whose client died is unknown so it is stopped instead of
+        being returned to the idle pool.
+
+        Returns:
+            list: The ids of the reclaimed leases.
+        """
+        with self._lock:
+            now = self._clock()
+            expired = [l for l in self._leases.values() if l.expires_at <= now]
+            for lease in expired:
+                del self._leases[lease.lease_id]
+                lease.host.leased.pop(lease.instance_id, None)
+                lease.host.pending += 1
+
+        for lease in expired:
+            logger.warning("Lease {} of {} on {} expired; reclaiming its instance.".format(
+                lease.lease_id, lease.client_id, lease.host.name))
+            self._stop_instance(lease)
+        return [lease.lease_id for lease in expired]
+
+    def _stop_instance(self, lease):
+        # The instance's slot is counted as pending until it is stopped.
+        try:
+            self._connect(lease.host.agent).stop_instance(lease.instance_id)
+        except Exception as e:
+            logger.error("Failed to stop instance {} on {}: {}".format(lease.instance_id, lease.host.name, e))
+        finally:
+            with self._lock:
+                lease.host.pending -= 1
+
+    def start_reaper(self, interval=DEFAULT_REAP_INTERVAL):
+        def reap():
+            while not self._reaper_stop.wait(interval):
+                self.reap_expired()
+
+        thread = threading.Thread(target=reap)
+        thread.setDaemon(True)
+        thread.start()
+        return thread
+
+    def stop_reaper(self):
+        self._reaper_stop.set()
+
+
+class LeasedInstance(MinecraftInstance):
+    """An existing instance on a (possibly remote) host which is held through a broker lease.
+
+    Killing or closing the instance releases the lease; discarding it stops the instance instead.
+    """
+
+    def __init__(self, client, lease, instance_id=None):
+        super().__init__(port=lease['port'], existing=True, status_dir=None, instance_id=instance_id)
+        self._host = lease['host']
+        self.lease = lease
+        self._client = client
+
+    def kill(self):
+        self._release()
+        super().kill()
+
+    def close(self):
+        self._release()
+        super().close()
+
+    @property
+    def client(self):
+        return self._client
+
+    def discard(self):
+        """Gives up a broken instance, which the broker stops rather than leasing it to other clients."""
+        if self.lease is not None:
+            self._client.discard(self.lease)
+            self.lease = None
+        self.running = False
+
+    def _release(self):
+        if self.lease is not None:
+            self._client.release(self.lease)
+            self.lease = None
+        self.running = False
+
+
+class BrokerClient(object):
+    """Acquires leases from a broker and renews all of them from a single thread.
+
+    Args:
+        broker: The URI of the broker (or the broker itself).
+        client_id (str, optional): Identifies this client in the broker's logs.
+        renew_interval (float, optional): Defaults to a third of the lease ttl.
+    """
+
+    def __init__(self, broker, client_id=None, renew_interval=None):
+        self._broker = broker
+        self.client_id = client_id or "{}:{}".format(socket.gethostname(), os.getpid())
+        self._renew_interval = renew_interval
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._renewer = None
+        self._should_stop = threading.Event()
+
+    @property
+    def broker(self):
+        # Pyro4 proxies are owned by the thread which created them.
+        if not isinstance(self._broker, str):
+            return self._broker
+        if not hasattr(self._local, 'proxy'):
+            self._local.proxy = Pyro4.Proxy(self._broker)
+        return self._local.proxy
+
+    def acquire(self, ttl=None):
+        lease = self.broker.acquire(self.client_id, ttl)
+        with self._lock:
+            self._leases[lease['lease_id']] = lease
+            self._ensure_renewer(lease['ttl'])
+        return lease
+
+    def get_instance(self, instance_id=None):
+        return LeasedInstance(self, self.acquire(), instance_id=instance_id)
+
+    def release(self, lease):
+        with self._lock:
+            self._leases.pop(lease['lease_id'], None)
+        try:
+            return self.broker.release(lease['lease_id'])
+        except Exception as e:
+            logger.error("Failed to release lease {}: {}".format(lease['lease_id'], e))
+            return False
+
+    def discard(self, lease):
+        with self._lock:
+            self._leases.pop(lease['lease_id'], None)
+        try:
+            return self.broker.discard(lease['lease_id'])
+        except Exception as e:
+            logger.error("Failed to discard lease {}: {}".format(lease['lease_id'], e))
+            return False
+
+    def renew(self):
+        """Renews every lease held by this client. Returns the leases which were lost."""
+        with self._lock:
+            lease_ids = list(self._leases)
+        if not lease_ids:
+            return []
+        lost_ids = self.broker.renew_all(lease_ids)
+        with self._lock:
+            lost = [self._leases.pop(lease_id) for lease_id in lost_ids if lease_id in self._leases]
+        for lease in lost:
+            logger.error("Lease {} on {}:{} expired before it was renewed.".format(
+                lease['lease_id'], lease['host'], lease['port']))
+        return lost
+
+    def _ensure_renewer(self, ttl):
+        if self._renewer is not None:
+            return
+        interval = self._renew_interval or ttl / 3
+
+        def renew_loop():
+            while not self._should_stop.wait(interval):
+                try:
+                    self.renew()
+                except Exception as e:
+                    logger.error("Failed to renew leases: {}".format(e))
+
+        self._renewer = threading.Thread(target=renew_loop)
+        self._renewer.setDaemon(True)
+        self._renewer.start()
+
+    def close(self):
+        self._should_stop.set()
+        with self._lock:
+            leases = list(self._leases.values())
+        for lease in leases:
+            self.release(lease)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(os.getenv(MINERL_INSTANCE_BROKER))
+
+
+def get_client():
+    """Gets the process wide broker client configured by the MINERL_INSTANCE_BROKER environment variable."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = BrokerClient(os.getenv(MINERL_INSTANCE_BROKER))
+        return _client
+
+
+def launch_instance_broker():
+    """Defines the entry point for the instance broker server.
+    """
+    parser = argparse.ArgumentParser("python3 launch_instance_broker.py")
+    parser.add_argument("--host", type=str, default="localhost",
+                        help="The address the broker listens on.")
+    parser.add_argument("--port", type=int, default=9090,
+                        help="The port the broker listens on.")
+    parser.add_argument("--lease_ttl", type=float, default=DEFAULT_LEASE_TTL,
+                        help="The number of seconds a lease is valid for without renewal.")
+    parser.add_argument("--ns", action="store_true",
+                        help="Also register the broker with the Pyro name server.")
+    opts = parser.parse_args()
+
+    broker = InstanceBroker(lease_ttl=opts.lease_ttl)
+    broker.start_reaper(min(DEFAULT_REAP_INTERVAL, opts.lease_ttl / 3))
+
+    daemon = Pyro4.Daemon(host=opts.host, port=opts.port)
+    Pyro4.Daemon.serveSimple(
+        {
+            broker: INSTANCE_BROKER_PYRO
+        },
+        daemon=daemon,
+        ns=opts.ns)
+
+
+def launch_host_agent():
+    """Defines the entry point for a host agent which registers itself with a broker.
+    """
+    parser = argparse.ArgumentParser("python3 launch_host_agent.py")
+    parser.add_argument("--broker", type=str, required=True,
+                        help="The URI of the instance broker.")
+    parser.add_argument("--capacity", type=int, default=max(1, os.cpu_count() // 4),
+                        help="The maximum number of instances this host runs.")
+    parser.add_argument("--name", type=str, default=socket.gethostname(),
+                        help="A unique name for this host.")
+    parser.add_argument("--advertise", type=str, default=socket.gethostname(),
+                        help="The address clients and the broker use to reach this host.")
+    parser.add_argument("--port", type=int, default=0,
+                        help="The port the agent listens on.")
+    opts = parser.parse_args()
+
+    agent = HostAgent(opts.capacity)
+    daemon = Pyro4.Daemon(host=opts.advertise, port=opts.port)
+    uri = daemon.register(agent, HOST_AGENT_PYRO)
+
+    Pyro4.Proxy(opts.broker).register_host(opts.name, str(uri), opts.advertise, opts.capacity)
+    logger.info("Host agent {} serving {} instances at {}.".format(opts.name, opts.capacity, uri))
+    try:
+        daemon.requestLoop()
+    finally:
+        agent.shutdown()
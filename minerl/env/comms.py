@@ -27,28 +27,50 @@ import Pyro4
 logger = logging.getLogger(__name__)
 
 retry_count = 20
-retry_timeout = 10
+retry_timeout = 10  # The longest pause between two attempts.
+retry_backoff = 0.5  # The first pause; every following pause doubles up to retry_timeout.
+
+RETRY_EXCEPTIONS = (socket.timeout, socket.error, RuntimeError)
+
+
+def backoff_delays(count=None, base=None, max_delay=None):
+    """Yields the pauses between ``count`` attempts, growing exponentially from ``base`` up to ``max_delay``."""
+    count = retry_count if count is None else count
+    base = retry_backoff if base is None else base
+    max_delay = retry_timeout if max_delay is None else max_delay
+    for i in range(count - 1):
+        yield min(max_delay, base * 2 ** i)
+
+
+def call_with_backoff(func, *args, count=None, base=None, max_delay=None, exceptions=RETRY_EXCEPTIONS, **kwargs):
+    """Calls func until it succeeds, pausing with bounded exponential backoff between attempts.
+
+    Raises:
+        The first exception raised by func if every attempt failed.
+    """
+    first_exc = None
+    delays = backoff_delays(count, base, max_delay)
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except Pyro4.errors.PyroError as e:
+            logger.error("An error occurred contacting the instance manager. Is it started!?")
+            raise e
+        except exceptions as e:
+            if first_exc is None:
+                first_exc = e
+            delay = next(delays, None)
+            if delay is None:
+                raise first_exc
+            logger.debug("Pause of {:.1f}s before retry on {}".format(delay, e))
+            time.sleep(delay)
+            logger.debug("Pause complete.")
 
 
 def retry(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        retry_exc = None
-        for i in range(retry_count):
-            try:
-                return func(*args, **kwargs)
-            except Pyro4.errors.PyroError as e:
-                logger.error("An error occurred contacting the instance manager. Is it started!?")
-                raise e
-            except (socket.timeout, socket.error, RuntimeError) as e:
-                if retry_exc is None:
-                    retry_exc = e
-                if i < retry_count - 1:
-                    logger.debug(f"Pause before retry on " + str(e))
-                    raise e
-                    time.sleep(retry_timeout)
-                    logger.debug("Pause complete.")
-        raise retry_exc
+        return call_with_backoff(func, *args, **kwargs)
 
     return wrapper
 
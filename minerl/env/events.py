@@ -0,0 +1,239 @@
+"""Structured lifecycle events of Minecraft instances.
+
+Instances and environments publish an :class:`InstanceEvent` whenever an instance is launched, binds its
+port, becomes dormant, starts or ends a mission, hits a socket error, has its connection cleaned, is killed
+or is restarted. Events are delivered to every registered sink, e.g.::
+
+    from minerl.env.events import JSONLSink, RingBufferSink
+    from minerl.env.malmo import InstanceManager
+
+    InstanceManager.add_event_sink(JSONLSink('instance_events.jsonl'))
+
+Setting the MINERL_INSTANCE_EVENTS environment variable to a path registers a JSONL sink on import.
+Event logs gathered across a fleet can be analysed with :func:`availability` and :func:`time_to_recover`.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+MINERL_INSTANCE_EVENTS = 'MINERL_INSTANCE_EVENTS'
+
+
+class EventType(Enum):
+    LAUNCHED = 'launched'
+    PORT_BOUND = 'port-bound'
+    DORMANT = 'dormant'
+    MISSION_STARTED = 'mission-started'
+    MISSION_ENDED = 'mission-ended'
+    SOCKET_ERROR = 'socket-error'
+    CLEANED = 'cleaned'
+    KILLED = 'killed'
+    RESTARTED = 'restarted'
+
+
+class InstanceEvent(object):
+    """A single lifecycle event of an instance.
+
+    Args:
+        type (EventType): What happened.
+        instance (str): The uuid of the instance.
+        instance_id: The id of the slot the instance fills; kept when an instance is replaced.
+        host (str): The host of the instance.
+        port (int): The MalmoEnv port of the instance.
+        duration (float, optional): How long the step leading to the event took in seconds, e.g. the
+            startup time for DORMANT or the episode length for MISSION_ENDED.
+        timestamp (float, optional): The wall clock time of the event. Defaults to now.
+        details (dict, optional): Event specific JSON serializable details.
+    """
+
+    def __init__(self, type, instance, instance_id=None, host=None, port=None, duration=None, timestamp=None,
+                 details=None):
+        self.type = EventType(type)
+        self.instance = instance
+        self.instance_id = instance_id
+        self.host = host
+        self.port = port
+        self.duration = duration
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.details = details or {}
+
+    @property
+    def slot(self):
+        """Identifies the instance across restarts."""
+        return self.instance_id if self.instance_id is not None else self.instance
+
+    def to_dict(self):
+        return {
+            'type': self.type.value,
+            'instance': self.instance,
+            'instance_id': self.instance_id,
+            'host': self.host,
+            'port': self.port,
+            'duration': self.duration,
+            'timestamp': self.timestamp,
+            'details': self.details,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def __repr__(self):
+        return "InstanceEvent[{}, {}:{}, instance={}]".format(self.type.value, self.host, self.port, self.instance)
+
+
+class EventSink(object):
+    """The interface of event sinks."""
+
+    def emit(self, event):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class RingBufferSink(EventSink):
+    """Keeps the most recent events in memory."""
+
+    def __init__(self, maxlen=10000):
+        self._events = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self._events.append(event)
+
+    def events(self, type=None):
+        with self._lock:
+            events = list(self._events)
+        if type is not None:
+            events = [e for e in events if e.type == EventType(type)]
+        return events
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+
+class JSONLSink(EventSink):
+    """Appends events to a JSON lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_jsonl(path):
+    """Reads the events written by a JSONLSink."""
+    with open(path) as f:
+        return [InstanceEvent.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def publish(event):
+    """Delivers an event to every sink. Failing sinks are logged, never raised."""
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink.emit(event)
+        except Exception as e:
+            logger.error("Event sink {} failed to emit {}: {}".format(sink, event, e))
+
+
+def has_sinks():
+    return len(_sinks) > 0
+
+
+###########################
+##### ANALYSIS ############
+###########################
+FAILURE_EVENTS = (EventType.SOCKET_ERROR, EventType.CLEANED)
+
+
+def _outages(events):
+    """Finds the outages of every slot: from its first failure until it next starts a mission.
+
+    Returns:
+        dict: slot -> list of (start, end) timestamps, where end is None for ongoing outages.
+    """
+    outages = {}
+    down_since = {}
+    for event in sorted(events, key=lambda e: e.timestamp):
+        slot_outages = outages.setdefault(event.slot, [])
+        if event.type in FAILURE_EVENTS:
+            down_since.setdefault(event.slot, event.timestamp)
+        elif event.type == EventType.MISSION_STARTED and event.slot in down_since:
+            slot_outages.append((down_since.pop(event.slot), event.timestamp))
+    for slot, start in down_since.items():
+        outages[slot].append((start, None))
+    return outages
+
+
+def time_to_recover(events):
+    """Gets the time from the first failure of an instance slot until it started its next mission.
+
+    Returns:
+        list: The recovery times in seconds of every completed outage.
+    """
+    return [end - start for outages in _outages(events).values() for start, end in outages if end is not None]
+
+
+def availability(events, until=None):
+    """Gets the fraction of time instance slots were not in an outage.
+
+    Every slot is observed from its first event until ``until`` (defaults to the last event).
+
+    Returns:
+        float: The availability across all slots, or None without events.
+    """
+    if not events:
+        return None
+    until = max(e.timestamp for e in events) if until is None else until
+    first_seen = {}
+    for event in events:
+        first_seen[event.slot] = min(event.timestamp, first_seen.get(event.slot, event.timestamp))
+
+    observed = sum(until - t for t in first_seen.values())
+    if observed <= 0:
+        return 1.0
+    down = sum((until if end is None else min(end, until)) - start
+               for outages in _outages(events).values() for start, end in outages if start < until)
+    return 1.0 - down / observed
+
+
+if os.getenv(MINERL_INSTANCE_EVENTS):
+    add_sink(JSONLSink(os.getenv(MINERL_INSTANCE_EVENTS)))
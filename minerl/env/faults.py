@@ -0,0 +1,68 @@
+"""Client side fault injection for testing the fault tolerance of environments.
+
+Environments call their fault injector at a few points of their communication with an instance:
+``'connect'``, ``'reset'``, ``'step'`` and ``'step_server'``. A :class:`FaultInjector` raises socket errors
+(and optionally drops the connection to the instance) at those points, e.g.::
+
+    injector = FaultInjector().fail_at('step', calls=[10])
+    env.unwrapped.set_fault_injector(injector)
+"""
+
+import random
+import socket
+import threading
+
+
+class FaultInjector(object):
+    """Raises socket errors at scheduled or random injection points."""
+
+    def __init__(self, seed=None):
+        self._schedules = {}
+        self._probabilities = {}
+        self._calls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.injected = []
+
+    def fail_at(self, point, calls, exc=None, drop_connection=True):
+        """Fails the given (0-indexed) calls of an injection point.
+
+        Args:
+            point (str): The injection point.
+            calls (list): The indices of the calls which fail.
+            exc (Exception, optional): The exception to raise. Defaults to a socket timeout.
+            drop_connection (bool, optional): Also close the socket to the instance, as a broken connection would.
+        """
+        self._schedules.setdefault(point, {}).update({c: (exc, drop_connection) for c in calls})
+        return self
+
+    def fail_randomly(self, point, probability, exc=None, drop_connection=True):
+        """Fails every call of an injection point with the given probability."""
+        self._probabilities[point] = (probability, exc, drop_connection)
+        return self
+
+    def calls(self, point):
+        return self._calls.get(point, 0)
+
+    def __call__(self, point, instance):
+        with self._lock:
+            call = self._calls.get(point, 0)
+            self._calls[point] = call + 1
+
+            fault = self._schedules.get(point, {}).get(call)
+            if fault is None and point in self._probabilities:
+                probability, exc, drop_connection = self._probabilities[point]
+                if self._random.random() < probability:
+                    fault = exc, drop_connection
+            if fault is None:
+                return
+            self.injected.append((point, call))
+
+        exc, drop_connection = fault
+        sock = getattr(instance, 'client_socket', None)
+        if drop_connection and sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        raise exc if exc is not None else socket.timeout("Injected fault at {} (call {}).".format(point, call))
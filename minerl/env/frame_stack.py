@@ -0,0 +1,136 @@
+"""Stacks the last frames of an observation, e.g. the POV, without copying them on every step::
+
+    env = FrameStackWrapper(gym.make('MineRLPunchCow-64-v0'), num_stack=4)
+    obs = env.reset()
+    np.asarray(obs['pov']).shape  # (4, 64, 64, 3)
+
+Works on the single agent envs and on the vectorized ones (whose observations keep their POV next to the
+vector). By default a stack is a LazyFrames of the frames the env returned, which are only copied into one
+array when the stack is used as one. With ``lazy=False`` the stack is a view on a preallocated ring buffer
+instead, which is valid until the next step.
+"""
+
+from collections import OrderedDict, deque
+
+import gym
+import numpy as np
+
+from minerl.herobraine.hero import spaces
+
+
+class LazyFrames(object):
+    """A stack of frames which is only materialized (once) when it is used as an array.
+
+    Indexing by an int gets a frame without materializing the stack.
+    """
+
+    __slots__ = ('_frames', '_array')
+
+    def __init__(self, frames):
+        self._frames = tuple(frames)
+        self._array = None
+
+    def __array__(self, dtype=None):
+        if self._array is None:
+            self._array = np.stack(self._frames)
+        return self._array if dtype is None else self._array.astype(dtype)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return self._frames[i]
+        return np.asarray(self)[i]
+
+    @property
+    def shape(self):
+        return (len(self._frames),) + self._frames[0].shape
+
+    @property
+    def dtype(self):
+        return self._frames[0].dtype
+
+    def __repr__(self):
+        return "LazyFrames(shape={}, dtype={})".format(self.shape, self.dtype)
+
+
+class FrameStackWrapper(gym.Wrapper):
+    """Observes the last num_stack frames of an observation key instead of the latest one.
+
+    Args:
+        env (gym.Env): An env with dict observations.
+        num_stack (int): The number of frames to stack.
+        key (str, optional): The observation to stack.
+        skip (int, optional): Repeat every action this many steps, summing their rewards, and stack the
+            frame of the last one.
+        max_pool (bool, optional): With skip, stack the maximum of the last two frames of every action, which
+            removes the flicker of things only rendered on some ticks.
+        lazy (bool, optional): Observe LazyFrames rather than views on a ring buffer.
+    """
+
+    def __init__(self, env, num_stack: int, key: str = 'pov', skip: int = 1, max_pool: bool = False,
+                 lazy: bool = True):
+        super().__init__(env)
+        if num_stack < 1 or skip < 1:
+            raise ValueError("num_stack and skip must be positive")
+        self.num_stack = num_stack
+        self.key = key
+        self.skip = skip
+        self.max_pool = max_pool and skip > 1
+        self.lazy = lazy
+
+        frame_space = env.observation_space.spaces[key]
+        shape = (num_stack,) + tuple(frame_space.shape)
+        stacked_space = spaces.Box(
+            low=np.broadcast_to(frame_space.low, shape), high=np.broadcast_to(frame_space.high, shape),
+            dtype=frame_space.dtype)
+        self.observation_space = spaces.Dict(OrderedDict(
+            (k, stacked_space if k == key else space) for k, space in env.observation_space.spaces.items()))
+
+        self._frames = deque(maxlen=num_stack)
+        # Every frame is written twice, num_stack apart, so the last num_stack frames are always contiguous.
+        self._ring = None if lazy else np.zeros((2 * num_stack,) + tuple(frame_space.shape), frame_space.dtype)
+        self._head = 0
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+        frame = obs[self.key]
+        for _ in range(self.num_stack):
+            self._push(frame)
+        return self._observation(obs)
+
+    def step(self, action):
+        total_reward = 0.0
+        obs = previous = None
+        for i in range(self.skip):
+            if self.max_pool and i == self.skip - 1 and obs is not None:
+                previous = obs[self.key]
+            obs, reward, done, info = self.env.step(action)
+            total_reward += reward
+            if done:
+                break
+
+        frame = obs[self.key]
+        if previous is not None:
+            frame = np.maximum(previous, frame)
+        self._push(frame)
+        return self._observation(obs), total_reward, done, info
+
+    def _push(self, frame):
+        if self.lazy:
+            self._frames.append(frame)
+        else:
+            self._ring[self._head] = frame
+            self._ring[self._head + self.num_stack] = frame
+            self._head = (self._head + 1) % self.num_stack
+
+    def _observation(self, obs):
+        obs = OrderedDict(obs)
+        if self.lazy:
+            obs[self.key] = LazyFrames(self._frames)
+        else:
+            stack = self._ring[self._head:self._head + self.num_stack]
+            stack.flags.writeable = False
+            obs[self.key] = stack
+        return obs
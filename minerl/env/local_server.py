@@ -0,0 +1,263 @@
+"""A pure-Python stand-in for the MalmoEnv server of a Minecraft instance.
+
+The server speaks the MalmoEnv protocol (the version handshake, mission init, ``<Quit/>``, ``<Find>``,
+``<Peek/>``, ``<StepClient0>``, ``<StepServer>``, ``<Disconnect/>`` and ``<Exit>`` with length-prefixed
+framing) and serves observations generated for an env spec, so the Python side of MineRL can be tested and
+benchmarked without a JVM::
+
+    from minerl.env.local_server import LocalMalmoServer
+    from minerl.env.malmo import InstanceManager
+
+    with LocalMalmoServer(env_spec, tick_latency=0.05) as server:
+        env = env_spec.make(instances=[InstanceManager.add_existing_instance(server.port)])
+        ...
+
+Observations are the no-op observation of the spec with random POV frames unless an ``observation_fn`` is
+given. Ticks can be slowed down with a latency and jitter, and connections can be dropped at chosen or random
+steps to exercise fault tolerance.
+"""
+
+import logging
+import random
+import re
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from minerl.env import comms
+from minerl.env.malmo import malmo_version
+from minerl.env.payloads import HeroPayloadGenerator
+
+logger = logging.getLogger(__name__)
+
+_STEP_CLIENT = re.compile(rb'^<StepClient(\d)>(.*)</StepClient\d ?>$', re.DOTALL)
+
+
+class _Mission(object):
+    """The state of the mission of one role."""
+
+    def __init__(self, token, agent_count, seed):
+        self.token = token
+        self.agent_count = agent_count
+        self.seed = seed
+        self.tick = 0
+        self.done = False
+        self.commands = []
+
+
+class LocalMalmoServer(object):
+    """Serves the MalmoEnv protocol for an env spec on a local port.
+
+    Args:
+        env_spec (EnvSpec): The env spec whose observations are served.
+        port (int, optional): The port to listen on. Defaults to a free port.
+        host (str, optional): The address to listen on.
+        tick_latency (float, optional): Seconds every step takes.
+        jitter (float, optional): The standard deviation in seconds added to the tick latency.
+        episode_length (int, optional): The number of steps after which the mission is done.
+        observation_fn (callable, optional): Maps (role, tick) to an observation in the spec's observation
+            space. Defaults to the no-op observation with a random POV frame.
+        drop_at (list, optional): Drop the connection instead of answering these (0-indexed) steps, counted
+            across all missions.
+        drop_probability (float, optional): The probability with which any step drops the connection.
+        seed (int, optional): Seeds the frames, jitter and random drops.
+    """
+
+    NUM_FRAMES = 8
+
+    def __init__(self, env_spec, port=0, host='localhost', tick_latency=0.0, jitter=0.0, episode_length=None,
+                 observation_fn=None, drop_at=(), drop_probability=0.0, seed=None):
+        self.env_spec = env_spec
+        self.tick_latency = tick_latency
+        self.jitter = jitter
+        self.episode_length = episode_length
+        self.drop_at = set(drop_at)
+        self.drop_probability = drop_probability
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        env_spec.reset()
+        self._generator = HeroPayloadGenerator.from_env_spec(env_spec)
+        self._observation_fn = observation_fn or self._default_observation
+        self._frames = None
+        if self._generator.pov_handler is not None:
+            shape = self._generator.pov_handler.raw_shape
+            rng = np.random.RandomState(seed)
+            self._frames = [rng.randint(0, 256, size=shape, dtype=np.uint8) for _ in range(self.NUM_FRAMES)]
+
+        self.missions = {}
+        self.steps = 0
+        self.dropped = 0
+        self.connections = 0
+        self._server_steps = 0
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(16)
+        self.host, self.port = self._sock.getsockname()[:2]
+        self._running = False
+        self._thread = None
+        self._conns = set()
+
+    ###########################
+    ##### LIFECYCLE ###########
+    ###########################
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.debug("Local MalmoEnv server listening on {}:{}".format(self.host, self.port))
+        return self
+
+    def stop(self):
+        self._running = False
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        for conn in list(self._conns):
+            self._close(conn)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self.connections += 1
+                self._conns.add(conn)
+            thread = threading.Thread(target=self._handle, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _close(self, conn):
+        self._conns.discard(conn)
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        conn.close()
+
+    ###########################
+    ##### PROTOCOL ############
+    ###########################
+    def _handle(self, conn):
+        try:
+            hello = comms.recv_message(conn)
+            if hello != ("<MalmoEnv" + malmo_version + "/>").encode():
+                logger.error("Unexpected handshake {}".format(hello))
+                return
+            role = None
+            while self._running:
+                msg = comms.recv_message(conn)
+                if msg is None or msg == b'<Disconnect/>':
+                    return
+                elif msg.startswith(b'<MissionInit'):
+                    role = self._init_mission(conn, msg)
+                elif msg == b'<Quit/>':
+                    self._quit(role)
+                    comms.send_message(conn, struct.pack('!I', 1))
+                elif msg.startswith(b'<Find>'):
+                    # The port of the integrated server the other agents connect to.
+                    comms.send_message(conn, struct.pack('!I', self.port + 1))
+                elif msg == b'<Peek/>':
+                    self._peek(conn, role)
+                elif msg.startswith(b'<StepClient'):
+                    if not self._step(conn, role, msg):
+                        return
+                elif msg.startswith(b'<StepServer>'):
+                    with self._lock:
+                        self._server_steps += 1
+                elif msg.startswith(b'<Exit>'):
+                    comms.send_message(conn, struct.pack('!I', 1))
+                    self.stop()
+                    return
+                else:
+                    logger.error("Unexpected message {}".format(msg[:100]))
+                    return
+        except (OSError, struct.error):
+            pass
+        finally:
+            self._close(conn)
+
+    def _init_mission(self, conn, mission_xml):
+        token = comms.recv_message(conn).decode()
+        # ep_uid:role:agent_count:synchronous[:seed]
+        parts = token.split(':')
+        role = int(parts[1])
+        seed = parts[4] if len(parts) > 4 else None
+        with self._lock:
+            self.missions[role] = _Mission(token, int(parts[2]), seed)
+        comms.send_message(conn, struct.pack('!I', 1))
+        return role
+
+    def _quit(self, role):
+        with self._lock:
+            if role in self.missions:
+                self.missions[role].done = True
+
+    def _observation(self, role, mission):
+        pov, info = self._generator.encode(self._observation_fn(role, mission.tick))
+        return pov, info
+
+    def _peek(self, conn, role):
+        mission = self.missions.get(role)
+        if mission is None:
+            comms.send_message(conn, b'')
+            comms.send_message(conn, b'{}')
+            comms.send_message(conn, struct.pack('!b', 0))
+            return
+        pov, info = self._observation(role, mission)
+        comms.send_message(conn, pov)
+        comms.send_message(conn, info)
+        comms.send_message(conn, struct.pack('!b', int(mission.done)))
+
+    def _step(self, conn, role, msg):
+        """Answers a step. Returns False if the connection is to be dropped instead."""
+        match = _STEP_CLIENT.match(msg)
+        mission = self.missions.get(role)
+        with self._lock:
+            step = self.steps
+            self.steps += 1
+            drop = step in self.drop_at or (self.drop_probability and self._random.random() < self.drop_probability)
+            delay = self.tick_latency + (self._random.gauss(0, self.jitter) if self.jitter else 0.0)
+        if drop:
+            with self._lock:
+                self.dropped += 1
+            logger.debug("Dropping the connection at step {}".format(step))
+            return False
+        if delay > 0:
+            time.sleep(delay)
+
+        if mission is None:
+            comms.send_message(conn, b'')
+            comms.send_message(conn, struct.pack('!dbb', 0.0, 1, 0))
+            comms.send_message(conn, b'{}')
+            return True
+
+        mission.commands = match.group(2).decode().split('\n') if match and match.group(2) else []
+        mission.tick += 1
+        if self.episode_length is not None and mission.tick >= self.episode_length:
+            mission.done = True
+        pov, info = self._observation(role, mission)
+        comms.send_message(conn, pov)
+        comms.send_message(conn, struct.pack('!dbb', 0.0, int(mission.done), 1))
+        comms.send_message(conn, info)
+        return True
+
+    def _default_observation(self, role, tick):
+        frame = self._frames[tick % len(self._frames)] if self._frames is not None else None
+        return self._generator.no_op(frame)
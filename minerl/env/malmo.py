@@ -18,6 +18,7 @@
 # ------------------------------------------------------------------------------------------------
 import atexit
 import functools
+import json
 import locale
 import logging
 import multiprocessing
@@ -44,13 +45,60 @@ import psutil
 import Pyro4
 
 from random import Random
-from minerl.env import comms
+from minerl.env import comms, events
+from minerl.env.events import EventType
 import minerl.utils.process_watcher
+import minerl.utils.process_supervisor
 
 logger = logging.getLogger(__name__)
 
 malmo_version = "0.37.0"
 
+# Memory allowed on top of the JVM heap (metaspace, native buffers, the launcher) when a memory cap is
+# derived from max_mem.
+JVM_MEMORY_OVERHEAD = 1 << 30
+
+
+def _parse_mem(mem):
+    """Parses a memory size in the format of Java's -Xmx flag (e.g. 4G) into bytes."""
+    if mem is None or isinstance(mem, int):
+        return mem
+    units = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+    mem = str(mem).strip().lower()
+    if mem and mem[-1] in units:
+        return int(float(mem[:-1]) * units[mem[-1]])
+    return int(mem)
+
+
+def _parse_cpu_list(cpu_list):
+    """Parses a Linux cpu list (e.g. 0-3,8,10-11) into a list of core ids."""
+    cpus = []
+    for part in cpu_list.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-')
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def _numa_nodes():
+    """Gets the cores of every NUMA node (a single node containing every core if unknown)."""
+    node_dir = '/sys/devices/system/node'
+    nodes = []
+    try:
+        for name in sorted(os.listdir(node_dir)):
+            if name.startswith('node') and name[4:].isdigit():
+                with open(os.path.join(node_dir, name, 'cpulist')) as f:
+                    nodes.append(_parse_cpu_list(f.read()))
+    except OSError:
+        pass
+    if not nodes:
+        nodes = [list(range(os.cpu_count() or 1))]
+    return nodes
+
 
 class SeedType(IntEnum):
     """The seed type for an instance manager.
@@ -110,6 +158,13 @@ class InstanceManager:
     _seed_type = SeedType.NONE
     _seed_generator = None
 
+    # Resource placement, see configure_placement.
+    _cpus_per_instance = None
+    _placement_cpus = None
+    _cgroup = None
+    _mem_limit = None
+    _assigned_cpus = set()
+
     @classmethod
     def _init_seeding(cls, seed_type=int(SeedType.NONE), seeds=None):
         """Sets the seeding type of the Instance manager object.
@@ -202,7 +257,8 @@ class InstanceManager:
                 else:
                     status_dir = None
 
-                inst = MinecraftInstance(cls._get_valid_port(), status_dir=status_dir, instance_id=instance_id)
+                inst = MinecraftInstance(cls._get_valid_port(), status_dir=status_dir, instance_id=instance_id,
+                                         cpus=cls._assign_cpus(), mem_limit=cls._mem_limit, cgroup=cls._cgroup)
                 cls._instance_pool.append(inst)
                 inst._acquire_lock(pid)
 
@@ -298,6 +354,66 @@ class InstanceManager:
         """Configure the lowest or base port for Malmo"""
         cls._malmo_base_port = malmo_base_port
 
+    @staticmethod
+    def add_event_sink(sink):
+        """Registers a sink (see minerl.env.events) for the lifecycle events of all instances."""
+        return events.add_sink(sink)
+
+    @staticmethod
+    def remove_event_sink(sink):
+        events.remove_sink(sink)
+
+    @classmethod
+    def configure_placement(cls, cpus_per_instance=None, cpus=None, cgroup=None, mem_limit=None):
+        """Configure the resource placement of the instances the manager launches.
+
+        Args:
+            cpus_per_instance (int, optional): Pin every instance to its own disjoint set of this many cores.
+                Core sets are kept within a single NUMA node when possible.
+            cpus (list, optional): The cores instances may be pinned to. Defaults to the affinity of this process.
+                Exclude the cores used by learner threads here.
+            cgroup (str, optional): A cgroup v2 directory under which each instance gets its own child cgroup.
+            mem_limit (str, optional): A hard memory cap for each instance (e.g. 6G), enforced through the cgroup.
+                Defaults to the instance's max_mem plus JVM_MEMORY_OVERHEAD.
+        """
+        if cpus is None and hasattr(os, 'sched_getaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
+        cls._cpus_per_instance = cpus_per_instance
+        cls._placement_cpus = list(cpus) if cpus is not None else None
+        cls._cgroup = cgroup
+        cls._mem_limit = mem_limit
+
+    @classmethod
+    def _assign_cpus(cls):
+        """Picks a set of cores disjoint from those of every other instance, or None if pinning is off."""
+        if not cls._cpus_per_instance or cls._placement_cpus is None:
+            return None
+        n = cls._cpus_per_instance
+        allowed = set(cls._placement_cpus)
+        for node in _numa_nodes():
+            free = [c for c in node if c in allowed and c not in cls._assigned_cpus]
+            if len(free) >= n:
+                cpus = free[:n]
+                break
+        else:
+            free = [c for c in cls._placement_cpus if c not in cls._assigned_cpus]
+            if len(free) < n:
+                logger.warning("Not enough free cores to pin another instance to {} cores; "
+                               "launching it unpinned.".format(n))
+                return None
+            cpus = free[:n]
+        cls._assigned_cpus.update(cpus)
+        return cpus
+
+    @classmethod
+    def _release_cpus(cls, cpus):
+        cls._assigned_cpus.difference_update(cpus or [])
+
+    @classmethod
+    def placements(cls):
+        """Gets the resource placement of every launched instance in the pool."""
+        return [inst.placement for inst in cls._instance_pool if inst.placement is not None]
+
     @classmethod
     def _get_valid_port(cls):
         malmo_base_port = cls._malmo_base_port
@@ -330,11 +446,16 @@ class MinecraftInstance(object):
     """
     MAX_PIPE_LENGTH = 500
 
-    def __init__(self, port=None, existing=False, status_dir=None, seed=None, instance_id=None, max_mem=None):
+    def __init__(self, port=None, existing=False, status_dir=None, seed=None, instance_id=None, max_mem=None,
+                 cpus=None, mem_limit=None, cgroup=None):
         """
         Launches the subprocess.
 
         Note: max_mem should be a string following the same format as Java's -Xmx flag (e.g. 4G = 4 gigs of max mem).
+
+        Note: cpus is a list of cores the process is pinned to. mem_limit (same format as max_mem) caps the memory
+        of the whole process tree and requires cgroup, a cgroup v2 directory under which the instance gets its own
+        child cgroup. If only cgroup is given the cap is max_mem plus JVM_MEMORY_OVERHEAD.
         """
         self.running = False
         self._starting = True
@@ -353,6 +474,12 @@ class MinecraftInstance(object):
         self._status_dir = status_dir
         self.owner = None
         self._max_mem = max_mem
+        self._cpus = list(cpus) if cpus is not None else None
+        self._mem_limit = mem_limit
+        self._cgroup_parent = cgroup
+        self._cgroup = None
+        self.placement = None
+        self._launch_time = None
 
         self.instance_id = instance_id
 
@@ -391,17 +518,25 @@ class MinecraftInstance(object):
             # 0. Get PID of launcher.
             parent_pid = os.getpid()
             # 1. Launch minecraft process and 
+            self._launch_time = time.time()
             self.minecraft_process = self._launch_minecraft(
                 port,
                 InstanceManager.headless,
                 self.minecraft_dir,
                 replaceable=replaceable)
+            self.publish_event(EventType.LAUNCHED, pid=self.minecraft_process.pid)
 
-            # 2. Create a watcher process to ensure things get cleaned up
+            # 2. Register with the per-host supervisor to ensure things get cleaned up.
+            # Note: instance_dir is the shared package directory, so it must never be
+            # registered as a temporary directory.
             if not daemonize:
-                # 2. Create a watcher process to ensure things get cleaned up
-                self.watcher_process = minerl.utils.process_watcher.launch(
-                    parent_pid, self.minecraft_process.pid, self.instance_dir)
+                try:
+                    minerl.utils.process_supervisor.register(parent_pid, self.minecraft_process.pid)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    logger.warning("Could not register with the process supervisor ({}); "
+                                   "falling back to a dedicated watcher.".format(e))
+                    self.watcher_process = minerl.utils.process_watcher.launch(
+                        parent_pid, self.minecraft_process.pid)
 
             # wait until Minecraft process has outputed "CLIENT enter state: DORMANT"
             lines = []
@@ -434,17 +569,20 @@ class MinecraftInstance(object):
                 port_received = MALMOENVPORTSTR in line
                 if port_received:
                     self._port = int(line.split(MALMOENVPORTSTR)[-1].strip())
+                    self.publish_event(EventType.PORT_BOUND, duration=time.time() - self._launch_time)
 
                 client_ready = "CLIENT enter state: DORMANT" in line
                 server_ready = "SERVER enter state: DORMANT" in line
 
                 if client_ready:
+                    self.publish_event(EventType.DORMANT, duration=time.time() - self._launch_time)
                     break
 
             if not self.port:
                 raise RuntimeError(
                     "Malmo failed to start the MalmoEnv server! Check the logs from the Minecraft process.")
             self._logger.info("Minecraft process ready")
+            self._record_placement()
 
             if not port == self._port:
                 self._logger.warning(
@@ -519,6 +657,14 @@ class MinecraftInstance(object):
         """
         self._destruct(should_close=True)
 
+    def publish_event(self, type, duration=None, **details):
+        """Publishes a lifecycle event of this instance to the event sinks."""
+        if not events.has_sinks():
+            return
+        events.publish(events.InstanceEvent(
+            type, self.uuid, instance_id=self.instance_id, host=self.host, port=self.port, duration=duration,
+            details=details))
+
     @property
     def status_dir(self):
         return self._status_dir
@@ -587,6 +733,8 @@ class MinecraftInstance(object):
         if replaceable:
             cmd.append('-replaceable')
         preexec_fn = os.setsid if 'linux' in str(sys.platform) or sys.platform == 'darwin' else None
+        if preexec_fn is not None and (self._cpus or self._cgroup_parent):
+            preexec_fn = self._placement_preexec_fn()
         # print(preexec_fn)
         minecraft_process = psutil.Popen(cmd,
                                          cwd=InstanceManager.MINECRAFT_DIR,
@@ -598,6 +746,85 @@ class MinecraftInstance(object):
                                          )
         return minecraft_process
 
+    def _placement_preexec_fn(self):
+        """Makes the function run in the child before exec to place it on its cores and in its cgroup."""
+        cgroup_procs = None
+        if self._cgroup_parent:
+            try:
+                cgroup_procs = self._create_cgroup()
+            except OSError as e:
+                self._logger.warning("Could not create a cgroup under {}: {}".format(self._cgroup_parent, e))
+                self._cgroup = None
+        cpus = self._cpus if hasattr(os, 'sched_setaffinity') else None
+
+        def preexec_fn():
+            os.setsid()
+            if cgroup_procs is not None:
+                # Writing 0 moves the writing process; the JVM inherits the cgroup.
+                fd = os.open(cgroup_procs, os.O_WRONLY)
+                try:
+                    os.write(fd, b'0')
+                finally:
+                    os.close(fd)
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+
+        return preexec_fn
+
+    def _create_cgroup(self):
+        """Creates the cgroup of the instance and returns the path of its cgroup.procs file."""
+        self._cgroup = os.path.join(self._cgroup_parent, 'minerl_{}'.format(self.uuid))
+        os.makedirs(self._cgroup, exist_ok=True)
+
+        mem_limit = _parse_mem(self._mem_limit)
+        if mem_limit is None and self._max_mem:
+            mem_limit = _parse_mem(self._max_mem) + JVM_MEMORY_OVERHEAD
+        self._mem_limit = mem_limit
+
+        settings = {'memory.max': mem_limit, 'cpuset.cpus': ','.join(str(c) for c in self._cpus or [])}
+        for name, value in settings.items():
+            if not value:
+                continue
+            try:
+                with open(os.path.join(self._cgroup, name), 'w') as f:
+                    f.write(str(value))
+            except OSError as e:
+                # The controller may not be enabled in the parent's cgroup.subtree_control.
+                self._logger.warning("Could not set {} of {}: {}".format(name, self._cgroup, e))
+        return os.path.join(self._cgroup, 'cgroup.procs')
+
+    def _record_placement(self):
+        """Records where the instance runs so that step latency can be correlated with placement."""
+        numa_node = None
+        if self._cpus:
+            for i, node in enumerate(_numa_nodes()):
+                if set(self._cpus).issubset(node):
+                    numa_node = i
+        self.placement = {
+            'instance_id': self.instance_id,
+            'port': self.port,
+            'pid': self.minecraft_process.pid,
+            'cpus': self._cpus,
+            'numa_node': numa_node,
+            'max_mem': self._max_mem,
+            'mem_limit': _parse_mem(self._mem_limit),
+            'cgroup': self._cgroup,
+        }
+        self._logger.info("Minecraft placement: {}".format(self.placement))
+        if self.status_dir:
+            with open(os.path.join(self.status_dir, 'placement.json'), 'w') as f:
+                json.dump(self.placement, f)
+
+    def _release_placement(self):
+        InstanceManager._release_cpus(self._cpus)
+        self._cpus = None
+        if self._cgroup is not None:
+            try:
+                os.rmdir(self._cgroup)
+            except OSError as e:
+                self._logger.warning("Could not remove cgroup {}: {}".format(self._cgroup, e))
+            self._cgroup = None
+
     @staticmethod
     def _kill_minecraft_via_malmoenv(host, port):
         """Use carefully to cause the Minecraft service to exit (and hopefully restart).
@@ -643,6 +870,10 @@ class MinecraftInstance(object):
                 minerl.utils.process_watcher.reap_process_and_children(self.minecraft_process)
             except psutil.NoSuchProcess:
                 pass
+            minerl.utils.process_supervisor.unregister(self.minecraft_process.pid)
+            self._release_placement()
+            self.publish_event(EventType.KILLED,
+                               duration=time.time() - self._launch_time if self._launch_time else None)
 
             if self in InstanceManager._instance_pool:
                 InstanceManager._instance_pool.remove(self)
@@ -763,12 +994,21 @@ def launch_instance_manager():
     parser.add_argument("--max_instances", type=int, default=None,
                         help="The maximum number of instances the instance manager is able to spawn,"
                              "before an exception is thrown. Defaults to Unlimited.")
+    parser.add_argument("--cpus_per_instance", type=int, default=None,
+                        help="Pin every instance to its own disjoint set of this many cores.")
+    parser.add_argument("--cgroup", type=str, default=None,
+                        help="A cgroup v2 directory under which every instance gets its own cgroup.")
+    parser.add_argument("--mem_limit", type=str, default=None,
+                        help="A hard memory cap for every instance (e.g. 6G). Requires --cgroup.")
     opts = parser.parse_args()
 
     if opts.max_instances is not None:
         assert opts.max_instances > 0, "Maximum instances must be more than zero!"
         InstanceManager.MAXINSTANCES = opts.max_instances
 
+    InstanceManager.configure_placement(
+        cpus_per_instance=opts.cpus_per_instance, cgroup=opts.cgroup, mem_limit=opts.mem_limit)
+
     try:
         print("Removing the performance directory!")
         try:
@@ -0,0 +1,159 @@
+"""Generates the payloads a Malmo instance sends for an observation.
+
+This is the inverse of the observation handlers' ``from_hero``: given an observation in the space of an
+env spec it produces the POV frame bytes and the info JSON which, when decoded by the handlers, yield
+that observation again. It is used to serve observations without a Minecraft instance.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from minerl.herobraine.hero import spaces
+from minerl.herobraine.hero.handlers.agent.observations.equipped_item import _DamageObservation, _TypeObservation
+from minerl.herobraine.hero.handlers.agent.observations.inventory import FlatInventory, FlatInventoryObservation
+from minerl.herobraine.hero.handlers.agent.observations.nearby_entities import NearbyEntitiesObservation
+from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation
+from minerl.herobraine.hero.handlers.translation import (KeymapTranslationHandler, TranslationHandler,
+                                                         TranslationHandlerGroup)
+
+logger = logging.getLogger(__name__)
+
+# An info dict recorded from a Malmo instance running Navigate, the reference for the format of payloads.
+RECORDED_INFO_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'info.npz')
+
+
+def load_recorded_info() -> Dict[str, Any]:
+    """Loads the recorded info dict, with its POV frame (upright, not as sent) under 'pov'."""
+    return np.load(RECORDED_INFO_PATH, allow_pickle=True)['arr_0'].item()
+
+
+def _to_json_value(x):
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return x
+
+
+def _set_path(d, keys, value):
+    for key in keys[:-1]:
+        d = d.setdefault(key, {})
+    d[keys[-1]] = value
+
+
+class HeroPayloadGenerator(object):
+    """Produces hero payloads for the observables of an env spec.
+
+    Args:
+        observables (List[TranslationHandler]): The observation handlers of the env spec.
+    """
+
+    def __init__(self, observables: List[TranslationHandler]):
+        self.observables = list(observables)
+        self.pov_handler = next((h for h in self.observables if isinstance(h, POVObservation)), None)
+        self.space = spaces.Dict([(h.to_string(), h.space) for h in self.observables])
+        self._warned = set()
+
+    @classmethod
+    def from_env_spec(cls, env_spec):
+        return cls(env_spec.observables)
+
+    def no_op(self, frame: np.ndarray = None) -> Dict[str, Any]:
+        """The no-op observation, with the given POV frame.
+
+        POV frames are at the raw shape Minecraft renders, before the handler's preprocessing.
+        """
+        obs = self.space.no_op()
+        if self.pov_handler is not None:
+            if frame is None and self.pov_handler.processed:
+                frame = np.zeros(self.pov_handler.raw_shape, dtype=np.uint8)
+            if frame is not None:
+                obs[self.pov_handler.to_string()] = frame
+        return obs
+
+    def payload(self, obs: Dict[str, Any], info: Dict[str, Any] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Gets the POV frame bytes and the info dict which decode to obs.
+
+        If an info dict is given the payload is added to it, e.g. to combine observations and monitors.
+        """
+        info = {} if info is None else info
+        pov = b''
+        entity_handlers = []
+        for h in self.observables:
+            if isinstance(h, NearbyEntitiesObservation):
+                entity_handlers.append(h)
+            elif h is self.pov_handler:
+                frame = obs[h.to_string()]
+                if np.shape(frame) != h.raw_shape:
+                    raise ValueError("POV frames must have the raw shape {} to be sent, not {}".format(
+                        h.raw_shape, np.shape(frame)))
+                pov = self.frame_bytes(frame)
+            else:
+                self._add(h, obs[h.to_string()], info)
+        # Entities are positioned relative to the agent, whose position the other handlers add.
+        origin = [info.get(k, 0.0) for k in ('xpos', 'ypos', 'zpos')]
+        for h in entity_handlers:
+            info[h.to_string()] = h.to_entities(obs[h.to_string()], origin)
+        return pov, info
+
+    def encode(self, obs: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        """Gets the POV frame bytes and the UTF-8 info JSON as sent over the wire."""
+        pov, info = self.payload(obs)
+        return pov, json.dumps(info).encode('utf-8')
+
+    def hero_paths(self) -> Dict[str, List[str]]:
+        """Maps the '/'-joined paths of the keymapped observations to their keys in the info dict.
+
+        Groups of a single observation can also be addressed by their own name, e.g. ``'mob_kills'`` for
+        ``'mob_kills/mob_kills'``.
+        """
+        paths = {}
+        for h in self.observables:
+            self._collect_paths(h, [], paths)
+        return paths
+
+    @staticmethod
+    def frame_bytes(frame: np.ndarray) -> bytes:
+        # Malmo sends frames bottom row first.
+        return np.ascontiguousarray(frame[::-1], dtype=np.uint8).tobytes()
+
+    def _collect_paths(self, h, prefix, paths):
+        name = prefix + [h.to_string()]
+        if isinstance(h, TranslationHandlerGroup):
+            for child in h.handlers:
+                self._collect_paths(child, name, paths)
+            leaf = '/'.join(name + [h.handlers[0].to_string()]) if len(h.handlers) == 1 else None
+            if leaf in paths:
+                paths.setdefault('/'.join(name), paths[leaf])
+        elif isinstance(h, KeymapTranslationHandler) and not isinstance(
+                h, (POVObservation, FlatInventoryObservation, _TypeObservation, _DamageObservation)):
+            paths['/'.join(name)] = list(h.hero_keys)
+
+    def _add(self, h, value, info):
+        if isinstance(h, TranslationHandlerGroup):
+            for child in h.handlers:
+                self._add(child, value[child.to_string()], info)
+        elif isinstance(h, FlatInventoryObservation):
+            inventory = info.setdefault('inventory', [])
+            if isinstance(value, FlatInventory):
+                items = list(h.slots)
+                stacks = [(items[slot], value.counts[slot]) for slot in np.flatnonzero(value.counts)]
+            else:
+                stacks = [(item, value[item]) for item in h.items]
+            for item, quantity in stacks:
+                if int(quantity) > 0:
+                    inventory.append({'type': item, 'quantity': int(quantity)})
+        elif isinstance(h, _TypeObservation):
+            _set_path(info, ['equipped_items'] + h._keys + ['type'], str(value))
+        elif isinstance(h, _DamageObservation):
+            _set_path(info, ['equipped_items'] + h._keys + [h.hero_key], _to_json_value(value))
+        elif isinstance(h, KeymapTranslationHandler):
+            _set_path(info, h.hero_keys, _to_json_value(value))
+        elif type(h) not in self._warned:
+            self._warned.add(type(h))
+            logger.warning("No hero payload for {}; it will observe its default.".format(type(h).__name__))
+
@@ -0,0 +1,150 @@
+"""Computes rewards from the deltas of stat observations, declared as a table of weights::
+
+    engine = RewardEngine({'damage_dealt': 2, 'damage_taken': -1, 'mob_kills': 100}, time_penalty=1)
+    engine.reset()
+    reward = engine.step(obs, done)
+
+Stats are addressed by their '/'-joined observation path, where groups of a single stat can be addressed by
+their own name (``'mob_kills'`` for ``'mob_kills/mob_kills'``). Every step pays the weights times the amount
+by which the stats exceeded their highest value so far in the episode, minus the time penalty, and the last
+step of an episode also pays the terminal bonuses times the stats' values.
+
+The same engine steps a batch of environments, e.g. of a vectorized env, whose observations have a leading
+batch dimension, and relabels recorded trajectories with other weights without running their episodes again.
+"""
+
+import collections.abc
+from collections import OrderedDict
+from typing import Any, Dict, Sequence, Union
+
+import numpy as np
+
+Observation = Dict[str, Any]
+
+
+class RewardEngine(object):
+    """Rewards the increases of stats, with a penalty per step and bonuses at the end of episodes.
+
+    Args:
+        stat_weights (Dict[str, float]): The reward per unit of increase of every stat.
+        time_penalty (float, optional): Subtracted from the reward of every step.
+        terminal_bonuses (Dict[str, float], optional): The reward per unit of every stat at the last step of an
+            episode, e.g. ``{'life_stats/is_alive': 50}`` for ending episodes alive.
+    """
+
+    def __init__(self, stat_weights: Dict[str, float], time_penalty: float = 0.0,
+                 terminal_bonuses: Dict[str, float] = None):
+        terminal_bonuses = terminal_bonuses or {}
+        self.stats = tuple(OrderedDict.fromkeys(list(stat_weights) + list(terminal_bonuses)))
+        self.paths = tuple(_path(stat) for stat in self.stats)
+        self.weights = np.array([stat_weights.get(stat, 0.0) for stat in self.stats], dtype=np.float64)
+        self.terminal_bonuses = np.array([terminal_bonuses.get(stat, 0.0) for stat in self.stats],
+                                         dtype=np.float64)
+        self.time_penalty = float(time_penalty)
+        self._has_terminal_bonuses = bool(terminal_bonuses)
+        self._stat_weights = list(zip(self.paths, self.weights.tolist(), self.terminal_bonuses.tolist()))
+        # The highest stats of the episode(s) so far: a list for a single env, else an array shaped like the
+        # stat vectors of the last step.
+        self._best = None
+
+    def reset(self, indices=None):
+        """Starts new episodes, of all environments or of those at indices of a batch."""
+        if indices is None or not isinstance(self._best, np.ndarray) or self._best.ndim == 1:
+            self._best = None
+        else:
+            self._best[indices] = 0
+
+    def step(self, obs: Observation, done: Union[bool, np.ndarray] = False) -> Union[float, np.ndarray]:
+        """Gets the reward of a step from its observation, or the rewards of a batch of steps.
+
+        Rewards are floats for single observations and arrays for batched ones, with done an array too.
+        """
+        if np.ndim(_walk(obs, self.paths[0])) == 0:
+            return self._step_single(obs, done)
+        stats = self.stat_vector(obs)
+        if not isinstance(self._best, np.ndarray):
+            self._best = np.zeros_like(stats)
+        best = np.maximum(self._best, stats)
+        reward = (best - self._best) @ self.weights - self.time_penalty
+        self._best = best
+        if self._has_terminal_bonuses:
+            reward = reward + np.asarray(done) * (stats @ self.terminal_bonuses)
+        return float(reward) if np.ndim(reward) == 0 else reward
+
+    def _step_single(self, obs: Observation, done: bool) -> float:
+        # A single env steps in plain Python floats, which is far faster than numpy for a few stats.
+        best = self._best
+        if best is None:
+            best = self._best = [0.0] * len(self.paths)
+        elif isinstance(best, np.ndarray):
+            best = self._best = best.tolist()
+        reward = -self.time_penalty
+        for i, (path, weight, bonus) in enumerate(self._stat_weights):
+            stat = float(_walk(obs, path))
+            if stat > best[i]:
+                reward += (stat - best[i]) * weight
+                best[i] = stat
+            if done and bonus:
+                reward += stat * bonus
+        return reward
+
+    def stat_vector(self, obs: Observation) -> np.ndarray:
+        """Gets the stats of an observation as a vector, or an array of them for batched observations."""
+        values = [_walk(obs, path) for path in self.paths]
+        if np.ndim(values[0]) == 0:
+            # Converting the scalars in Python is far faster than stacking 0-d arrays.
+            return np.array([float(v) for v in values])
+        return np.stack([np.asarray(v, dtype=np.float64) for v in values], axis=-1)
+
+    def stat_vectors(self, observations: Union[Observation, Sequence[Observation]]) -> np.ndarray:
+        """Gets the stats of a trajectory, a sequence of observations or one batched along time, as a
+        (steps, ..., stats) array."""
+        if isinstance(observations, collections.abc.Mapping):
+            return self.stat_vector(observations)
+        return np.stack([self.stat_vector(obs) for obs in observations])
+
+    def relabel(self, stats: np.ndarray, dones: np.ndarray = None) -> np.ndarray:
+        """Gets the rewards of a recorded trajectory without running it again.
+
+        Args:
+            stats (np.ndarray): The stat vectors of the steps, (steps, ..., stats), e.g. from stat_vectors();
+                their last axis must be ordered as self.stats.
+            dones (np.ndarray, optional): Whether every step ended its episode, (steps, ...). A new episode
+                starts after every done step. Defaults to the last step ending the only episode.
+        """
+        stats = np.asarray(stats, dtype=np.float64)
+        if dones is None:
+            dones = np.zeros(stats.shape[:-1], dtype=bool)
+            dones[-1] = True
+        dones = np.asarray(dones, dtype=bool)
+
+        # The highest stats of every episode so far, which restart from 0 after every done step.
+        best = np.maximum(stats, 0)
+        if dones[:-1].any():
+            for t in range(1, len(best)):
+                best[t] = np.where(dones[t - 1, ..., None], best[t], np.maximum(best[t], best[t - 1]))
+        else:
+            best = np.maximum.accumulate(best, axis=0)
+        previous = np.zeros_like(best)
+        previous[1:] = np.where(dones[:-1, ..., None], 0, best[:-1])
+
+        rewards = (best - previous) @ self.weights - self.time_penalty
+        if self._has_terminal_bonuses:
+            rewards += dones * (stats @ self.terminal_bonuses)
+        return rewards
+
+    def __repr__(self):
+        return "RewardEngine({}, time_penalty={}, terminal_bonuses={})".format(
+            dict(zip(self.stats, self.weights.tolist())), self.time_penalty,
+            dict(zip(self.stats, self.terminal_bonuses.tolist())))
+
+
+def _path(stat: str) -> tuple:
+    keys = tuple(stat.split('/'))
+    return keys * 2 if len(keys) == 1 else keys
+
+
+def _walk(obs, path):
+    for key in path:
+        obs = obs[key]
+    return obs
@@ -0,0 +1,154 @@
+import threading
+
+import Pyro4
+import pytest
+
+from minerl.env.broker import BrokerClient, HostAgent, InstanceBroker
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeInstance(object):
+    def __init__(self, port):
+        self.port = port
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+
+class FakeFactory(object):
+    def __init__(self, base_port):
+        self.base_port = base_port
+        self.instances = []
+
+    def __call__(self, instance_id):
+        inst = FakeInstance(self.base_port + len(self.instances))
+        self.instances.append(inst)
+        return inst
+
+
+def make_broker(capacities, ttl=10):
+    clock = FakeClock()
+    broker = InstanceBroker(lease_ttl=ttl, clock=clock, connect=lambda agent: agent)
+    factories = {}
+    for i, (name, capacity) in enumerate(capacities.items()):
+        factories[name] = FakeFactory(9000 + 100 * i)
+        broker.register_host(name, HostAgent(capacity, factories[name]), name)
+    return broker, clock, factories
+
+
+def test_balances_by_load():
+    broker, _, _ = make_broker({'a': 2, 'b': 4})
+    hosts = [broker.acquire('client')['host'] for _ in range(6)]
+    assert sorted(hosts) == ['a', 'a', 'b', 'b', 'b', 'b']
+    # Hosts fill proportionally to their capacity.
+    assert hosts[:3].count('b') >= 1 and hosts[:3].count('a') >= 1
+
+    with pytest.raises(RuntimeError):
+        broker.acquire('client')
+
+
+def test_release_reuses_warm_instance():
+    broker, _, factories = make_broker({'a': 1})
+    lease = broker.acquire('client')
+    assert broker.release(lease['lease_id'])
+    assert not broker.release(lease['lease_id'])
+
+    again = broker.acquire('other')
+    assert again['port'] == lease['port']
+    assert len(factories['a'].instances) == 1
+
+
+def test_expired_lease_is_reclaimed():
+    broker, clock, factories = make_broker({'a': 1}, ttl=10)
+    kept = broker.acquire('client')
+    clock.now = 8
+    broker.renew(kept['lease_id'])
+    clock.now = 15
+    assert broker.reap_expired() == []
+
+    clock.now = 18
+    assert broker.reap_expired() == [kept['lease_id']]
+    assert factories['a'].instances[0].killed
+    with pytest.raises(KeyError):
+        broker.renew(kept['lease_id'])
+
+    # The capacity is free again and a fresh instance is launched.
+    broker.acquire('client')
+    assert len(factories['a'].instances) == 2
+
+
+def test_discarded_instance_is_stopped():
+    broker, _, factories = make_broker({'a': 1})
+    lease = broker.acquire('client')
+    assert broker.discard(lease['lease_id'])
+    assert not broker.release(lease['lease_id'])
+    assert factories['a'].instances[0].killed
+    assert broker.status()[0]['idle'] == 0
+
+    # A fresh instance is launched rather than the broken one being leased again.
+    assert broker.acquire('other')['port'] != lease['port']
+    assert len(factories['a'].instances) == 2
+
+
+def test_failed_launch_tries_next_host():
+    broker, _, _ = make_broker({'a': 1, 'b': 1})
+
+    def broken(instance_id):
+        raise EOFError("Minecraft process finished unexpectedly.")
+
+    broker.register_host('a', HostAgent(1, broken), 'a')
+    assert broker.acquire('client')['host'] == 'b'
+    with pytest.raises(RuntimeError):
+        broker.acquire('client')
+    assert [h['pending'] for h in broker.status()] == [0, 0]
+
+
+def test_client_renews_and_releases():
+    broker, clock, _ = make_broker({'a': 2}, ttl=10)
+    client = BrokerClient(broker, client_id='test', renew_interval=1000)
+    first, second = client.acquire(), client.acquire()
+
+    clock.now = 9
+    assert client.renew() == []
+    clock.now = 15
+    broker.reap_expired()
+    assert {h['leased'] for h in broker.status()} == {2}
+
+    client.release(first)
+    clock.now = 100
+    broker.reap_expired()
+    assert client.renew() == [second]
+    client.close()
+
+
+def test_broker_and_agents_over_pyro():
+    daemon = Pyro4.Daemon(host='localhost')
+    broker = InstanceBroker(lease_ttl=30)
+    broker_uri = daemon.register(broker)
+    agents = {}
+    for name in ['host0', 'host1']:
+        agents[name] = daemon.register(HostAgent(1, FakeFactory(9000)))
+    thread = threading.Thread(target=daemon.requestLoop)
+    thread.daemon = True
+    thread.start()
+    try:
+        for name, uri in agents.items():
+            Pyro4.Proxy(broker_uri).register_host(name, str(uri), 'localhost')
+
+        client = BrokerClient(str(broker_uri), client_id='test')
+        leases = [client.acquire(), client.acquire()]
+        assert sorted(l['host_name'] for l in leases) == ['host0', 'host1']
+        assert all(l['host'] == 'localhost' for l in leases)
+        assert client.renew() == []
+        client.close()
+        assert sum(h['idle'] for h in Pyro4.Proxy(broker_uri).status()) == 2
+    finally:
+        daemon.shutdown()
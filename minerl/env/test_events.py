@@ -0,0 +1,56 @@
+from minerl.env import events
+from minerl.env.events import EventType, InstanceEvent, JSONLSink, RingBufferSink, availability, time_to_recover
+from minerl.env.malmo import InstanceManager, MinecraftInstance
+
+
+def _event(type, t, slot=0):
+    return InstanceEvent(type, 'uuid{}'.format(slot), instance_id=slot, timestamp=t)
+
+
+def test_instances_publish_to_sinks(tmp_path):
+    ring = InstanceManager.add_event_sink(RingBufferSink(maxlen=2))
+    jsonl = InstanceManager.add_event_sink(JSONLSink(str(tmp_path / 'events.jsonl')))
+    try:
+        inst = MinecraftInstance(9000, instance_id=3)
+        for type in [EventType.LAUNCHED, EventType.PORT_BOUND, EventType.DORMANT]:
+            inst.publish_event(type, duration=1.5, pid=42)
+    finally:
+        InstanceManager.remove_event_sink(ring)
+        InstanceManager.remove_event_sink(jsonl)
+        jsonl.close()
+    assert not events.has_sinks()
+
+    assert [e.type for e in ring.events()] == [EventType.PORT_BOUND, EventType.DORMANT]
+    written = events.read_jsonl(str(tmp_path / 'events.jsonl'))
+    assert [e.type for e in written] == [EventType.LAUNCHED, EventType.PORT_BOUND, EventType.DORMANT]
+    assert written[1].to_dict() == ring.events()[0].to_dict()
+    assert written[0].details == {'pid': 42} and written[0].port == 9000 and written[0].slot == 3
+
+
+def test_failing_sink_does_not_raise():
+    class Broken(events.EventSink):
+        def emit(self, event):
+            raise IOError("disk full")
+
+    sink = events.add_sink(Broken())
+    try:
+        events.publish(_event(EventType.KILLED, 0))
+    finally:
+        events.remove_sink(sink)
+
+
+def test_time_to_recover_and_availability():
+    log = [
+        _event(EventType.MISSION_STARTED, 0, slot=0),
+        _event(EventType.MISSION_STARTED, 0, slot=1),
+        _event(EventType.SOCKET_ERROR, 10, slot=0),
+        _event(EventType.CLEANED, 12, slot=0),
+        _event(EventType.RESTARTED, 30, slot=0),
+        _event(EventType.MISSION_STARTED, 40, slot=0),
+        _event(EventType.SOCKET_ERROR, 90, slot=1),
+        _event(EventType.MISSION_ENDED, 100, slot=1),
+    ]
+    assert time_to_recover(log) == [30]
+    # 30s down on slot 0 and an ongoing 10s outage on slot 1 out of 200s observed.
+    assert availability(log) == 1 - 40 / 200
+    assert availability([]) is None
@@ -2,8 +2,12 @@ from minerl.herobraine.hero import handlers
 from typing import List
 from minerl.herobraine.hero.handlers.translation import TranslationHandler
 import time
+from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
 from minerl.herobraine.env_specs.navigate_specs import Navigate
 
+import gym
+import pytest
+
 import coloredlogs
 import logging
 
@@ -60,6 +64,75 @@ def test_fake_navigate_with_distance_monitor():
         assert "distance" in fake_monitor["compass"]
 
 
+def test_fake_combat_with_scripted_stats():
+    fake_env = gym.make(PunchCowEnvSpec().name, fake=True, fake_stats={
+        'damage_dealt': lambda tick: 2 * tick,
+        'mob_kills': [0] * 10 + [1],
+    })
+    # The init commands of the combat env take the first steps.
+    obs = fake_env.reset()
+    tick = fake_env.unwrapped._fake_tick
+    assert obs['damage_dealt']['damage_dealt'] == 2 * tick
+    assert not obs['pov'].flags.writeable
+
+    done, steps, rewards = False, 0, []
+    while not done:
+        obs, reward, done, _ = fake_env.step(fake_env.action_space.no_op())
+        steps += 1
+        rewards.append(reward)
+        assert obs['pov'].shape == (360, 640, 3)
+    assert tick + steps == 10
+    assert obs['mob_kills']['mob_kills'] == 1 and obs['damage_taken']['damage_taken'] == 0
+    assert rewards[-1] == 2 * 2 + 100 - 1
+
+
+def test_fake_env_rejects_unknown_stats():
+    with pytest.raises(ValueError, match='scriptable stats'):
+        PunchCowEnvSpec().make(fake=True, fake_stats={'diamonds': [1]})
+
+
+def test_fake_episode_length():
+    fake_env = Navigate(dense=True, extreme=False).make(fake=True, fake_episode_length=3)
+    fake_env.reset()
+    assert [fake_env.step(fake_env.action_space.no_op())[2] for _ in range(3)] == [False, False, True]
+    with pytest.raises(RuntimeError):
+        fake_env.step(fake_env.action_space.no_op())
+    fake_env.reset()
+    assert not fake_env.step(fake_env.action_space.no_op())[2]
+
+
+def test_fake_action_repeat():
+    fake_env = Navigate(dense=True, extreme=False).make(fake=True, fake_episode_length=7, action_repeat=3)
+    fake_env.reset()
+    assert [fake_env.step(fake_env.action_space.no_op())[2] for _ in range(3)] == [False, False, True]
+    assert fake_env._fake_tick == 7
+
+
+def test_fake_combat_resolution_variants():
+    fake_env = gym.make('MineRLPunchCow-64-v0', fake=True)
+    assert fake_env.observation_space['pov'].shape == (64, 64, 3)
+    assert '<Width>64 </Width>' in fake_env.unwrapped.task.to_xml()
+    assert fake_env.reset()['pov'].shape == (64, 64, 3)
+
+    fake_env = gym.make(PunchCowEnvSpec().name, fake=True, resolution=(96, 54))
+    assert fake_env.unwrapped.task.name == 'MineRLPunchCow-96x54-v0'
+    assert fake_env.reset()['pov'].shape == (54, 96, 3)
+
+
+def test_combat_variants_registered_lazily():
+    import minerl.herobraine.envs as envs
+    assert 'MineRLFightZombie-128-v0' in envs.COMBAT_VARIANT_IDS
+    # The variants are registered with the kwargs of their base env spec; gym.make builds theirs.
+    kwargs = gym.spec('MineRLPunchCow-State-v0')._kwargs
+    assert kwargs['env_spec'] is envs.MINERL_PUNCH_COW_ENV_SPEC
+    assert kwargs['observe_pov'] is False
+    assert not any(isinstance(env, PunchCowEnvSpec) and not env.observe_pov for env in envs.ENVS)
+
+    fake_env = gym.make('MineRLPunchCow-State-v0', fake=True)
+    assert fake_env.unwrapped.task.name == 'MineRLPunchCow-State-v0'
+    assert 'pov' not in fake_env.reset()
+
+
 if __name__ == "__main__":
     # _test_fake_env(Navigate(dense=True, extreme=False), should_render=True)
     _test_fake_env(Navigate(dense=True, extreme=False, agent_count=3), should_render=True)
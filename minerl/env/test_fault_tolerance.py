@@ -0,0 +1,193 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from minerl.env import comms
+from minerl.env._singleagent import _SingleAgentEnv
+from minerl.env.broker import BrokerClient, HostAgent, InstanceBroker, LeasedInstance
+from minerl.env.faults import FaultInjector
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    pauses = []
+    monkeypatch.setattr(comms.time, 'sleep', pauses.append)
+    return pauses
+
+
+def test_backoff_is_bounded_and_exponential():
+    assert list(comms.backoff_delays(6, base=0.5, max_delay=3)) == [0.5, 1, 2, 3, 3]
+    assert list(comms.backoff_delays(1)) == []
+
+
+def test_call_with_backoff(no_sleep):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise socket.timeout("attempt {}".format(len(attempts)))
+        return 'ok'
+
+    assert comms.call_with_backoff(flaky, count=5, base=1, max_delay=10) == 'ok'
+    assert no_sleep == [1, 2]
+
+    attempts.clear()
+    with pytest.raises(socket.timeout, match='attempt 1'):
+        comms.call_with_backoff(flaky, count=2, base=1)
+
+
+def test_retry_decorator_retries(no_sleep):
+    calls = []
+
+    @comms.retry
+    def fails_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionRefusedError()
+        return len(calls)
+
+    assert fails_once() == 2
+
+
+class QuitServer(object):
+    """Just enough of the MalmoEnv protocol to connect to an instance and quit its episode."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('localhost', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _handle(conn):
+        with conn:
+            while True:
+                msg = comms.recv_message(conn)
+                if msg is None or msg == b'<Disconnect/>':
+                    return
+                if msg == b'<Quit/>':
+                    comms.send_message(conn, struct.pack('!I', 1))
+
+    def close(self):
+        self.sock.close()
+
+
+class Instance(object):
+    def __init__(self, port, instance_id=0):
+        self.host = 'localhost'
+        self.port = port
+        self.instance_id = instance_id
+        self.client_socket = None
+        self.existing = False
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+
+class ReplacingEnv(_SingleAgentEnv):
+    def __init__(self, servers):
+        super().__init__(Navigate(dense=False, extreme=False))
+        self.servers = servers
+        self.instances = [Instance(servers[0].port)]
+        self.configure_fault_tolerance(reconnect_attempts=3, backoff=0)
+
+    def _get_new_instance(self, port=None, instance_id=None):
+        return Instance(self.servers[1].port, instance_id)
+
+
+@pytest.fixture
+def servers():
+    servers = [QuitServer(), QuitServer()]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+def test_reconnects_with_backoff(servers):
+    env = ReplacingEnv(servers)
+    injector = FaultInjector().fail_at('connect', calls=[0, 1])
+    env.set_fault_injector(injector)
+
+    instance = env._connect_or_replace(0)
+    assert instance is env.instances[0] and not instance.killed
+    assert injector.calls('connect') == 3
+    assert instance.client_socket is not None
+    env._TO_MOVE_clean_connection(instance)
+
+
+def test_replaces_unreachable_instance(servers):
+    env = ReplacingEnv(servers)
+    old = env.instances[0]
+    env.set_fault_injector(FaultInjector().fail_at('connect', calls=[0, 1, 2]))
+
+    instance = env._connect_or_replace(0)
+    assert old.killed and instance is not old
+    assert instance.port == servers[1].port and instance.instance_id == old.instance_id
+    env._TO_MOVE_clean_connection(instance)
+
+
+def test_step_failure_reports_recovery(servers):
+    env = ReplacingEnv(servers)
+    env._connect_or_replace(0)
+    env.done = False
+    env.has_finished = {'agent_0': False}
+    last = env.observation_space.sample()
+    env._last_obs = {'agent_0': last}
+    env.set_fault_injector(FaultInjector().fail_at('step', calls=[0]))
+
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert done and reward == 0
+    assert obs is last
+    assert 'Injected fault' in info['error']['cause']
+    assert info['error']['during'] == 'step'
+    assert info['error']['recovered'] and not info['error']['episode_restarted']
+    assert info['error']['recovery_time'] >= 0
+    # The instance was reconnected, not replaced.
+    assert env.instances[0].port == servers[0].port and env.instances[0].client_socket is not None
+    env._TO_MOVE_clean_connection(env.instances[0])
+
+
+def test_replaces_leased_instance_with_new_lease(servers):
+    ports = iter(server.port for server in servers)
+    launched = {}
+
+    def launch(instance_id):
+        launched[instance_id] = Instance(next(ports))
+        return launched[instance_id]
+
+    broker = InstanceBroker(connect=lambda agent: agent)
+    broker.register_host('a', HostAgent(1, launch), 'localhost')
+    client = BrokerClient(broker, renew_interval=1000)
+    env = _SingleAgentEnv(Navigate(dense=False, extreme=False))
+    env.configure_fault_tolerance(reconnect_attempts=2, backoff=0)
+    env.instances = [client.get_instance()]
+    old = env.instances[0]
+    old_id = old.lease['instance_id']
+    env.set_fault_injector(FaultInjector().fail_at('connect', calls=[0, 1]))
+
+    instance = env._connect_or_replace(0)
+    # The broken instance was stopped, not returned to the idle pool, and a new one was leased.
+    assert isinstance(instance, LeasedInstance) and instance.port == servers[1].port
+    assert launched[old_id].killed and old.lease is None
+    assert broker.status() == [{'name': 'a', 'address': 'localhost', 'capacity': 1, 'leased': 1, 'idle': 0,
+                                'pending': 0}]
+    env._TO_MOVE_clean_connection(instance)
+    client.close()
@@ -0,0 +1,70 @@
+import gym
+import numpy as np
+import pytest
+
+import minerl  # noqa: F401
+from minerl.env.frame_stack import FrameStackWrapper, LazyFrames
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.herobraine.wrappers import Vectorized
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_frame_stack(lazy):
+    env = FrameStackWrapper(gym.make('MineRLPunchCow-64-v0', fake=True), num_stack=3, lazy=lazy)
+    assert env.observation_space['pov'].shape == (3, 64, 64, 3)
+    assert env.observation_space['mob_kills'] == env.env.observation_space['mob_kills']
+
+    obs = env.reset()
+    assert isinstance(obs['pov'], LazyFrames) == lazy
+    stack = np.asarray(obs['pov'])
+    assert stack.shape == (3, 64, 64, 3) and (stack == stack[:1]).all()
+    assert obs in env.observation_space
+
+    # Ring buffer stacks are views, valid until the next step.
+    frames = [stack[0].copy()] * 3
+    for _ in range(4):
+        obs, _, _, _ = env.step(env.action_space.no_op())
+        frames.append(np.array(env.env.unwrapped._last_pov['agent_0']))
+        assert (np.asarray(obs['pov']) == np.stack(frames[-3:])).all()
+
+
+def test_frame_stack_max_pools_skipped_frames():
+    inner = gym.make('MineRLPunchCow-64-v0', fake=True)
+    env = FrameStackWrapper(inner, num_stack=2, skip=2, max_pool=True)
+    env.reset()
+    tick = inner.unwrapped._fake_tick
+    obs, reward, _, _ = env.step(env.action_space.no_op())
+    assert inner.unwrapped._fake_tick == tick + 2
+    assert reward == -2
+
+    payloads = inner.unwrapped._fake_payloads
+    pooled = np.maximum(*[np.asarray(inner.unwrapped._fake_generator.pov_handler.from_hero(payloads[t % len(payloads)]))
+                          for t in (tick + 1, tick + 2)])
+    assert (obs['pov'][1] == pooled).all()
+
+
+class _LastObservation(gym.ObservationWrapper):
+    def observation(self, obs):
+        self.last = obs
+        return obs
+
+
+def test_frame_stack_vectorized():
+    spec = Vectorized(Navigate(dense=False, extreme=False))
+    inner = _LastObservation(spec.make(fake=True, fake_stats={'compass/angle': lambda tick: 10.0 * tick}))
+    env = FrameStackWrapper(inner, num_stack=4)
+    assert list(env.observation_space.spaces) == ['pov', 'vector']
+    assert env.observation_space['pov'].shape == (4,) + inner.observation_space['pov'].shape
+    assert env.observation_space['vector'] == inner.observation_space['vector']
+
+    obs = env.reset()
+    vectors = [obs['vector']]
+    for _ in range(3):
+        obs, _, _, _ = env.step(env.action_space.sample())
+        assert np.asarray(obs['pov']).shape == (4, 64, 64, 3)
+        assert (np.asarray(obs['pov'])[-1] == inner.last['pov']).all()
+        assert obs['vector'] is inner.last['vector']
+        vectors.append(obs['vector'])
+        assert obs in env.observation_space
+    # The vector is not stacked; it changes with the compass angle of every step.
+    assert len({v.tobytes() for v in vectors}) == len(vectors)
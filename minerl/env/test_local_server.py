@@ -0,0 +1,243 @@
+import json
+import struct
+
+import gym
+import numpy as np
+import pytest
+
+import minerl  # noqa: F401
+from minerl.env.events import EventType, RingBufferSink
+from minerl.env.faults import FaultInjector
+from minerl.env.local_server import LocalMalmoServer
+from minerl.env.malmo import InstanceManager
+from minerl.env.payloads import HeroPayloadGenerator, load_recorded_info
+from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.herobraine.hero import handlers
+
+
+def _assert_equal(expected, actual):
+    if isinstance(expected, dict):
+        assert set(expected) == set(actual)
+        for k in expected:
+            _assert_equal(expected[k], actual[k])
+    else:
+        np.testing.assert_allclose(np.asarray(expected, dtype=float), np.asarray(actual, dtype=float), rtol=1e-6)
+
+
+@pytest.mark.parametrize('spec', [PunchCowEnvSpec(), Navigate(dense=False, extreme=False)], ids=lambda s: s.name)
+def test_payload_round_trip(spec):
+    generator = HeroPayloadGenerator.from_env_spec(spec)
+    obs = spec.observation_space.sample()
+    obs['pov'] = np.random.randint(0, 256, size=obs['pov'].shape, dtype=np.uint8)
+
+    pov, info = generator.encode(obs)
+    info = json.loads(info)
+    info['pov'] = pov
+    decoded = {h.to_string(): h.from_hero(info) for h in spec.observables}
+    if 'equipped_items' in obs:
+        assert decoded['equipped_items'] == obs['equipped_items']
+    _assert_equal({k: v for k, v in obs.items() if k != 'equipped_items'},
+                  {k: v for k, v in decoded.items() if k != 'equipped_items'})
+
+
+def _assert_recorded_format(generated, recorded, path=()):
+    # Every key the generator sends is one Malmo sends too, with values of the same kind.
+    if isinstance(generated, dict):
+        assert isinstance(recorded, dict) and set(generated) <= set(recorded), (path, set(generated) - set(recorded))
+        for k in generated:
+            _assert_recorded_format(generated[k], recorded[k], path + (k,))
+    elif isinstance(generated, list):
+        assert isinstance(recorded, list) and recorded, path
+        for item in generated:
+            _assert_recorded_format(item, recorded[0], path + (0,))
+    else:
+        assert isinstance(generated, (int, float, str, bool)) and type(generated) == type(recorded), path
+
+
+def test_payload_matches_recorded_info():
+    recorded = load_recorded_info()
+    frame = recorded.pop('pov')
+    # The observables of Navigate when it was recorded.
+    observables = Navigate(dense=False, extreme=False).observables + [
+        handlers.EquippedItemObservation(items=['air', 'compass'], _default='air', _other='other')]
+    obs = {h.to_string(): h.from_hero(dict(recorded, pov=HeroPayloadGenerator.frame_bytes(frame)))
+           for h in observables}
+    # Malmo reports the damage of items as currentDamage.
+    mainhand = obs['equipped_items']['mainhand']
+    assert (mainhand['type'], mainhand['damage'], mainhand['maxDamage']) == ('compass', -1, -1)
+
+    pov, info = HeroPayloadGenerator(observables).encode(obs)
+    info = json.loads(info)
+    _assert_recorded_format(info, recorded)
+    assert pov == HeroPayloadGenerator.frame_bytes(frame)
+    info['pov'] = pov
+    decoded = {h.to_string(): h.from_hero(info) for h in observables}
+    assert decoded['equipped_items'] == obs['equipped_items']
+    _assert_equal({k: v for k, v in obs.items() if k != 'equipped_items'},
+                  {k: v for k, v in decoded.items() if k != 'equipped_items'})
+
+
+@pytest.fixture
+def punch_cow():
+    spec = PunchCowEnvSpec()
+    with LocalMalmoServer(spec, episode_length=30, seed=0) as server:
+        env = gym.make(spec.name, instances=[InstanceManager.add_existing_instance(server.port)])
+        yield env, server
+        env.close()
+
+
+def test_env_runs_end_to_end(punch_cow):
+    env, server = punch_cow
+    for _ in range(2):
+        obs = env.reset()
+        assert set(obs) == set(env.observation_space.spaces)
+        assert obs['pov'].shape == (360, 640, 3)
+
+        done, steps = False, 0
+        action = env.action_space.no_op()
+        action['forward'] = 1
+        while not done:
+            obs, reward, done, info = env.step(action)
+            steps += 1
+            assert 'error' not in info
+        assert server.missions[0].done
+        assert 'forward 1' in server.missions[0].commands
+        assert steps < 30
+
+
+def test_env_recovers_from_dropped_connection(punch_cow):
+    env, server = punch_cow
+    env.unwrapped.configure_fault_tolerance(backoff=0)
+    env.reset()
+    server.drop_at = {server.steps + 3}
+
+    for _ in range(3):
+        _, _, done, info = env.step(env.action_space.no_op())
+        assert not done
+    _, _, done, info = env.step(env.action_space.no_op())
+    assert done
+    assert info['error']['recovered'] and not info['error']['episode_restarted']
+    assert server.dropped == 1
+
+    env.reset()
+    env.unwrapped.configure_fault_tolerance(restart_episode=True)
+    env.unwrapped.set_fault_injector(FaultInjector().fail_at('step', calls=[0]))
+    obs, _, done, info = env.step(env.action_space.no_op())
+    assert not done and info['error']['episode_restarted']
+    assert obs['pov'].shape == (360, 640, 3)
+
+
+def test_env_publishes_cleaned_connections(punch_cow):
+    env, server = punch_cow
+    env.unwrapped.configure_fault_tolerance(reconnect_attempts=2, backoff=0)
+    env.reset()
+    sink = InstanceManager.add_event_sink(RingBufferSink())
+    try:
+        env.unwrapped.set_fault_injector(FaultInjector().fail_at('step', calls=[0]).fail_at('connect', calls=[0]))
+        _, _, done, info = env.step(env.action_space.no_op())
+    finally:
+        InstanceManager.remove_event_sink(sink)
+    assert done and info['error']['recovered']
+    # The failed step and the failed reconnect both cleaned the connection.
+    assert [e.details['during'] for e in sink.events(EventType.CLEANED)] == ['step', 'connect']
+    assert [e.details['during'] for e in sink.events(EventType.SOCKET_ERROR)] == ['step', 'connect']
+
+
+def test_env_replaces_stand_in_with_stand_in(punch_cow, monkeypatch):
+    env, server = punch_cow
+    env.unwrapped.configure_fault_tolerance(reconnect_attempts=2, backoff=0)
+    env.reset()
+    old = env.unwrapped.instances[0]
+
+    def get_instance(*args, **kwargs):
+        raise AssertionError("stand-in servers must not be replaced by a new Minecraft")
+
+    monkeypatch.setattr(InstanceManager, 'get_instance', get_instance)
+    # Both attempts to reconnect after the failed step fail too, so the instance is replaced.
+    env.unwrapped.set_fault_injector(FaultInjector().fail_at('step', calls=[0]).fail_at('connect', calls=[0, 1]))
+    _, _, done, info = env.step(env.action_space.no_op())
+    assert done and info['error']['recovered']
+    new = env.unwrapped.instances[0]
+    assert new is not old and new.existing and new.port == server.port
+    assert new in InstanceManager._instance_pool and old not in InstanceManager._instance_pool
+
+    env.unwrapped.set_fault_injector(None)
+    env.reset()
+    _, _, done, info = env.step(env.action_space.no_op())
+    assert not done and 'error' not in info
+
+
+def test_state_only_env_runs_end_to_end():
+    spec = PunchCowEnvSpec(observe_pov=False)
+    assert spec.name == 'MineRLPunchCow-State-v0'
+    assert 'VideoProducer' not in spec.to_xml()
+    assert set(spec.observation_space.spaces) == {
+        'damage_dealt', 'damage_taken', 'mob_kills', 'life_stats', 'location_stats', 'equipped_items',
+        'nearby_entities'}
+
+    with LocalMalmoServer(spec, episode_length=30, seed=0) as server:
+        env = gym.make(spec.name, instances=[InstanceManager.add_existing_instance(server.port)])
+        try:
+            obs = env.reset()
+            assert obs in env.observation_space
+            obs, _, _, _ = env.step(env.action_space.no_op())
+            assert 'pov' not in obs and obs in env.observation_space
+        finally:
+            env.close()
+
+
+def test_action_repeat_decodes_only_the_last_tick(monkeypatch):
+    spec = Navigate(dense=False, extreme=False)
+    with LocalMalmoServer(spec, episode_length=10, seed=0) as server:
+        env = spec.make(instances=[InstanceManager.add_existing_instance(server.port)], action_repeat=3)
+        try:
+            env.reset()
+            decoded = []
+            process = env._process_observation
+            monkeypatch.setattr(env, '_process_observation', lambda *args: decoded.append(args) or process(*args))
+
+            obs, _, done, _ = env.step(env.action_space.no_op())
+            assert server.missions[0].tick == 3
+            assert len(decoded) == 1 and not done
+            assert obs['pov'].shape == env.observation_space['pov'].shape
+
+            # The episode ends during the repeat of the fourth step.
+            steps = 1
+            while not done:
+                _, _, done, _ = env.step(env.action_space.no_op())
+                steps += 1
+            assert server.missions[0].tick == 10 and steps == 4 and len(decoded) == 4
+        finally:
+            env.close()
+
+
+def test_step_failure_keeps_rewards_of_earlier_ticks(monkeypatch):
+    import minerl.env.local_server
+
+    class RewardingStruct(object):
+        # The stand-in server rewards every tick with 1.
+        def __getattr__(self, name):
+            return getattr(struct, name)
+
+        @staticmethod
+        def pack(fmt, *values):
+            if fmt == '!dbb':
+                values = (1.0,) + values[1:]
+            return struct.pack(fmt, *values)
+
+    monkeypatch.setattr(minerl.env.local_server, 'struct', RewardingStruct())
+    spec = Navigate(dense=False, extreme=False)
+    with LocalMalmoServer(spec, seed=0) as server:
+        env = spec.make(instances=[InstanceManager.add_existing_instance(server.port)], action_repeat=3)
+        try:
+            env.configure_fault_tolerance(backoff=0)
+            env.reset()
+            _, reward, _, _ = env.step(env.action_space.no_op())
+            assert reward == 3.0
+            # The third tick of the next step fails.
+            env.set_fault_injector(FaultInjector().fail_at('step', calls=[2]))
+            _, reward, done, info = env.step(env.action_space.no_op())
+            assert done and info['error']['recovered'] and reward == 2.0
+        finally:
+            env.close()
@@ -0,0 +1,59 @@
+import os
+import subprocess
+
+import psutil
+import pytest
+
+from minerl.env.malmo import InstanceManager, MinecraftInstance, JVM_MEMORY_OVERHEAD, _parse_cpu_list, _parse_mem
+
+
+@pytest.fixture
+def placement():
+    yield
+    InstanceManager.configure_placement()
+    InstanceManager._assigned_cpus.clear()
+
+
+def test_parse():
+    assert _parse_mem('4G') == 4 << 30
+    assert _parse_mem('512m') == 512 << 20
+    assert _parse_mem(1024) == 1024
+    assert _parse_mem(None) is None
+    assert _parse_cpu_list('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+
+
+def test_assigns_disjoint_cores(placement):
+    InstanceManager.configure_placement(cpus_per_instance=2, cpus=list(range(6)))
+    sets = [InstanceManager._assign_cpus() for _ in range(3)]
+    assert sorted(c for s in sets for c in s) == list(range(6))
+    assert InstanceManager._assign_cpus() is None
+
+    InstanceManager._release_cpus(sets[1])
+    assert InstanceManager._assign_cpus() == sets[1]
+
+
+def test_no_pinning_by_default(placement):
+    InstanceManager.configure_placement()
+    assert InstanceManager._assign_cpus() is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason="requires sched_setaffinity")
+def test_preexec_pins_and_joins_cgroup(tmp_path):
+    cpus = sorted(os.sched_getaffinity(0))[:1]
+    inst = MinecraftInstance(9000, cpus=cpus, cgroup=str(tmp_path), max_mem='2G')
+    # The kernel creates the interface files of a real cgroup.
+    cgroup = tmp_path / 'minerl_{}'.format(inst.uuid)
+    cgroup.mkdir()
+    (cgroup / 'cgroup.procs').touch()
+
+    proc = subprocess.Popen(['sleep', '10'], preexec_fn=inst._placement_preexec_fn())
+    try:
+        assert psutil.Process(proc.pid).cpu_affinity() == cpus
+        assert os.getsid(proc.pid) == proc.pid
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert (cgroup / 'memory.max').read_text() == str((2 << 30) + JVM_MEMORY_OVERHEAD)
+    assert (cgroup / 'cpuset.cpus').read_text() == ','.join(map(str, cpus))
+    assert (cgroup / 'cgroup.procs').read_text() == '0'
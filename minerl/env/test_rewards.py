@@ -0,0 +1,80 @@
+import numpy as np
+
+from minerl.env.rewards import RewardEngine
+from minerl.herobraine.env_specs.combat_specs import COMBAT_REWARDS
+
+
+def _obs(damage_dealt, damage_taken, mob_kills, is_alive=True):
+    return {
+        'damage_dealt': {'damage_dealt': np.array(damage_dealt)},
+        'damage_taken': {'damage_taken': np.array(damage_taken)},
+        'mob_kills': {'mob_kills': np.array(mob_kills)},
+        'life_stats': {'is_alive': np.array(is_alive)},
+    }
+
+
+def _trajectory(rng, steps):
+    # Stats mostly grow, but can drop, e.g. when the agent respawns.
+    stats = np.cumsum(rng.randint(-1, 3, size=(steps, 3)), axis=0)
+    return [_obs(*s) for s in stats]
+
+
+def test_engine_matches_combat_rewards():
+    engine = RewardEngine(**COMBAT_REWARDS)
+    observations = _trajectory(np.random.RandomState(0), 50)
+
+    last = {k: 0 for k in ('damage_dealt', 'damage_taken', 'mob_kills')}
+    engine.reset()
+    for obs in observations:
+        expected = -1
+        for k, weight in COMBAT_REWARDS['stat_weights'].items():
+            if obs[k][k] > last[k]:
+                expected += weight * (obs[k][k] - last[k])
+                last[k] = obs[k][k]
+        assert engine.step(obs) == expected
+
+
+def _step_each(engine, trajectories, dones):
+    rewards = np.zeros(dones.shape)
+    for i, trajectory in enumerate(trajectories):
+        engine.reset()
+        for t, obs in enumerate(trajectory):
+            rewards[t, i] = engine.step(obs, dones[t, i])
+            if dones[t, i]:
+                engine.reset()
+    return rewards
+
+
+def test_engine_steps_batches_and_relabels():
+    engine = RewardEngine({'damage_dealt': 2, 'mob_kills': 100}, time_penalty=0.5,
+                          terminal_bonuses={'life_stats/is_alive': 10})
+    assert engine.stats == ('damage_dealt', 'mob_kills', 'life_stats/is_alive')
+    rng = np.random.RandomState(1)
+    num_envs, steps = 3, 20
+    trajectories = [_trajectory(rng, steps) for _ in range(num_envs)]
+    dones = rng.rand(steps, num_envs) < 0.15
+    expected = _step_each(engine, trajectories, dones)
+
+    # Stepped as a batch of envs, e.g. of a vectorized env.
+    engine.reset()
+    for t in range(steps):
+        batch = {k: {s: np.stack([trajectory[t][k][s] for trajectory in trajectories]) for s in v}
+                 for k, v in trajectories[0][t].items()}
+        np.testing.assert_allclose(engine.step(batch, dones[t]), expected[t])
+        engine.reset(np.flatnonzero(dones[t]))
+
+    # Relabeled from the recorded stats.
+    stats = np.stack([engine.stat_vectors(trajectory) for trajectory in trajectories], axis=1)
+    assert stats.shape == (steps, num_envs, 3)
+    np.testing.assert_allclose(engine.relabel(stats, dones), expected)
+
+    # With other weights, without running the episodes again.
+    other = RewardEngine({'mob_kills': 1, 'damage_dealt': -3}, time_penalty=2)
+    stats = np.stack([other.stat_vectors(trajectory) for trajectory in trajectories], axis=1)
+    np.testing.assert_allclose(other.relabel(stats, dones), _step_each(other, trajectories, dones))
+
+    # A single episode ends at the last step.
+    single = np.zeros((steps, 1), dtype=bool)
+    single[-1] = True
+    np.testing.assert_allclose(engine.relabel(engine.stat_vectors(trajectories[0])),
+                               _step_each(engine, trajectories[:1], single)[:, 0])
@@ -3,6 +3,7 @@
 
 from abc import abstractmethod
 import types
+from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation
 from minerl.herobraine.hero.handlers.translation import TranslationHandler
 import typing
 from minerl.herobraine.hero.spaces import Dict
@@ -27,8 +28,14 @@ class EnvSpec(abc.ABC):
     U_SINGLE_AGENT_ENTRYPOINT = 'minerl.env._singleagent:_SingleAgentEnv'
     U_FAKE_SINGLE_AGENT_ENTRYPOINT = 'minerl.env._fake:_FakeSingleAgentEnv'
 
-    def __init__(self, name, max_episode_steps=None, reward_threshold=None, agent_count=None, **kwargs):
+    def __init__(self, name, max_episode_steps=None, reward_threshold=None, agent_count=None, observe_pov=True,
+                 **kwargs):
+        """
+        :param observe_pov: If False, the POV observation is left out of the observables, so Minecraft neither
+            renders nor sends frames (there is no VideoProducer in the mission XML).
+        """
         self.name = name
+        self.observe_pov = observe_pov
         self.max_episode_steps = max_episode_steps
         self.reward_threshold = reward_threshold
         self.agent_count = 1 if agent_count is None else agent_count
@@ -41,6 +48,8 @@ class EnvSpec(abc.ABC):
         # Note: currently only agent_start needs to be per-agent. To make more attributes per-agent,
         # remember to modify minerl/herobraine/hero/mission.xml.j2 as well.
         self.observables = self.create_observables()
+        if not self.observe_pov:
+            self.observables = [o for o in self.observables if not isinstance(o, POVObservation)]
         self.actionables = self.create_actionables()
         self.rewardables = self.create_rewardables()
         self.agent_handlers = self.create_agent_handlers()
@@ -218,7 +227,12 @@ class EnvSpec(abc.ABC):
         entry_point = self._entry_point(fake)
         module = importlib.import_module(entry_point.split(':')[0])
         class_ = getattr(module, entry_point.split(':')[-1])
-        return class_(**self._env_kwargs(), **additonal_kwargs)
+        kwargs = dict(self._env_kwargs(), **additonal_kwargs)
+        if entry_point not in (EnvSpec.U_MULTI_AGENT_ENTRYPOINT, EnvSpec.U_FAKE_MULTI_AGENT_ENTRYPOINT,
+                               EnvSpec.U_SINGLE_AGENT_ENTRYPOINT, EnvSpec.U_FAKE_SINGLE_AGENT_ENTRYPOINT):
+            # Custom entrypoints are shared by the real and fake envs, as with `gym.make`.
+            kwargs['fake'] = fake
+        return class_(**kwargs)
 
     def register(self, fake=False):
         reg_spec = dict(
@@ -92,12 +92,16 @@ class DoneOnESCWrapper(gym.Wrapper):
 def _basalt_gym_entrypoint(
         env_spec: "BasaltBaseEnvSpec",
         fake: bool = False,
+        **env_kwargs,
 ) -> _singleagent._SingleAgentEnv:
-    """Used as entrypoint for `gym.make`."""
+    """Used as entrypoint for `gym.make`.
+
+    Additional keyword arguments (e.g. `instances`) are passed to the environment.
+    """
     if fake:
-        env = _fake._FakeSingleAgentEnv(env_spec=env_spec)
+        env = _fake._FakeSingleAgentEnv(env_spec=env_spec, **env_kwargs)
     else:
-        env = _singleagent._SingleAgentEnv(env_spec=env_spec)
+        env = _singleagent._SingleAgentEnv(env_spec=env_spec, **env_kwargs)
 
     env = BasaltTimeoutWrapper(env)
     # env = DoneOnESCWrapper(env)
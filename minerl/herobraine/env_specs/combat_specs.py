@@ -5,6 +5,7 @@ from abc import abstractmethod
 import gym
 
 from minerl.env import _fake, _singleagent
+from minerl.env.rewards import RewardEngine
 from minerl.herobraine import wrappers
 from minerl.herobraine.env_spec import EnvSpec
 from minerl.herobraine.env_specs import simple_embodiment
@@ -49,38 +50,35 @@ class EndOnKillWrapper(gym.Wrapper):
         return obs, reward, done, info
 
 
+# The rewards of the combat environments.
+COMBAT_REWARDS = dict(
+    stat_weights={
+        "damage_dealt": 2,
+        "damage_taken": -1,
+        "mob_kills": 100,
+    },
+    time_penalty=1,
+)
+
+
 class CalculateRewardsWrapper(gym.Wrapper):
     """
     This wrapper does the reward calculation for the combat environments
+
+    Rewards are computed by a RewardEngine, by default one with COMBAT_REWARDS.
     """
 
-    def __init__(self, env):
+    def __init__(self, env, engine: Optional[RewardEngine] = None):
         super().__init__(env)
-        self.stats = {
-            "damage_dealt": [2, 0],
-            "damage_taken": [-1, 0],
-            "mob_kills": [100, 0]
-        }
-        self.time_punishment = -1
+        self.engine = engine if engine is not None else RewardEngine(**COMBAT_REWARDS)
 
     def reset(self):
-        for stat in self.stats:
-            self.stats[stat][1] = 0
+        self.engine.reset()
         return super().reset()
 
     def step(self, action):
         obs, reward, done, info = super().step(action)
-
-        rewards = []
-        for k, v in self.stats.items():
-            curr = obs[k][k]
-            if curr > v[1]:
-                rewards.append(v[0]*(curr - v[1]))
-                v[1] = curr
-                # print(f"{k} reward: {rewards[-1]}")
-
-        reward = sum(rewards) + self.time_punishment
-
+        reward = self.engine.step(obs, done)
         return obs, reward, done, info
 
 
@@ -111,15 +109,38 @@ class InitCommandsWrapper(gym.Wrapper):
         return obs
 
 
+def variant_name(name: str, resolution: Sequence[int], observe_pov: bool = True) -> str:
+    """Gets the name of the variant of an environment rendered at resolution, e.g. MineRLPunchCow-64-v0, or
+    of its state-only variant, e.g. MineRLPunchCow-State-v0."""
+    width, height = resolution
+    if not observe_pov:
+        variant = 'State'
+    elif (width, height) == DEFAULT_RESOLUTION:
+        return name
+    else:
+        variant = str(width) if width == height else '{}x{}'.format(width, height)
+    base, version = name.rsplit('-', 1)
+    return '{}-{}-{}'.format(base, variant, version)
+
+
 def _combat_gym_entrypoint(
         env_spec: "CombatBaseEnvSpec",
         fake: bool = False,
+        resolution: Optional[Sequence[int]] = None,
+        observe_pov: Optional[bool] = None,
+        **env_kwargs,
 ) -> _singleagent._SingleAgentEnv:
-    """Used as entrypoint for `gym.make`."""
+    """Used as entrypoint for `gym.make`.
+
+    A resolution, as (width, height), and observe_pov override those of the env spec, e.g.
+    ``gym.make('MineRLPunchCow-v0', resolution=(128, 128))``. Additional keyword arguments (e.g. `instances`)
+    are passed to the environment.
+    """
+    env_spec = resolve_env_spec(env_spec, resolution=resolution, observe_pov=observe_pov)
     if fake:
-        env = _fake._FakeSingleAgentEnv(env_spec=env_spec)
+        env = _fake._FakeSingleAgentEnv(env_spec=env_spec, **env_kwargs)
     else:
-        env = _singleagent._SingleAgentEnv(env_spec=env_spec)
+        env = _singleagent._SingleAgentEnv(env_spec=env_spec, **env_kwargs)
 
     env = TimeoutWrapper(env)
     env = InitCommandsWrapper(env, env_spec)
@@ -131,10 +152,45 @@ def _combat_gym_entrypoint(
 COMBAT_GYM_ENTRY_POINT = "minerl.herobraine.env_specs.combat_specs:_combat_gym_entrypoint"
 
 
+def resolve_env_spec(
+        env_spec: EnvSpec,
+        resolution: Optional[Sequence[int]] = None,
+        observe_pov: Optional[bool] = None,
+        **_,
+) -> EnvSpec:
+    """Gets the env spec gym.make builds from the kwargs of a registration, e.g.
+    ``resolve_env_spec(**gym.spec('MineRLPunchCow-64-v0')._kwargs)``.
+
+    The resolution and observe_pov of combat env specs can be overridden; other env specs are returned as
+    they are.
+    """
+    if resolution is None and observe_pov is None:
+        return env_spec
+    resolution = tuple(env_spec.resolution if resolution is None else resolution)
+    observe_pov = env_spec.observe_pov if observe_pov is None else observe_pov
+    if resolution != tuple(env_spec.resolution) or observe_pov != env_spec.observe_pov:
+        env_spec = type(env_spec)(resolution=resolution, observe_pov=observe_pov)
+    return env_spec
+
+
+DEFAULT_RESOLUTION = (640, 360)
+
+
 class CombatBaseEnvSpec(HumanControlEnvSpec):
+    """
+    The base of the combat environments.
+
+    The POV is rendered at 640x360 by default to match the pretrained models. Environments for other
+    resolutions are rendered natively at that resolution by Minecraft, and are named after it, e.g.
+    MineRLPunchCow-64-v0 for 64x64 or MineRLPunchCow-320x180-v0. State-only environments, e.g.
+    MineRLPunchCow-State-v0, observe no POV; their observations are the stats, life stats, location and
+    equipment of the agent.
+    """
 
     LOW_RES_SIZE = 64
     HIGH_RES_SIZE = 1024
+    # The square resolutions every combat environment is also registered at.
+    VARIANT_SIZES = (LOW_RES_SIZE, 128)
 
     # It would be cleaner to make this an instance variable
     # But it's just easier for InitCommandsWrapper
@@ -150,18 +206,21 @@ class CombatBaseEnvSpec(HumanControlEnvSpec):
             demo_server_experiment_name,
             max_episode_steps=2400,
             inventory: Sequence[dict] = (),
+            resolution: Sequence[int] = DEFAULT_RESOLUTION,
+            observe_pov: bool = True,
     ):
         # Used by minerl.util.docs to construct Sphinx docs.
         self.inventory = inventory
         self.demo_server_experiment_name = demo_server_experiment_name
 
         super().__init__(
-            name=name,
+            name=variant_name(name, resolution, observe_pov),
+            observe_pov=observe_pov,
             # This way, the setup actions are not counted as part of the episode.
             max_episode_steps=max_episode_steps + len(self.init_cmds()),
             # Hardcoded variables to match the pretrained models
             fov_range=[70, 70],
-            resolution=[640, 360],
+            resolution=list(resolution),
             gamma_range=[2, 2],
             guiscale_range=[1, 1],
             cursor_size_range=[16.0, 16.0]
@@ -177,7 +236,7 @@ class CombatBaseEnvSpec(HumanControlEnvSpec):
         return COMBAT_GYM_ENTRY_POINT
 
     def create_observables(self):
-        return [  # The POV in pixels
+        observables = [  # The POV in pixels
             handlers.POVObservation(self.resolution),
             # https://minecraft.fandom.com/wiki/Statistics#List_of_custom_statistic_names
 
@@ -187,6 +246,20 @@ class CombatBaseEnvSpec(HumanControlEnvSpec):
 
             # idk what this is
             handlers.ObservationFromLifeStats()]
+        if not self.observe_pov:
+            # Without pixels the agent needs to observe where it is, what it holds and the mobs around it.
+            observables += [
+                handlers.ObservationFromCurrentLocation(),
+                handlers.NearbyEntitiesObservation(),
+                handlers.EquippedItemObservation(
+                    items=mc.ALL_ITEMS,
+                    mainhand=True,
+                    offhand=True,
+                    armor=True,
+                    _default="air",
+                    _other="air",
+                )]
+        return observables
 
     def create_agent_start(self) -> List[handlers.Handler]:
         return super().create_agent_start() + [
@@ -290,10 +363,12 @@ This is just the easy-mode cow punch environment. Same rules apply, except the c
             "/summon cow ^ ^ ^2 {NoAI:1,Health:10000}"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLPunchCowEz-v0",
             demo_server_experiment_name="punchcowez",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=10*SECOND,
             inventory=[],
         )
@@ -318,10 +393,12 @@ Same as PunchCowEz, except the cow can actually die
             "/summon cow ^ ^ ^2 {NoAI:1}"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLPunchCowEzTest-v0",
             demo_server_experiment_name="punchcoweztest",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=10*SECOND,
             inventory=[],
         )
@@ -346,10 +423,12 @@ You spawn in a random world with a cow in front of you. You have 10 seconds to b
             "/summon cow ^ ^ ^2"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLPunchCow-v0",
             demo_server_experiment_name="punchcow",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=10*SECOND,
             inventory=[],
         )
@@ -374,10 +453,12 @@ Fight the skeleton for 10 seconds!
             "/replaceitem entity @p weapon.offhand shield"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLFightSkeleton-v0",
             demo_server_experiment_name="fightskeleton",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=10*SECOND,
             inventory=[
                 dict(type="diamond_sword", quantity=1),
@@ -407,10 +488,12 @@ Fight the zombie for 10 seconds!
             # "/tp @e[type=zombie, dx=5, dy=5, dz=5] ^ ^ 2 facing ^ ^ ^"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLFightZombie-v0",
             demo_server_experiment_name="fightzombie",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=10*SECOND,
             inventory=[
                 dict(type="diamond_sword", quantity=1),
@@ -430,10 +513,12 @@ You spawn in the end. Kill the enderdragon and beat the game!
             "/setblock ~ ~ ~ minecraft:end_portal"
         ]
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, observe_pov=True):
         super().__init__(
             name="MineRLEnderdragon-v0",
             demo_server_experiment_name="enderdragon",
+            resolution=resolution,
+            observe_pov=observe_pov,
             max_episode_steps=5*MINUTE,
             inventory=[
                 dict(type="diamond_sword", quantity=1),
@@ -447,3 +532,28 @@ You spawn in the end. Kill the enderdragon and beat the game!
                 dict(type="steak", quantity=64),
             ],
         )
+
+
+def register_variants(env_specs: Sequence[CombatBaseEnvSpec]) -> List[str]:
+    """Registers the resolution and state-only variants of combat env specs and gets their ids.
+
+    The variants are registered with the env spec they vary and their resolution or observe_pov as
+    kwargs, so their own env specs are only built by gym.make (see resolve_env_spec), not at import.
+    """
+    overrides = [dict(resolution=(size, size)) for size in CombatBaseEnvSpec.VARIANT_SIZES]
+    overrides.append(dict(observe_pov=False))
+    ids = []
+    for env_spec in env_specs:
+        for override in overrides:
+            env_id = variant_name(env_spec.name, override.get('resolution', env_spec.resolution),
+                                  override.get('observe_pov', True))
+            ids.append(env_id)
+            if env_id in gym.envs.registry.env_specs:
+                continue
+            gym.register(
+                id=env_id,
+                entry_point=COMBAT_GYM_ENTRY_POINT,
+                kwargs=dict(env_spec._env_kwargs(), **override),
+                max_episode_steps=env_spec.max_episode_steps,
+            )
+    return ids
@@ -61,12 +61,15 @@ class ObtainDiamondShovelWrapper(gym.Wrapper):
         return obs
 
 
-def _obtain_diamond_shovel_gym_entrypoint(env_spec, fake=False):
-    """Used as entrypoint for `gym.make`."""
+def _obtain_diamond_shovel_gym_entrypoint(env_spec, fake=False, **env_kwargs):
+    """Used as entrypoint for `gym.make`.
+
+    Additional keyword arguments (e.g. `instances`) are passed to the environment.
+    """
     if fake:
-        env = _fake._FakeSingleAgentEnv(env_spec=env_spec)
+        env = _fake._FakeSingleAgentEnv(env_spec=env_spec, **env_kwargs)
     else:
-        env = _singleagent._SingleAgentEnv(env_spec=env_spec)
+        env = _singleagent._SingleAgentEnv(env_spec=env_spec, **env_kwargs)
 
     env = ObtainDiamondShovelWrapper(env)
     return env
@@ -50,3 +50,8 @@ ENVS = [env for env in locals().values() if isinstance(env, EnvSpec)]
 for env in ENVS:
     if env.name not in gym.envs.registry.env_specs:
         env.register()
+
+# The combat envs rendered at lower resolutions, e.g. MineRLPunchCow-64-v0, and without POV observations,
+# e.g. MineRLPunchCow-State-v0. Their env specs are built by gym.make.
+COMBAT_VARIANT_IDS = combat_specs.register_variants(
+    [env for env in ENVS if isinstance(env, combat_specs.CombatBaseEnvSpec)])
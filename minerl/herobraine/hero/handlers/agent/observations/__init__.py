@@ -10,3 +10,4 @@ from .inventory import *
 from .lifestats import *
 from .pov import *
 from .is_gui_open import *
+from .nearby_entities import *
@@ -6,7 +6,7 @@
 Not very proud of the code reuse in this module -- @wguss
 """
 
-from typing import List
+from typing import Any, Dict, List, Sequence
 
 import jinja2
 
@@ -15,7 +15,89 @@ from minerl.herobraine.hero import spaces
 from minerl.herobraine.hero.handlers.translation import TranslationHandler, TranslationHandlerGroup
 import numpy as np
 
-__all__ = ['EquippedItemObservation']
+__all__ = ['EquippedItemObservation', 'EquipmentDecoder']
+
+_CONTAINER_PLAYER = 'class net.minecraft.inventory.ContainerPlayer'
+# Malmo reports the damage of equipped items as currentDamage (see ObservationFromEquippedItemImplementation).
+_HERO_KEYS = {'damage': 'currentDamage'}
+
+
+class EquipmentDecoder(object):
+    """Decodes the equipment of all slots at once into one int64 array of shape (len(slots), 3).
+
+    Every row holds the item id (the index of the item in the sorted items, as in their Enum space), the
+    damage and the max damage of a slot. Items map to ids through a hash table built once; unknown items
+    are other_id and empty or missing slots default_id.
+    """
+
+    TYPE, DAMAGE, MAX_DAMAGE = 0, 1, 2
+
+    def __init__(self, slots: Sequence[str], items: Sequence[str], _default: str, _other: str):
+        self.slots = tuple(slots)
+        # The same ids as the Enum space of the items.
+        self.names = np.array(sorted(items))
+        self.item_ids = {str(item): i for i, item in enumerate(self.names)}
+        self.default_id = self.item_ids[_default]
+        self.other_id = self.item_ids[_other]
+
+    def empty(self, batch_shape=()) -> np.ndarray:
+        out = np.zeros(tuple(batch_shape) + (len(self.slots), 3), dtype=np.int64)
+        out[..., self.TYPE] = self.default_id
+        return out
+
+    def decode(self, info: Dict[str, Any], out: np.ndarray = None) -> np.ndarray:
+        """Gets the equipment in a hero info dict, in a new array unless out is given."""
+        equipped = info.get('equipped_items') or {}
+        # The rows are built in Python and written at once; indexing numpy per field is far slower.
+        rows = [self._row(equipped.get(slot), 'type', _HERO_KEYS['damage']) for slot in self.slots]
+        if out is None:
+            return np.array(rows, dtype=np.int64)
+        out[...] = rows
+        return out
+
+    def decode_universal(self, obs: Dict[str, Any], out: np.ndarray = None) -> np.ndarray:
+        """Gets the equipment in a universal observation; only the mainhand is recorded in those."""
+        if self.slots != ('mainhand',):
+            raise NotImplementedError('equipment not implemented for slots ' + str(self.slots))
+        try:
+            gui = obs['slots']['gui']
+            offset = -10 if gui['type'] == _CONTAINER_PLAYER else -9
+            item = gui['slots'][offset + obs['hotbar']]
+        except KeyError:
+            # No item in hotbar slot, or the obs doesn't show up in the univ json.
+            item = None
+        rows = [self._row(item, 'name', 'damage', universal=True)]
+        if out is None:
+            return np.array(rows, dtype=np.int64)
+        out[...] = rows
+        return out
+
+    def decode_universal_batch(self, observations: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Gets the equipment in a sequence of universal observations with a leading batch dimension."""
+        out = self.empty((len(observations),))
+        for row, obs in zip(out, observations):
+            self.decode_universal(obs, out=row)
+        return out
+
+    def item_names(self, ids) -> np.ndarray:
+        """The string view of item ids, an array of them (or one name for a single id)."""
+        return self.names[ids]
+
+    def _row(self, item, name_key, damage_key, universal=False):
+        if item is None:
+            return self.default_id, 0, 0
+        item_id = self.default_id
+        name = item.get(name_key)
+        if name is not None:
+            if universal:
+                name = name.split('minecraft:')[-1]
+            i = self.item_ids.get(name)
+            if i is None:
+                item_id = self.other_id
+            # Universal observations record empty hands as air.
+            elif not (universal and name == 'air'):
+                item_id = i
+        return item_id, item.get(damage_key, 0), item.get('maxDamage', 0)
 
 
 class EquippedItemObservation(TranslationHandlerGroup):
@@ -62,6 +144,39 @@ class EquippedItemObservation(TranslationHandlerGroup):
                 _EquippedItemObservation([slot], self._items, _default=_default, _other=_other) for slot in EQUIPMENT_SLOTS if slot not in ["mainhand", "offhand"]
             ])
         super().__init__(handlers)
+        self.decoder = EquipmentDecoder(self.handler_keys, self._items, _default=_default, _other=_other)
+        self._item_names = self.decoder.names.tolist()
+
+    def from_hero(self, info):
+        return self.observation(self.decoder.decode(info))
+
+    def from_universal(self, obs):
+        # The damage of universal observations is int32, as their handlers have always returned it.
+        return self.observation(self.decoder.decode_universal(obs), damage_dtype=np.int32)
+
+    def from_universal_batch(self, observations):
+        """Converts a sequence of universal observations into one observation with a leading batch dimension."""
+        return self.observation(self.decoder.decode_universal_batch(observations), damage_dtype=np.int32)
+
+    def observation(self, equipment: np.ndarray, damage_dtype=np.int64):
+        """Gets the observation (per slot, the item name, damage and max damage) of decoded equipment."""
+        if equipment.ndim == 2:
+            names = self._item_names
+            return {
+                slot: {'damage': np.array(damage, dtype=damage_dtype),
+                       'maxDamage': np.array(max_damage, dtype=damage_dtype),
+                       'type': names[item_id]}
+                for slot, (item_id, damage, max_damage) in zip(self.decoder.slots, equipment.tolist())
+            }
+        names = self.decoder.item_names(equipment[..., EquipmentDecoder.TYPE])
+        return {
+            slot: {
+                'damage': equipment[..., i, EquipmentDecoder.DAMAGE].astype(damage_dtype, copy=False),
+                'maxDamage': equipment[..., i, EquipmentDecoder.MAX_DAMAGE].astype(damage_dtype, copy=False),
+                'type': names[..., i],
+            }
+            for i, slot in enumerate(self.decoder.slots)
+        }
 
     def __eq__(self, other):
         return (
@@ -196,6 +311,7 @@ class _DamageObservation(TranslationHandler):
 
         self._keys = keys
         self.type_str = type_str
+        self.hero_key = _HERO_KEYS.get(type_str, type_str)
         self._default = 0
         super().__init__(spaces.Box(low=-1, high=1562, shape=(), dtype=int))
 
@@ -207,7 +323,7 @@ class _DamageObservation(TranslationHandler):
             head = info['equipped_items']
             for key in self._keys:
                 head = head[key]
-            return np.array(head[self.type_str])
+            return np.array(head[self.hero_key])
         except KeyError:
             return np.array(self._default, dtype=self.space.dtype)
 
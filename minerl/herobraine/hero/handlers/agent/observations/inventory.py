@@ -1,6 +1,8 @@
 # Copyright (c) 2020 All Rights Reserved
 # Author: William H. Guss, Brandon Houghton
 
+import collections.abc
+import copy
 import logging
 
 import jinja2
@@ -10,6 +12,64 @@ from minerl.herobraine.hero import spaces
 import minerl.herobraine.hero.mc as mc
 
 
+class FlatInventory(collections.abc.MutableMapping):
+    """Item counts of a FlatInventoryObservation, backed by a single int32 array.
+
+    ``counts[..., slot]`` is the count of the item in ``slot`` (items are in sorted order), so inventories can
+    be used as vectors directly. Indexing by item name is a view on that array, e.g. ``inventory['dirt']``,
+    and ``inventory.as_dict()`` builds the per-item dict of the inventory space when one is needed.
+    Batched inventories (e.g. from ``from_universal_batch``) have leading batch dimensions in counts.
+    """
+
+    __slots__ = ('counts', '_slots')
+
+    def __init__(self, counts: np.ndarray, slots: dict):
+        self.counts = counts
+        self._slots = slots
+
+    def __getitem__(self, item):
+        return self.counts[..., self._slots[item]]
+
+    def __setitem__(self, item, value):
+        self.counts[..., self._slots[item]] = value
+
+    def __delitem__(self, item):
+        raise TypeError("Items cannot be removed from a FlatInventory")
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, item):
+        return item in self._slots
+
+    def __array__(self, dtype=None):
+        return self.counts if dtype is None else self.counts.astype(dtype)
+
+    def as_dict(self) -> collections.OrderedDict:
+        return collections.OrderedDict((item, self.counts[..., slot]) for item, slot in self._slots.items())
+
+    def copy(self):
+        return type(self)(self.counts.copy(), self._slots)
+
+    def __copy__(self):
+        return type(self)(self.counts, self._slots)
+
+    def __deepcopy__(self, memo):
+        # The item table is immutable and shared by all inventories of a handler.
+        return type(self)(copy.deepcopy(self.counts, memo), self._slots)
+
+    def __reduce__(self):
+        return type(self), (self.counts, self._slots)
+
+    def __repr__(self):
+        nonzero = np.flatnonzero(self.counts) if self.counts.ndim == 1 else []
+        items = list(self._slots)
+        return "{}({})".format(type(self).__name__, {items[i]: int(self.counts[i]) for i in nonzero})
+
+
 class FlatInventoryObservation(TranslationHandler):
     """
     Handles GUI Container Observations for selected items
@@ -33,74 +93,86 @@ class FlatInventoryObservation(TranslationHandler):
         }))
         self.num_items = len(item_list)
         self.items = item_list
+        # The slot of every item in the counts of a FlatInventory, in the order of the space.
+        self.slots = {item: i for i, item in enumerate(self.space.spaces)}
+        # Names reported by Minecraft which are counted as another item.
+        self._aliases = dict(self.slots)
+        if 'log' in self.slots:
+            self._aliases['log2'] = self.slots['log']
 
     def add_to_mission_spec(self, mission_spec):
         pass
         # Flat obs not supported by API for some reason - should be mission_spec.observeFullInventory(flat=True)
 
+    def empty(self, batch_shape=()) -> FlatInventory:
+        return FlatInventory(np.zeros(tuple(batch_shape) + (self.num_items,), dtype=np.int32), self.slots)
+
+    def _add_stacks(self, counts, stacks, name_key, count_key, strip_prefix=False):
+        # Sums in Python and updates the counts once; indexing numpy per stack is far slower.
+        sums = {}
+        for stack in stacks:
+            try:
+                name = stack[name_key]
+                if strip_prefix:
+                    name = mc.strip_item_prefix(name)
+                slot = self._aliases.get(name)
+                # We only care to observe what was specified in the space.
+                if slot is None:
+                    continue
+                # This sets the nubmer of air to correspond to the number of empty slots :)
+                sums[slot] = sums.get(slot, 0) + (1 if name == 'air' else int(stack[count_key]))
+            except (KeyError, ValueError, TypeError, AttributeError):
+                continue
+        if sums:
+            counts[np.fromiter(sums, np.intp, len(sums))] += np.fromiter(sums.values(), np.int32, len(sums))
+
     def from_hero(self, info):
         """
-        Converts the Hero observation into a one-hot of the inventory items
+        Converts the Hero observation into the counts of the inventory items
         for a given inventory container. Ignores variant / color
         :param obs:
         :return:
         """
-        item_dict = self.space.no_op()
+        inventory = self.empty()
         # TODO: RE-ADDRESS THIS DUCK TYPED INVENTORY DATA FORMAT WHEN MOVING TO STRONG TYPING
-        for stack in info['inventory']:
-            if 'type' in stack and 'quantity' in stack:
-                type_name = stack['type']
-                if type_name == 'log2':
-                    type_name = 'log'
-
-                # This sets the nubmer of air to correspond to the number of empty slots :)
-                try:
-                    if type_name == "air":
-                        item_dict[type_name] += 1
-                    else:
-                        item_dict[type_name] += stack["quantity"]
-                except KeyError:
-                    # We only care to observe what was specified in the space.
-                    continue
-
-        return item_dict
-
-    def from_universal(self, obs):
-        item_dict = self.space.no_op()
-
+        self._add_stacks(inventory.counts, info['inventory'], 'type', 'quantity')
+        return inventory
+
+    def _universal_slots(self, obs):
+        gui = obs['slots']['gui']
+        if gui['type'] == 'class net.minecraft.inventory.ContainerPlayer' or \
+                gui['type'] == 'class net.minecraft.inventory.ContainerWorkbench':
+            slots = gui['slots'][1:]
+        elif gui['type'] == 'class net.minecraft.inventory.ContainerFurnace':
+            slots = gui['slots'][0:2] + gui['slots'][3:]
+        else:
+            slots = list(gui['slots'])
+
+        # Add in the cursor item tracking if present
+        if 'cursor_item' in gui:
+            slots.append(gui['cursor_item'])
+        return slots
+
+    def _add_universal(self, counts, obs):
         try:
-            if obs['slots']['gui']['type'] == 'class net.minecraft.inventory.ContainerPlayer' or \
-                    obs['slots']['gui']['type'] == 'class net.minecraft.inventory.ContainerWorkbench':
-                slots = obs['slots']['gui']['slots'][1:]
-            elif obs['slots']['gui']['type'] == 'class net.minecraft.inventory.ContainerFurnace':
-                slots = obs['slots']['gui']['slots'][0:2] + obs['slots']['gui']['slots'][3:]
-            else:
-                slots = obs['slots']['gui']['slots']
-
-            # Add in the cursor item tracking if present
-            try:
-                slots.append(obs['slots']['gui']['cursor_item'])
-            except KeyError:
-                pass
-
-            # Add from all slots
-            for stack in slots:
-                try:
-                    name = mc.strip_item_prefix(stack['name'])
-                    name = 'log' if name == 'log2' else name
-                    if name == "air":
-                        item_dict[name] += 1
-                    else:
-                        item_dict[name] += stack['count']
-                except (KeyError, ValueError):
-                    continue
-
+            slots = self._universal_slots(obs)
         except KeyError as e:
             self.logger.warning("KeyError found in universal observation! Yielding empty inventory.")
             self.logger.error(e)
-            return item_dict
+            return
+        self._add_stacks(counts, slots, 'name', 'count', strip_prefix=True)
 
-        return item_dict
+    def from_universal(self, obs):
+        inventory = self.empty()
+        self._add_universal(inventory.counts, obs)
+        return inventory
+
+    def from_universal_batch(self, observations) -> FlatInventory:
+        """Converts a sequence of universal observations into one inventory with a leading batch dimension."""
+        inventory = self.empty((len(observations),))
+        for counts, obs in zip(inventory.counts, observations):
+            self._add_universal(counts, obs)
+        return inventory
 
     def __or__(self, other):
         """
@@ -2,14 +2,76 @@
 # Author: William H. Guss, Brandon Houghton
 
 import jinja2
-from typing import List
+from typing import Any, Dict, List, Sequence
 
+from minerl.herobraine.hero.handlers.agent.observations.inventory import FlatInventory
 from minerl.herobraine.hero.handlers.translation import KeymapTranslationHandler, TranslationHandlerGroup
 import minerl.herobraine.hero.mc as mc
 from minerl.herobraine.hero import spaces
 import numpy as np
 
-__all__ = ['ObserveFromFullStats']
+__all__ = ['ObserveFromFullStats', 'FullStats', 'FullStatsDecoder']
+
+
+class FullStats(FlatInventory):
+    """The stats of an ObserveFromFullStats group, backed by a single int64 array.
+
+    Indexing by stat name, e.g. ``stats['mob_kills']``, is a 0-d view on ``counts``.
+    """
+
+    __slots__ = ()
+
+
+class FullStatsDecoder(object):
+    """Decodes the stats of an info dict into one int64 vector in a single pass.
+
+    Every stat key (a path into the info dict such as ``['mine_block', 'stone']``) has a stable index in the
+    vector, its position in key_lists. Stats missing from the info dict are 0.
+    """
+
+    def __init__(self, key_lists: Sequence[Sequence[str]]):
+        self.keys = [tuple(keys) for keys in key_lists]
+        # The indices of the stats under every section of the info dict, e.g. ('mine_block',) -> {'stone': 1}.
+        self._sections = {}  # type: Dict[tuple, Dict[str, int]]
+        for i, keys in enumerate(self.keys):
+            self._sections.setdefault(keys[:-1], {})[keys[-1]] = i
+
+    def __len__(self):
+        return len(self.keys)
+
+    def decode(self, info: Dict[str, Any], out: np.ndarray = None) -> np.ndarray:
+        """Gets the vector of the stats in info, a new one unless out is given."""
+        if out is None:
+            out = np.zeros(len(self.keys), dtype=np.int64)
+        else:
+            out.fill(0)
+        indices, values = [], []
+        for path, stats in self._sections.items():
+            section = info
+            for key in path:
+                section = section.get(key) if isinstance(section, dict) else None
+            if not section:
+                continue
+            # Walk whichever is smaller: the stats reported or the stats observed.
+            if len(section) < len(stats):
+                for name, value in section.items():
+                    i = stats.get(name)
+                    if i is not None:
+                        indices.append(i)
+                        values.append(value)
+            else:
+                for name, i in stats.items():
+                    value = section.get(name)
+                    if value is not None:
+                        indices.append(i)
+                        values.append(value)
+        # Fancy indexing only pays off over a few stats; the combat groups observe a single one.
+        if len(indices) > 8:
+            out[indices] = values
+        else:
+            for i, value in zip(indices, values):
+                out[i] = value
+        return out
 
 
 class ObserveFromFullStats(TranslationHandlerGroup):
@@ -34,6 +96,17 @@ class ObserveFromFullStats(TranslationHandlerGroup):
             super(ObserveFromFullStats, self).__init__(
                 handlers=[_FullStatsObservation(statKeys) for statKeys in mc.ALL_STAT_KEYS if stat_key in statKeys]
             )
+        # All stats of the group decode into one vector instead of a 0-d array per handler.
+        self.decoder = FullStatsDecoder([h.hero_keys for h in self.handlers])
+        # Later handlers of the same name win, as in the dict built by TranslationHandlerGroup.from_hero.
+        self.slots = {h.to_string(): i for i, h in enumerate(self.handlers)}
+
+    def from_hero(self, x: Dict[str, Any]) -> FullStats:
+        return FullStats(self.decoder.decode(x), self.slots)
+
+    def from_universal(self, x: Dict[str, Any]) -> FullStats:
+        # The universal stats are keyed like the hero ones.
+        return FullStats(self.decoder.decode(x), self.slots)
 
 
 class _FullStatsObservation(KeymapTranslationHandler):
@@ -0,0 +1,164 @@
+# Copyright (c) 2020 All Rights Reserved
+# Author: William H. Guss, Brandon Houghton
+
+"""
+Defines the observation of the entities around the agent, e.g. the mobs it fights.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+from minerl.herobraine.hero import spaces
+from minerl.herobraine.hero.handlers.translation import TranslationHandler
+
+__all__ = ['NearbyEntitiesObservation', 'ENTITY_TYPES', 'ENTITY_DTYPE', 'entity_type_id']
+
+# The entity types by their id. Names are those Malmo reports, e.g. "Zombie" (see EntityTypes in Types.xsd).
+ENTITY_TYPES = (
+    'other', 'player', 'item',
+    # Hostile mobs
+    'Zombie', 'Skeleton', 'Creeper', 'Spider', 'CaveSpider', 'Enderman', 'Witch', 'Slime', 'LavaSlime',
+    'Blaze', 'Ghast', 'PigZombie', 'Silverfish', 'Endermite', 'Guardian', 'ElderGuardian', 'Shulker',
+    'Husk', 'Stray', 'WitherSkeleton', 'ZombieVillager', 'EvocationIllager', 'VindicationIllager', 'Vex',
+    'Giant', 'EnderDragon', 'WitherBoss',
+    # Passive and neutral mobs
+    'Pig', 'Sheep', 'Cow', 'MushroomCow', 'Chicken', 'Rabbit', 'Horse', 'Donkey', 'Mule', 'SkeletonHorse',
+    'ZombieHorse', 'Llama', 'Wolf', 'Ozelot', 'PolarBear', 'Squid', 'Bat', 'Villager', 'VillagerGolem',
+    'SnowMan',
+    # Projectiles and orbs
+    'Arrow', 'Fireball', 'SmallFireball', 'XPOrb',
+)
+
+# One record per entity slot; unused slots are zero with a false mask.
+ENTITY_DTYPE = np.dtype([
+    ('type', np.int16),
+    ('position', np.float32, (3,)),
+    ('yaw', np.float32),
+    ('health', np.float32),
+    ('mask', np.bool_),
+])
+
+# Players are named after their agents in the mission XML, e.g. MineRLAgent1.
+_PLAYER_PREFIX = 'MineRLAgent'
+# The limit of the max health attribute in Minecraft.
+_MAX_HEALTH = 1024.0
+
+
+def _normalize(name: str) -> str:
+    # Also matches registry names, e.g. "minecraft:cave_spider" for "CaveSpider".
+    return name.split(':')[-1].replace('_', '').lower()
+
+
+_TYPE_IDS = {_normalize(name): i for i, name in enumerate(ENTITY_TYPES)}
+
+
+def entity_type_id(entity: Dict[str, Any]) -> int:
+    """Gets the type id of an entity reported by Malmo; entities of unknown types are 'other'."""
+    if 'quantity' in entity:
+        return 2
+    name = entity.get('name', '')
+    if name.startswith(_PLAYER_PREFIX):
+        return 1
+    return _TYPE_IDS.get(_normalize(name), 0)
+
+
+class NearbyEntitiesObservation(TranslationHandler):
+    """Observes up to max_entities entities nearest to the agent as fixed size arrays.
+
+    The observation is a dict of the fields of ENTITY_DTYPE: the ``type`` id (an index into ENTITY_TYPES),
+    the ``position`` relative to the agent, the ``yaw`` in degrees in [-180, 180), the ``health`` (zero for
+    entities without any) and a ``mask`` of the slots holding entities. The fields are views on a single
+    structured array of ENTITY_DTYPE, sorted by the distance to the agent. The agent itself is left out.
+
+    Positions are relative to the agent position reported by ObservationFromFullStats, which env specs
+    observing this should enable too (e.g. through ObservationFromCurrentLocation).
+
+    Args:
+        max_entities (int, optional): The number of entity slots.
+        xrange, yrange, zrange (float, optional): Observe entities closer than these along each axis.
+    """
+
+    def to_string(self) -> str:
+        return 'nearby_entities'
+
+    def xml_template(self) -> str:
+        return str(
+            """<ObservationFromNearbyEntities>
+                <Range name="{{ to_string() }}" xrange="{{ xrange }}" yrange="{{ yrange }}" zrange="{{ zrange }}"
+                       update_frequency="1"/>
+            </ObservationFromNearbyEntities>""")
+
+    def __init__(self, max_entities: int = 8, xrange: float = 16, yrange: float = 8, zrange: float = 16):
+        self.max_entities = max_entities
+        self.xrange, self.yrange, self.zrange = xrange, yrange, zrange
+        ranges = np.array([xrange, yrange, zrange], dtype=np.float32)
+        k = max_entities
+        super().__init__(space=spaces.Dict(OrderedDict([
+            ('type', spaces.Box(low=0, high=len(ENTITY_TYPES) - 1, shape=(k,), dtype=np.int16)),
+            ('position', spaces.Box(low=np.broadcast_to(-ranges, (k, 3)), high=np.broadcast_to(ranges, (k, 3)),
+                                    dtype=np.float32)),
+            ('yaw', spaces.Box(low=-180, high=180, shape=(k,), dtype=np.float32)),
+            ('health', spaces.Box(low=0, high=_MAX_HEALTH, shape=(k,), dtype=np.float32)),
+            ('mask', spaces.Box(low=False, high=True, shape=(k,), dtype=bool)),
+        ])))
+
+    def from_hero(self, info: Dict[str, Any]):
+        return self.fields(self.decode(info))
+
+    def decode(self, info: Dict[str, Any], out: np.ndarray = None) -> np.ndarray:
+        """Decodes the entities of the info dict into a structured array of max_entities records.
+
+        Args:
+            out (np.ndarray, optional): An array of max_entities records of ENTITY_DTYPE to fill.
+        """
+        if out is None:
+            out = np.zeros(self.max_entities, dtype=ENTITY_DTYPE)
+        else:
+            out[...] = 0
+        entities = info.get(self.to_string())
+        if not entities:
+            return out
+
+        origin = np.array([info.get('xpos', 0.0), info.get('ypos', 0.0), info.get('zpos', 0.0)])
+        positions = np.array([(e['x'], e['y'], e['z']) for e in entities], dtype=np.float64) - origin
+        distances = np.einsum('ij,ij->i', positions, positions)
+        # The agent is an entity too, at no distance from itself.
+        nearest = np.flatnonzero(distances > 0)
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')[:self.max_entities]]
+
+        n = len(nearest)
+        out['position'][:n] = positions[nearest]
+        yaws = np.array([entities[i].get('yaw', 0.0) for i in nearest], dtype=np.float64)
+        out['yaw'][:n] = (yaws + 180.0) % 360.0 - 180.0
+        out['health'][:n] = [entities[i].get('life', 0.0) for i in nearest]
+        out['type'][:n] = [entity_type_id(entities[i]) for i in nearest]
+        out['mask'][:n] = True
+        return out
+
+    def fields(self, entities: np.ndarray) -> Dict[str, np.ndarray]:
+        """Gets the observation of a structured array of ENTITY_DTYPE, as views on its fields."""
+        return OrderedDict((name, entities[name]) for name in ENTITY_DTYPE.names)
+
+    def to_entities(self, obs: Dict[str, Any], origin: Sequence[float] = (0, 0, 0)):
+        """Gets the entities Malmo would report for an observation, with the agent at origin."""
+        names = ('unknown', _PLAYER_PREFIX + '1', 'item') + ENTITY_TYPES[3:]
+        entities = []
+        for i in np.flatnonzero(obs['mask']):
+            x, y, z = (np.asarray(obs['position'][i], dtype=np.float64) + origin).tolist()
+            t = int(obs['type'][i])
+            entity = {'name': names[t], 'x': x, 'y': y, 'z': z, 'yaw': float(obs['yaw'][i])}
+            if t == 2:
+                entity['quantity'] = 1
+            else:
+                entity['life'] = float(obs['health'][i])
+            entities.append(entity)
+        return entities
+
+    def __or__(self, other):
+        assert isinstance(other, NearbyEntitiesObservation) and (
+            self.max_entities, self.xrange, self.yrange, self.zrange) == (
+            other.max_entities, other.xrange, other.yrange, other.zrange), (
+            "Incompatible handlers: {} and {}".format(self, other))
+        return self
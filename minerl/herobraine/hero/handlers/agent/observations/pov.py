@@ -5,10 +5,11 @@ import os
 import logging
 import warnings
 
+import cv2
 import jinja2
 from minerl.herobraine.hero.handlers.translation import KeymapTranslationHandler
 from minerl.herobraine.hero import spaces
-from typing import Tuple
+from typing import Optional, Tuple
 import numpy as np
 
 
@@ -28,44 +29,127 @@ class POVObservation(KeymapTranslationHandler):
                 <Height>{{ video_height }}</Height>
             </VideoProducer>""")
 
-    def __init__(self, video_resolution: Tuple[int, int], include_depth: bool = False):
+    def __init__(self, video_resolution: Tuple[int, int], include_depth: bool = False,
+                 crop: Optional[Tuple[int, int, int, int]] = None, resize: Optional[Tuple[int, int]] = None,
+                 grayscale: bool = False, channels_first: bool = False):
+        """
+        Frames are rendered at video_resolution and can be preprocessed before they are observed. The
+        preprocessing runs in a single pass over the frame: the (optionally cropped) frame is area resized
+        as Malmo sends it, bottom row first, and the flip, grayscale conversion and channel-first layout are
+        applied to the small result while it is copied into the observation.
+
+        :param video_resolution: (width, height) at which Minecraft renders.
+        :param include_depth: Observe the depth as a fourth channel.
+        :param crop: (x, y, width, height) of the region of the frame to keep, from its top left corner.
+        :param resize: (width, height) to area resize the (cropped) frame to.
+        :param grayscale: Observe one luminance channel instead of RGB.
+        :param channels_first: Observe (channels, height, width) instead of (height, width, channels).
+        """
         self.include_depth = include_depth
         self.video_resolution = video_resolution
-
-        space = None
-        if include_depth:
-            space = spaces.Box(0, 255, list(video_resolution)[::-1] + [4], dtype=np.uint8)
-            self.video_depth = 4
-        else:
-            space = spaces.Box(0, 255, list(video_resolution)[::-1] + [3], dtype=np.uint8)
-            self.video_depth = 3
+        self.video_depth = 4 if include_depth else 3
+        if grayscale and include_depth:
+            raise ValueError("Grayscale POV observations cannot include depth")
 
         # TODO (R): FIGURE THIS THE FUCK OUT & Document it.
         self.video_height = video_resolution[1]
         self.video_width = video_resolution[0]
 
+        if crop is not None:
+            x, y, width, height = crop
+            if x < 0 or y < 0 or width <= 0 or height <= 0 or \
+                    x + width > self.video_width or y + height > self.video_height:
+                raise ValueError("Crop {} is outside of the {}x{} frame".format(
+                    crop, self.video_width, self.video_height))
+            crop = tuple(crop)
+        if resize is not None:
+            resize = tuple(resize)
+        self.crop = crop
+        self.resize = resize
+        self.grayscale = grayscale
+        self.channels_first = channels_first
+        self.processed = crop is not None or resize is not None or grayscale or channels_first
+
+        width, height = resize or (crop[2:] if crop else video_resolution)
+        channels = 1 if grayscale else self.video_depth
+        shape = [channels, height, width] if channels_first else [height, width, channels]
+        space = spaces.Box(0, 255, shape, dtype=np.uint8)
+
         super().__init__(
             hero_keys=["pov"],
             univ_keys=["pov"], space=space)
 
+    @property
+    def raw_shape(self) -> Tuple[int, int, int]:
+        """The shape of the frames Minecraft renders, before any preprocessing."""
+        return self.video_height, self.video_width, self.video_depth
+
     def from_hero(self, obs):
-        byte_array = super().from_hero(obs)
-        pov = np.frombuffer(byte_array, dtype=np.uint8)
+        frame = obs.get('pov')
+        if isinstance(frame, np.ndarray):
+            # Frames which are already buffers (e.g. those cached by fake envs) are viewed, not copied.
+            pov = frame.reshape(-1)
+            if len(pov) and not self.processed:
+                return pov.reshape(self.raw_shape)[::-1, :, :]
+        elif isinstance(frame, (bytes, bytearray, memoryview)):
+            # The bytes are read in place; the flip or the preprocessing makes the only copy.
+            pov = np.frombuffer(frame, dtype=np.uint8)
+        else:
+            byte_array = super().from_hero(obs)
+            pov = np.frombuffer(byte_array, dtype=np.uint8)
 
         if pov is None or len(pov) == 0:
-            pov = np.zeros((self.video_height, self.video_width, self.video_depth), dtype=np.uint8)
-        else:
-            pov = pov.reshape((self.video_height, self.video_width, self.video_depth))[::-1, :, :]
+            return np.zeros(self.space.shape, dtype=np.uint8)
+        pov = pov.reshape(self.raw_shape)
+        if self.processed:
+            return self.process(pov, bottom_up=True)
+        return np.ascontiguousarray(pov[::-1, :, :])
 
+    def from_universal(self, obs):
+        pov = super().from_universal(obs)
+        if self.processed and pov.shape == self.raw_shape:
+            return self.process(pov)
         return pov
 
+    def process(self, frame: np.ndarray, bottom_up: bool = False, out: np.ndarray = None) -> np.ndarray:
+        """Preprocesses a frame of the raw shape into a new array in the space, or into out if given.
+
+        :param bottom_up: Whether the rows of the frame are bottom first, as Malmo sends them.
+        """
+        if self.crop is not None:
+            x, y, width, height = self.crop
+            if bottom_up:
+                y = self.video_height - y - height
+            # A view; the resize reads the region in place.
+            frame = frame[y:y + height, x:x + width]
+        if self.resize is not None and self.resize != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.resize, interpolation=cv2.INTER_AREA)
+        if self.grayscale:
+            frame = cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2GRAY)[:, :, None]
+        if bottom_up:
+            frame = frame[::-1]
+        if self.channels_first:
+            frame = frame.transpose(2, 0, 1)
+
+        if out is None:
+            out = np.empty(self.space.shape, dtype=np.uint8)
+        np.copyto(out, frame)
+        return out
+
+    def image(self, pov: np.ndarray) -> np.ndarray:
+        """Gets an observed frame as a (height, width, channels) image, e.g. to show it."""
+        return pov.transpose(1, 2, 0) if self.channels_first else pov
+
     def __or__(self, other):
         """
         Combines two POV observations into one. If all of the properties match return self
         otherwise raise an exception.
         """
         if isinstance(other, POVObservation) and self.include_depth == other.include_depth and \
-                self.video_resolution == other.video_resolution:
-            return POVObservation(self.video_resolution, include_depth=self.include_depth)
+                self.video_resolution == other.video_resolution and self._pipeline() == other._pipeline():
+            return POVObservation(self.video_resolution, self.include_depth, *self._pipeline())
         else:
             raise ValueError("Incompatible observables!")
+
+    def _pipeline(self):
+        return self.crop, self.resize, self.grayscale, self.channels_first
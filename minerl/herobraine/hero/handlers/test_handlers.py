@@ -37,3 +37,200 @@ def test_merge_flat_inventory_observation():
 
 def test_combine_compass_observations():
     assert CompassObservation() | CompassObservation() == CompassObservation()
+
+
+def test_flat_inventory_from_hero():
+    import copy
+    import pickle
+
+    import numpy as np
+
+    handler = FlatInventoryObservation(['air', 'dirt', 'log', 'stone'])
+    inventory = handler.from_hero({'inventory': [
+        {'type': 'dirt', 'quantity': 3}, {'type': 'dirt', 'quantity': 64}, {'type': 'log2', 'quantity': 2},
+        {'type': 'air', 'quantity': 0}, {'type': 'air', 'quantity': 0}, {'type': 'diamond', 'quantity': 1},
+        {'type': 'stone'}]})
+    assert inventory.counts.dtype == np.int32
+    assert inventory.counts.tolist() == [2, 67, 2, 0]
+    assert list(inventory) == ['air', 'dirt', 'log', 'stone']
+    assert inventory['dirt'] == 67 and 'diamond' not in inventory
+    assert inventory in handler.space
+    assert dict(inventory.as_dict()) == {'air': 2, 'dirt': 67, 'log': 2, 'stone': 0}
+
+    inventory['stone'] += 5
+    assert inventory.counts[3] == 5
+    clone = copy.deepcopy(inventory)
+    clone['dirt'] = 0
+    assert inventory['dirt'] == 67
+    assert pickle.loads(pickle.dumps(inventory)).counts.tolist() == [2, 67, 2, 5]
+
+
+def test_flat_inventory_from_universal_batch():
+    handler = FlatInventoryObservation(['air', 'dirt', 'log'])
+
+    def frame(*stacks, gui='class net.minecraft.inventory.ContainerPlayer'):
+        return {'slots': {'gui': {'type': gui, 'slots': [{'name': 'minecraft:dirt', 'count': 9}] + list(stacks)}}}
+
+    frames = [
+        frame({'name': 'minecraft:dirt', 'count': 4}, {'name': 'minecraft:air', 'count': 0}),
+        frame({'name': 'minecraft:log2', 'count': 3}, gui='class net.minecraft.inventory.ContainerChest'),
+        {'slots': {}},
+    ]
+    batch = handler.from_universal_batch(frames)
+    assert batch.counts.tolist() == [[1, 4, 0], [0, 9, 3], [0, 0, 0]]
+    assert batch['dirt'].tolist() == [4, 9, 0]
+    for i, f in enumerate(frames):
+        assert handler.from_universal(f).counts.tolist() == batch.counts[i].tolist()
+
+
+def test_full_stats_decode_matches_handlers():
+    import pickle
+
+    import numpy as np
+
+    from minerl.herobraine.hero.handlers.agent.observations.mc_base_stats import FullStats, ObserveFromFullStats
+    from minerl.herobraine.hero.handlers.translation import TranslationHandlerGroup
+
+    info = {'custom': {'mob_kills': 3, 'damage_dealt': 7, 'drop': 1},
+            'mine_block': {'stone': 4, 'dirt': 2, 'not_a_block': 5},
+            'drop': {'stone': 6}}
+    for stat_key in [None, 'mob_kills', 'drop', 'mine_block', 'use_item']:
+        group = ObserveFromFullStats(stat_key)
+        stats = group.from_hero(info)
+        expected = TranslationHandlerGroup.from_hero(group, info)
+        assert isinstance(stats, FullStats) and stats.counts.dtype == np.int64
+        assert list(stats) == list(expected)
+        for name, value in expected.items():
+            assert stats[name] == value and stats[name].shape == ()
+        assert stats in group.space
+
+    group = ObserveFromFullStats('mob_kills')
+    stats = group.from_hero(info)
+    kills = stats['mob_kills']
+    assert group.from_hero({})['mob_kills'] == 0 and kills == 3
+    assert pickle.loads(pickle.dumps(stats)).counts.tolist() == [3]
+
+
+def test_pov_pipeline():
+    import cv2
+    import numpy as np
+
+    from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation
+
+    frame = np.random.RandomState(0).randint(0, 256, size=(36, 64, 3), dtype=np.uint8)
+    info = {'pov': frame[::-1].tobytes()}
+
+    raw = POVObservation((64, 36))
+    assert not raw.processed and (raw.from_hero(info) == frame).all()
+
+    handler = POVObservation((64, 36), crop=(8, 4, 48, 24), resize=(12, 6), grayscale=True, channels_first=True)
+    assert handler.space.shape == (1, 6, 12) and handler.raw_shape == (36, 64, 3)
+    expected = cv2.cvtColor(cv2.resize(frame[4:28, 8:56], (12, 6), interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2GRAY)
+    pov = handler.from_hero(info)
+    assert pov.shape == (1, 6, 12) and pov.flags['C_CONTIGUOUS']
+    assert np.abs(pov[0].astype(int) - expected).max() <= 1
+    assert (handler.from_universal({'pov': frame}) == pov).all()
+    assert handler.image(pov).shape == (6, 12, 1)
+    assert handler.from_hero({'pov': b''}).shape == (1, 6, 12)
+
+
+def test_nearby_entities_observation():
+    import numpy as np
+
+    from minerl.env.payloads import HeroPayloadGenerator
+    from minerl.herobraine.hero.handlers.agent.observations.nearby_entities import (
+        ENTITY_TYPES, NearbyEntitiesObservation)
+
+    handler = NearbyEntitiesObservation(max_entities=3)
+    info = {'xpos': 10.0, 'ypos': 64.0, 'zpos': -5.0, 'nearby_entities': [
+        {'name': 'MineRLAgent0', 'x': 10.0, 'y': 64.0, 'z': -5.0, 'yaw': 0.0, 'life': 20.0},
+        {'name': 'Cow', 'x': 14.0, 'y': 64.0, 'z': -5.0, 'yaw': 190.0, 'life': 10.0},
+        {'name': 'Zombie', 'x': 11.0, 'y': 64.0, 'z': -4.0, 'yaw': -90.0, 'life': 20.0},
+        {'name': 'stone', 'x': 10.0, 'y': 63.0, 'z': -3.0, 'yaw': 0.0, 'quantity': 4},
+        {'name': 'Unicorn', 'x': 20.0, 'y': 64.0, 'z': -5.0, 'yaw': 0.0, 'life': 5.0},
+    ]}
+    obs = handler.from_hero(info)
+    assert obs in handler.space
+    assert [ENTITY_TYPES[t] for t in obs['type']] == ['Zombie', 'item', 'Cow']
+    np.testing.assert_allclose(obs['position'], [[1, 0, 1], [0, -1, 2], [4, 0, 0]])
+    np.testing.assert_allclose(obs['yaw'], [-90, 0, -170])
+    np.testing.assert_allclose(obs['health'], [20, 0, 10])
+    assert obs['mask'].all()
+
+    empty = handler.from_hero({})
+    assert empty in handler.space and not empty['mask'].any()
+
+    # Payloads decode to the observation they were generated for.
+    generator = HeroPayloadGenerator([handler])
+    _, payload = generator.payload({handler.to_string(): obs})
+    decoded = handler.from_hero(payload)
+    for k in obs:
+        np.testing.assert_allclose(decoded[k], obs[k], atol=1e-5)
+
+
+def test_handler_group_lookup_tables():
+    import pickle
+
+    import pytest
+
+    from minerl.herobraine.hero.handlers.agent.observations.lifestats import ObservationFromLifeStats
+
+    group = ObservationFromLifeStats()
+    assert group.handler_keys == tuple(sorted(h.to_string() for h in group.handlers))
+    assert list(group.handler_dict) == list(group.handler_keys) == list(group.space.spaces)
+    assert all(group.handler_dict[h.to_string()] is h for h in group.handlers)
+    with pytest.raises(TypeError):
+        group.handler_dict['life'] = None
+    assert pickle.loads(pickle.dumps(group)).handler_keys == group.handler_keys
+
+
+def test_equipment_decoder_matches_handlers():
+    import numpy as np
+
+    from minerl.herobraine.hero.handlers.agent.observations.equipped_item import (
+        EquipmentDecoder, EquippedItemObservation)
+    from minerl.herobraine.hero.handlers.translation import TranslationHandlerGroup
+
+    def assert_same(actual, expected):
+        assert list(actual) == list(expected)
+        for slot in expected:
+            assert actual[slot]['type'] == expected[slot]['type']
+            for field in ('damage', 'maxDamage'):
+                assert actual[slot][field] == expected[slot][field]
+                assert actual[slot][field].dtype == expected[slot][field].dtype
+
+    items = ['air', 'diamond_sword', 'iron_helmet', 'stone']
+    group = EquippedItemObservation(items=list(items), offhand=True, armor=True)
+    info = {'equipped_items': {
+        'mainhand': {'type': 'diamond_sword', 'currentDamage': 3, 'maxDamage': 1561},
+        'offhand': {'type': 'shield', 'currentDamage': 0, 'maxDamage': 336},
+        'head': {'type': 'iron_helmet'},
+    }}
+    for i in [info, {}, {'equipped_items': {}}]:
+        equipment = group.decoder.decode(i)
+        assert equipment.shape == (6, 3) and equipment.dtype == np.int64
+        assert_same(group.from_hero(i), TranslationHandlerGroup.from_hero(group, i))
+        assert group.from_hero(i) in group.space
+    equipment = group.decoder.decode(info)
+    mainhand = group.decoder.slots.index('mainhand')
+    assert group.decoder.item_names(equipment[mainhand, EquipmentDecoder.TYPE]) == 'diamond_sword'
+    assert equipment[group.decoder.slots.index('offhand'), EquipmentDecoder.TYPE] == group.decoder.other_id
+
+    mainhand = EquippedItemObservation(items=list(items))
+
+    def frame(name, gui='class net.minecraft.inventory.ContainerPlayer'):
+        # The hotbar is the last 9 slots, before the offhand slot of the player's own container.
+        slots = [{'name': 'minecraft:stone', 'damage': 0, 'maxDamage': 0}] * 5
+        slots += [{'name': name, 'damage': 5, 'maxDamage': 250}] + [{}] * 8
+        if gui == 'class net.minecraft.inventory.ContainerPlayer':
+            slots.append({'name': 'minecraft:stone'})
+        return {'hotbar': 0, 'slots': {'gui': {'type': gui, 'slots': slots}}}
+
+    frames = [frame('minecraft:diamond_sword'), frame('minecraft:air'), frame('minecraft:bow'),
+              frame('minecraft:stone', gui='class net.minecraft.inventory.ContainerChest'), {}]
+    for f in frames:
+        assert_same(mainhand.from_universal(f), TranslationHandlerGroup.from_universal(mainhand, f))
+    batch = mainhand.from_universal_batch(frames)
+    assert batch['mainhand']['type'].tolist() == ['diamond_sword', 'none', 'other', 'stone', 'none']
+    assert batch['mainhand']['damage'].tolist() == [5, 5, 5, 5, 0]
+    assert batch['mainhand']['damage'].dtype == np.int32
@@ -3,6 +3,7 @@
 
 from collections import OrderedDict
 import logging
+from types import MappingProxyType
 
 import numpy as np
 from minerl.herobraine.hero.spaces import MineRLSpace
@@ -97,12 +98,19 @@ class KeymapTranslationHandler(TranslationHandler):
 
 class TranslationHandlerGroup(TranslationHandler):
     """Combines several space handlers into a single handler group.
+
+    The handlers are sorted by their to_string(), which is looked up once: handler_keys holds the keys in
+    order and handler_dict maps them to the handlers (read-only).
     """
 
     def __init__(self, handlers: List[TranslationHandler]):
-        self.handlers = sorted(handlers, key=lambda x: x.to_string())
+        items = sorted(((h.to_string(), h) for h in handlers), key=lambda item: item[0])
+        self.handlers = [h for _, h in items]
+        self.handler_keys = tuple(k for k, _ in items)
+        self._handler_items = tuple(items)
+        self._handler_dict = OrderedDict(items)
         super(TranslationHandlerGroup, self).__init__(
-            spaces.Dict([(h.to_string(), h.space) for h in self.handlers])
+            spaces.Dict([(k, h.space) for k, h in items])
         )
 
     def to_hero(self, x: typing.Dict[str, Any]) -> str:
@@ -112,7 +120,7 @@ class TranslationHandlerGroup(TranslationHandler):
         """
 
         return "\n".join(
-            [self.handler_dict[s].to_hero(x[s]) for s in self.handler_dict])
+            [h.to_hero(x[k]) for k, h in self._handler_items])
 
     def from_hero(self, x: typing.Dict[str, Any]) -> typing.Dict[str, Any]:
         """Applies the constituent from_hero methods on the object X 
@@ -120,20 +128,19 @@ class TranslationHandlerGroup(TranslationHandler):
            handlers applied."""
 
         return {
-            h.to_string(): h.from_hero(x)
-            for h in self.handlers
+            k: h.from_hero(x)
+            for k, h in self._handler_items
         }
 
     def from_universal(self, x: typing.Dict[str, Any]) -> typing.Dict[str, Any]:
         """Performs the same operation as from_hero except with from_universal.
         """
         return {
-            h.to_string(): h.from_universal(x)
-            for h in self.handlers
+            k: h.from_universal(x)
+            for k, h in self._handler_items
         }
 
     @property
-    def handler_dict(self) -> typing.Dict[str, Handler]:
-        return {
-            h.to_string(): h for h in self.handlers
-        }
+    def handler_dict(self) -> typing.Mapping[str, Handler]:
+        # A read-only view, as mapping proxies cannot be pickled (with the env specs holding the group).
+        return MappingProxyType(self._handler_dict)
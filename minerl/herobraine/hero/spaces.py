@@ -14,9 +14,11 @@ from typing import List
 
 import gym
 import logging
+import math
 import gym.spaces
 import numpy as np
 import collections
+import collections.abc
 import warnings
 import abc
 
@@ -56,6 +58,14 @@ class MineRLSpace(abc.ABC, gym.Space):
     def sample(self, bdim=None):
         pass
 
+    def contains_batch(self, x) -> np.ndarray:
+        """Checks every element of a batch of values (with leading batch dimensions) for containment.
+
+        Returns:
+            np.ndarray: A boolean array of the batch shape.
+        """
+        raise NotImplementedError("{} does not support batched containment".format(type(self).__name__))
+
     def noop(self, batch_shape=()):
         """Backwards compatibility layer.
 
@@ -69,6 +79,52 @@ class MineRLSpace(abc.ABC, gym.Space):
                       "Please change your code to reflect this change.", DeprecationWarning)
         return self.no_op(batch_shape)
 
+    def packed_dtype(self) -> np.dtype:
+        """The numpy (for Dict spaces structured) dtype of packed values of the space.
+
+        Packed values are fixed size records, so transitions can be stored contiguously, e.g. in a memmap
+        or shared memory.
+        """
+        raise NotImplementedError("{} cannot be packed".format(type(self).__name__))
+
+    def pack(self, x) -> np.ndarray:
+        """Packs a value of the space into a single (0-d) record of packed_dtype()."""
+        out = np.empty((), dtype=self.packed_dtype())
+        self._pack_into(out, x)
+        return out
+
+    def pack_many(self, xs, out: np.ndarray = None) -> np.ndarray:
+        """Packs many values of the space into a record array.
+
+        Args:
+            xs: A sequence of values, or a batched value whose leaves have a leading batch dimension.
+            out (np.ndarray, optional): A preallocated array of len(xs) records of packed_dtype() to fill.
+        """
+        columns = self._columns(xs)
+        if out is None:
+            out = np.empty(self._batch_len(columns), dtype=self.packed_dtype())
+        self._pack_into(out, columns)
+        return out
+
+    def unpack(self, record):
+        """Unpacks a record, or an array of them, into a value of the space (batched for arrays)."""
+        return self._unpack(np.asarray(record))
+
+    def _columns(self, xs):
+        return xs
+
+    def _batch_len(self, columns):
+        return len(columns)
+
+    def _pack_into(self, out, x):
+        out[...] = self._to_packed(x)
+
+    def _to_packed(self, x):
+        return x
+
+    def _unpack(self, value):
+        return value[()] if value.ndim == 0 else value
+
 
 class Tuple(gym.spaces.Tuple, MineRLSpace):
 
@@ -85,9 +141,58 @@ class Tuple(gym.spaces.Tuple, MineRLSpace):
         raise NotImplementedError()
 
 
+def _split_batch(x, shape):
+    """Gets x as an array and its batch shape, or None if its trailing dimensions are not shape."""
+    x = np.asarray(x)
+    if x.ndim < len(shape) or x.shape[x.ndim - len(shape):] != tuple(shape):
+        return x, None
+    return x, x.shape[:x.ndim - len(shape)]
+
+
+def _is_finite(bound) -> bool:
+    if isinstance(bound, (int, float)):
+        return math.isfinite(bound)
+    return bool(np.isfinite(np.asarray(bound, dtype=np.float64)).all())
+
+
+def _finite_bound(bound, limit):
+    """Replaces infinite bounds of integer boxes, which would overflow when cast, with the dtype's limit."""
+    infinite = np.isinf(np.asarray(bound, dtype=np.float64))
+    if not np.any(infinite):
+        return bound
+    if np.isscalar(bound):
+        return limit
+    bound = np.array(bound, dtype=object)
+    bound[infinite] = limit
+    return bound
+
+
 class Box(gym.spaces.Box, MineRLSpace):
-    def __init__(self, *args, normalizer_scale='linear', **kwargs):
-        super(Box, self).__init__(*args, **kwargs)
+    def __init__(self, low, high, shape=None, dtype=np.float32, normalizer_scale='linear'):
+        infinite_low = infinite_high = None
+        # Only integer boxes with an infinite bound take the slow path; thousands of boxes are built at import.
+        if np.dtype(dtype).kind in 'iu' and not (_is_finite(low) and _is_finite(high)):
+            info = np.iinfo(dtype)
+            if isinstance(low, (int, float)) and isinstance(high, (int, float)):
+                # Scalar bounds, e.g. the stat boxes of ObserveFromFullStats, need no array ops.
+                infinite_low, infinite_high = low == -math.inf, high == math.inf
+                low = info.min if infinite_low else low
+                high = info.max if infinite_high else high
+            else:
+                infinite_low = np.isneginf(np.asarray(low, float))
+                infinite_high = np.isposinf(np.asarray(high, float))
+                low, high = _finite_bound(low, info.min), _finite_bound(high, info.max)
+        super(Box, self).__init__(low, high, shape=shape, dtype=dtype)
+        if infinite_low is not None:
+            # The limits of infinite integer bounds are not bounds to sample between.
+            if isinstance(infinite_low, bool):
+                if infinite_low:
+                    self.bounded_below = self.bounded_below & False
+                if infinite_high:
+                    self.bounded_above = self.bounded_above & False
+            else:
+                self.bounded_below &= ~np.broadcast_to(infinite_low, self.shape)
+                self.bounded_above &= ~np.broadcast_to(infinite_high, self.shape)
 
         self._flat_low = self.low.flatten().astype(np.float64)
         self._flat_high = self.high.flatten().astype(np.float64)
@@ -141,11 +246,24 @@ class Box(gym.spaces.Box, MineRLSpace):
         if np.issubdtype(self.dtype, np.integer):
             return np.round(reshaped).astype(self.dtype)
         else:
-            return reshaped.astype(self.dtype)
+            return reshaped.astype(self.dtype, copy=False)
 
     def is_flattenable(self):
         return len(self.shape) <= 2
 
+    def packed_dtype(self):
+        return np.dtype((self.dtype, self.shape))
+
+    def _unpack(self, value):
+        return value
+
+    def contains_batch(self, x):
+        x, batch_shape = _split_batch(x, self.shape)
+        if batch_shape is None:
+            return np.zeros(x.shape[:1], dtype=bool)
+        axes = tuple(range(len(batch_shape), x.ndim))
+        return np.all((x >= self.low) & (x <= self.high), axis=axes)
+
     def clip(self, x):
         # Clips the vector x between the vectors self.low and self.high.
         return np.clip(x, self.low, self.high)
@@ -220,10 +338,19 @@ class Discrete(gym.spaces.Discrete, MineRLSpace):
     def unmap(self, x):
         return np.array(np.argmax(x, axis=-1), dtype=self.dtype)
 
+    def packed_dtype(self):
+        return np.dtype(self.dtype)
+
     def sample(self, bs=None):
         bdim = () if bs is None else (bs,)
         return self.np_random.randint(self.n, size=bdim)
 
+    def contains_batch(self, x):
+        x = np.asarray(x)
+        if x.dtype.kind not in 'iu':
+            return np.zeros(x.shape, dtype=bool)
+        return (x >= 0) & (x < self.n)
+
 
 class Enum(Discrete, MineRLSpace):
     """
@@ -263,9 +390,11 @@ class Enum(Discrete, MineRLSpace):
         return self.values[super().sample(bs)]
 
     def flat_map(self, x):
+        """Maps enum values (or their indices), a single one or an array of any shape, to one-hot vectors."""
         return super().flat_map(self[x])
 
     def unmap(self, x):
+        """Maps (batches of) one-hot vectors back to the enum values."""
         return self.values[super().unmap(x)]
 
     def no_op(self, batch_shape=()):
@@ -278,23 +407,46 @@ class Enum(Discrete, MineRLSpace):
             return self.values[super().no_op(batch_shape)]
 
     def __getitem__(self, action):
-        try:
-            single_act = False
-            if isinstance(action, str):
-                single_act = True
-                action = np.array([action])
-
-            u, inv = np.unique(action, return_inverse=True)
-
-            inds = np.array([self.value_map[x] for x in u])[inv].reshape(action.shape)
-
-            return inds if not single_act else inds.tolist()[0]
+        """Gets the index of an enum value or the indices of an array of them.
 
-        except ValueError:
-            raise ValueError("\"{}\" not valid ENUM value in values {}".format(action, self.values))
-
-        # TODO support more action formats through np.all < super().n
-        raise ValueError("spaces.Enum: action must be of type str or int")
+        Indices (ints or integer arrays) are validated and returned as they are.
+        """
+        if isinstance(action, str):
+            index = self.value_map.get(action)
+            if index is None:
+                raise ValueError("\"{}\" not valid ENUM value in values {}".format(action, self.values))
+            return index
+        if isinstance(action, (int, np.integer)):
+            if not 0 <= action < self.n:
+                raise ValueError("{} not a valid ENUM index for {} values".format(action, self.n))
+            return int(action)
+
+        action = np.asarray(action)
+        if action.dtype.kind in 'iu':
+            if action.size and (action.min() < 0 or action.max() >= self.n):
+                raise ValueError("{} not valid ENUM indices for {} values".format(action, self.n))
+            return action
+        if action.dtype.kind != 'U':
+            action = action.astype(str)
+
+        # self.values is sorted, so the index of every valid value is where it would be inserted.
+        inds = np.minimum(np.searchsorted(self.values, action), self.n - 1)
+        valid = self.values[inds] == action
+        if not np.all(valid):
+            raise ValueError("\"{}\" not valid ENUM value in values {}".format(
+                np.unique(action[~valid]), self.values))
+        return inds
+
+    def packed_dtype(self):
+        # Enum values are packed as their indices.
+        return np.min_scalar_type(self.n - 1)
+
+    def _to_packed(self, x):
+        return self[x]
+
+    def _unpack(self, value):
+        values = self.values[value]
+        return str(values) if values.ndim == 0 else values
 
     def __str__(self):
         return "Enum(" + ','.join(self.values) + ")"
@@ -303,12 +455,23 @@ class Enum(Discrete, MineRLSpace):
         return len(self.values)
 
     def contains(self, x):
+        if isinstance(x, str):
+            return x in self.value_map
         return x in self.values
 
     __contains__ = contains
 
+    def contains_batch(self, x):
+        """Checks a batch of enum values (strings, not indices) for containment."""
+        x = np.asarray(x)
+        if x.dtype.kind != 'U':
+            return np.zeros(x.shape, dtype=bool)
+        return self.values[np.minimum(np.searchsorted(self.values, x), self.n - 1)] == x
+
+
+_FlatField = collections.namedtuple('_FlatField', ['key', 'space', 'start', 'stop'])
+
 
-# TODO: Vectorize containment?
 class Dict(gym.spaces.Dict, MineRLSpace):
     def no_op(self, batch_shape=()):
         return OrderedDict([(k, space.no_op(batch_shape=batch_shape)) for k, space in self.spaces.items()])
@@ -335,6 +498,24 @@ class Dict(gym.spaces.Dict, MineRLSpace):
             (k, v.sample(bs)) for k, v in self.spaces.items()
         ])
 
+    def contains(self, x):
+        # Values of subspaces may be mappings other than dicts, e.g. array-backed inventories.
+        if not isinstance(x, collections.abc.Mapping) or len(x) != len(self.spaces):
+            return False
+        return all(k in x and space.contains(x[k]) for k, space in self.spaces.items())
+
+    __contains__ = contains
+
+    def contains_batch(self, x):
+        """Checks a batched value, whose leaves have leading batch dimensions, for containment."""
+        contained = None
+        for k, v in self.spaces.items():
+            if k not in x:
+                return np.zeros(contained.shape if contained is not None else (), dtype=bool)
+            c = v.contains_batch(x[k])
+            contained = c if contained is None else contained & c
+        return contained
+
     @property
     def unflattened(self):
         """
@@ -344,42 +525,80 @@ class Dict(gym.spaces.Dict, MineRLSpace):
             self._unflattened = self.create_unflattened_space()
         return self._unflattened
 
-    def flat_map(self, x):
-        # This could be refactored and externalized.
-        # TODO: 1. Make all spaces have a shape.
-        # TODO: 2. Make vectorization a first class citizen gym3?
-
-        try:
-            batch_shape = ()
-
-            for (k, v) in self.spaces.items():
-                if k in x and v.is_flattenable():
-                    # Get batch_shape from x[k]
-                    if not hasattr(x[k], 'shape'):
-                        # If any x[k] is a python prim well then clearly
-                        # we are not vectorized; so there is no batch_size.
-                        break
-                    try:
-                        batch_shape = x[k].shape if len(v.shape) == 0 else x[k].shape[:-len(v.shape)]
-                        break
-                    except AttributeError:
-                        # Cannot determine batch_size from vector without shape
-                        pass
-
-            stuff_to_cat = []
-            for (k, v) in self.spaces.items():
+    @property
+    def flat_layout(self):
+        """The flattenable subspaces as (key, space, start, stop) with their slice of the flattened vector.
+
+        The layout is computed once, together with the dtype of the flattened vector and the flattened
+        no-op of every subspace (used for missing keys).
+        """
+        if not hasattr(self, '_flat_layout'):
+            layout, no_ops, start = [], {}, 0
+            for k, v in self.spaces.items():
                 if v.is_flattenable():
-                    stuff_to_cat.append((
-                        v.flat_map(x[k])
-                        if k in x else v.flat_map(v.no_op(batch_shape))
-                    ))
-            return np.concatenate(
-                stuff_to_cat,
-                axis=-1
-            )
-        except ValueError as e:
+                    size = v.flattened.shape[0]
+                    layout.append(_FlatField(k, v, start, start + size))
+                    no_ops[k] = v.flat_map(v.no_op())
+                    start += size
+            self._flat_no_ops = no_ops
+            self._flat_dtype = np.result_type(*no_ops.values()) if no_ops else np.float64
+            self._flat_layout = layout
+        return self._flat_layout
+
+    def _batch_shape(self, x):
+        for k, v, _, _ in self.flat_layout:
+            if k in x:
+                # If any x[k] is a python prim well then clearly
+                # we are not vectorized; so there is no batch_size.
+                if not hasattr(x[k], 'shape'):
+                    return ()
+                if isinstance(v, Dict):
+                    return v._batch_shape(x[k])
+                return x[k].shape if len(v.shape) == 0 else x[k].shape[:-len(v.shape)]
+        return ()
+
+    def flat_map(self, x, out=None):
+        """Flattens x into one vector (or a batch of them) in a single pass over the cached layout.
+
+        Args:
+            x (OrderedDict): A value of the space, possibly batched. Missing keys are flattened as no-ops.
+            out (np.ndarray, optional): A buffer of shape batch_shape + (flattened size,) to write into.
+        """
+        layout = self.flat_layout
+        if not layout:
             # No flattenable handlers found
             return np.array([])
+        if out is None:
+            out = np.empty(self._batch_shape(x) + self.flattened.shape, dtype=self._flat_dtype)
+
+        for k, v, start, stop in layout:
+            if k not in x:
+                out[..., start:stop] = self._flat_no_ops[k]
+            elif isinstance(v, Dict):
+                v.flat_map(x[k], out=out[..., start:stop])
+            else:
+                out[..., start:stop] = v.flat_map(x[k])
+        return out
+
+    def packed_dtype(self):
+        return np.dtype([(k, v.packed_dtype()) for k, v in self.spaces.items()])
+
+    def _columns(self, xs):
+        if isinstance(xs, collections.abc.Mapping):
+            # Already batched.
+            return xs
+        return OrderedDict([(k, v._columns([x[k] for x in xs])) for k, v in self.spaces.items()])
+
+    def _batch_len(self, columns):
+        k, v = next(iter(self.spaces.items()))
+        return v._batch_len(columns[k])
+
+    def _pack_into(self, out, x):
+        for k, v in self.spaces.items():
+            v._pack_into(out[k], x[k])
+
+    def _unpack(self, value):
+        return OrderedDict([(k, v._unpack(value[k])) for k, v in self.spaces.items()])
 
     def unflattenable_map(self, x: OrderedDict) -> OrderedDict:
         """
@@ -395,28 +614,25 @@ class Dict(gym.spaces.Dict, MineRLSpace):
         })
 
     def unmap(self, x: np.ndarray, skip=False) -> OrderedDict:
+        """Splits the flattened x into the subspaces; their parts of x are sliced as views."""
+        if not skip and len(self.flat_layout) < len(self.spaces):
+            raise ValueError('Dict space contains is_flattenable values - unmap with unmap_mixed')
         unmapped = collections.OrderedDict()
-        cur_index = 0
-        for k, v in self.spaces.items():
-            if v.is_flattenable():
-                unmapped[k] = v.unmap(x[..., cur_index:cur_index + v.flattened.shape[0]])
-                cur_index += v.flattened.shape[0]
-            elif not skip:
-                raise ValueError('Dict space contains is_flattenable values - unmap with unmap_mixed')
-
+        for k, v, start, stop in self.flat_layout:
+            unmapped[k] = v.unmap(x[..., start:stop])
         return unmapped
 
     def unmap_mixed(self, x: np.ndarray, aux: OrderedDict):
         # split x
         unmapped = collections.OrderedDict()
-        cur_index = 0
+        slices = {k: (start, stop) for k, _, start, stop in self.flat_layout}
         for k, v in self.spaces.items():
-            if v.is_flattenable():
+            if k in slices:
+                start, stop = slices[k]
                 try:
-                    unmapped[k] = v.unmap_mixed(x[..., cur_index:cur_index + v.flattened.shape[0]], aux[k])
+                    unmapped[k] = v.unmap_mixed(x[..., start:stop], aux[k])
                 except (KeyError, AttributeError):
-                    unmapped[k] = v.unmap(x[..., cur_index:cur_index + v.flattened.shape[0]])
-                cur_index += v.flattened.shape[0]
+                    unmapped[k] = v.unmap(x[..., start:stop])
             else:
                 unmapped[k] = aux[k]
 
@@ -426,7 +642,13 @@ class Dict(gym.spaces.Dict, MineRLSpace):
 class MultiDiscrete(gym.spaces.MultiDiscrete, MineRLSpace):
     def __init__(self, *args, **kwargs):
         super(MultiDiscrete, self).__init__(*args, **kwargs)
-        self.eyes = [np.eye(n, dtype=np.float32) for n in self.nvec]
+        # The offset of every component's one-hot segment in the flattened vector.
+        self.offsets = np.concatenate([[0], np.cumsum(self.nvec)[:-1]]).astype(np.int64)
+        self._flat_size = int(np.sum(self.nvec))
+        # Gathers every segment into a row padded to the widest one. Padding repeats the segment's first
+        # position, which never changes its (first) argmax.
+        width = np.arange(np.max(self.nvec))
+        self._segments = np.where(width < self.nvec[:, None], self.offsets[:, None] + width, self.offsets[:, None])
 
     def no_op(self, batch_shape=()):
         return (np.zeros(list(batch_shape) + list(self.nvec.shape)) * self.nvec).astype(self.dtype)
@@ -436,23 +658,37 @@ class MultiDiscrete(gym.spaces.MultiDiscrete, MineRLSpace):
             np.sum(self.nvec)
         ])
 
-    def flat_map(self, x):
-        return np.concatenate(
-            [self.eyes[i][x[..., i]] for i in range(len(self.nvec))],
-            axis=-1)
+    def flat_map(self, x, out=None):
+        """One-hot encodes every component of x (of any batch shape) in a single scatter."""
+        x = np.asarray(x)
+        if out is None:
+            out = np.zeros(x.shape[:-1] + (self._flat_size,), dtype=np.float32)
+        else:
+            out[...] = 0
+        np.put_along_axis(out, x + self.offsets, 1, axis=-1)
+        return out
 
-    def unmap(self, x):
-        cur_index = 0
-        out = []
-        for n in self.nvec:
-            out.append(np.argmax(x[..., cur_index:cur_index + n], axis=-1)[..., np.newaxis])
-            cur_index += n
-        return np.concatenate(out, axis=-1).astype(self.dtype)
+    def unmap(self, x, out=None):
+        """Gets the argmax of every component's segment of x (of any batch shape)."""
+        indices = np.argmax(np.asarray(x)[..., self._segments], axis=-1)
+        if out is None:
+            return indices.astype(self.dtype)
+        out[...] = indices
+        return out
+
+    def packed_dtype(self):
+        return np.dtype((self.dtype, self.nvec.shape))
 
     def sample(self, bs=None):
         bdim = () if bs is None else (bs,)
         return (self.np_random.random_sample(bdim + self.nvec.shape) * self.nvec).astype(self.dtype)
 
+    def contains_batch(self, x):
+        x, batch_shape = _split_batch(x, self.nvec.shape)
+        if batch_shape is None or x.dtype.kind not in 'iu':
+            return np.zeros(x.shape[:1], dtype=bool)
+        return np.all((x >= 0) & (x < self.nvec), axis=-1)
+
 
 class Text(MineRLSpace):
     """
@@ -476,26 +712,41 @@ class Text(MineRLSpace):
 
     MAX_STR_LEN = 100
 
+    # Texts are packed as fixed length unicode strings, long enough for any chat message.
+    PACKED_STR_LEN = 256
+
     def __init__(self, shape):
         super().__init__(shape, np.unicode_)
 
-    def sample(self):
-        total_strings = np.prod(self.shape)
-        strings = [
-            "".join([random.choice(string.ascii_lowercase) for _ in range(random.randint(0, Text.MAX_STR_LEN))])
-            for _ in range(total_strings)
-        ]
-        return np.array(np.reshape(strings, self.shape), np.dtype)
+    def sample(self, bs=None):
+        """Samples random lowercase strings of up to MAX_STR_LEN characters, of shape self.shape."""
+        bdim = () if bs is None else (bs,)
+        shape = bdim + tuple(self.shape)
+        total_strings = int(np.prod(shape))
+        # Build the strings as UCS4 code points; the zeros after every string's length terminate it.
+        codes = self.np_random.randint(ord('a'), ord('z') + 1, size=(total_strings, Text.MAX_STR_LEN))
+        lengths = self.np_random.randint(0, Text.MAX_STR_LEN + 1, size=(total_strings, 1))
+        codes[np.arange(Text.MAX_STR_LEN) >= lengths] = 0
+        strings = codes.astype(np.uint32).view('U{}'.format(Text.MAX_STR_LEN))
+        return strings.reshape(shape)
 
     def contains(self, x):
         contained = False  # ? TODO (R): Look back in git.
-        contained = contained or isinstance(x, np.ndarray) and x.shape == self.shape and x.dtype.type in [np.string_,
-                                                                                                          np.unicode]
-        contained = contained or self.shape in [None, 1] and isinstance(x, str)
+        contained = contained or isinstance(x, np.ndarray) and x.shape == self.shape and x.dtype.kind in 'US'
+        contained = contained or np.prod(self.shape) == 1 and isinstance(x, str)
         return contained
 
     __contains__ = contains
 
+    def contains_batch(self, x):
+        x, batch_shape = _split_batch(x, self.shape)
+        if batch_shape is None or x.dtype.kind not in 'US':
+            # Single strings stand for texts of shape [1].
+            if np.prod(self.shape) == 1 and x.dtype.kind in 'US':
+                return np.ones(x.shape, dtype=bool)
+            return np.zeros(x.shape[:1], dtype=bool)
+        return np.ones(batch_shape, dtype=bool)
+
     def to_jsonable(self, sample_n):
         return np.array(sample_n, dtype=self.dtype).to_list()
 
@@ -505,6 +756,21 @@ class Text(MineRLSpace):
     def __repr__(self):
         return "Text" + str(self.shape)
 
+    def packed_dtype(self):
+        return np.dtype(('U{}'.format(Text.PACKED_STR_LEN), tuple(self.shape)))
+
+    def _pack_into(self, out, x):
+        x = np.asarray(x, dtype=str)
+        if x.size and np.max(np.char.str_len(x)) > Text.PACKED_STR_LEN:
+            raise ValueError("Texts longer than {} characters cannot be packed".format(Text.PACKED_STR_LEN))
+        if x.shape != out.shape and x.size == out.size:
+            # Single strings stand for texts of shape [1], e.g. the no-op "".
+            x = x.reshape(out.shape)
+        out[...] = x
+
+    def _unpack(self, value):
+        return value
+
     def is_flattenable(self):
         return False
 
@@ -533,6 +799,9 @@ class DiscreteRange(Discrete):
 
     __contains__ = contains
 
+    def contains_batch(self, x):
+        return super().contains_batch(np.asarray(x) - self.begin)
+
     def no_op(self, batch_shape=()):
         if len(batch_shape) == 0:
             return self.begin
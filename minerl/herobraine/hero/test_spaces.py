@@ -154,3 +154,202 @@ def test_all_flat_map_nested_dict():
     })
     x = all_spaces.sample()
     assert_equal_recursive(all_spaces.unmap(all_spaces.flat_map(x)), x)
+
+
+def test_enum_getitem():
+    e = Enum('none', 'dirt', 'stone', 'air')
+    assert e['none'] == 2 and isinstance(e['none'], int)
+    assert e[np.str_('air')] == 0
+    batch = np.array([['stone', 'dirt'], ['air', 'stone']])
+    assert np.array_equal(e[batch], [[3, 1], [0, 3]])
+    assert np.array_equal(e[['stone', 'dirt']], [3, 1])
+    assert np.array_equal(e[np.array(['stone', 'dirt'], dtype=object)], [3, 1])
+
+    # Indices are passed through.
+    assert e[1] == 1 and e[np.int64(3)] == 3
+    assert np.array_equal(e[np.array([3, 0])], [3, 0])
+
+    for invalid in ['gold', np.array(['dirt', 'gold']), np.array(['zzz']), 4, -1, np.array([0, 4])]:
+        try:
+            e[invalid]
+        except ValueError:
+            continue
+        assert False, invalid
+
+
+def test_enum_batched_flat_map_of_indices():
+    e = Enum('a', 'b', 'c')
+    strings = np.array([['c', 'a'], ['b', 'b']])
+    assert np.array_equal(e.flat_map(strings), e.flat_map(e[strings]))
+    assert np.array_equal(e.unmap(e.flat_map(strings)), strings)
+    assert 'b' in e and 'd' not in e
+
+
+def test_dict_flat_map_into_buffer():
+    d = Dict({
+        'a': Box(low=-2, high=2, shape=[3], dtype=np.float32),
+        'b': Discrete(4),
+        'c': Enum('x', 'y'),
+        'nested': Dict({'d': MultiDiscrete([2, 3]), 'e': Box(low=0, high=10, shape=[], dtype=np.float32)}),
+    })
+    assert [(f.key, f.start, f.stop) for f in d.flat_layout] == [('a', 0, 3), ('b', 3, 7), ('c', 7, 9),
+                                                                  ('nested', 9, 15)]
+    batch = (4, 2)
+    x = collections.OrderedDict([
+        ('a', np.random.uniform(-2, 2, size=batch + (3,)).astype(np.float32)),
+        ('b', np.random.randint(4, size=batch)),
+        ('c', np.random.choice(['x', 'y'], size=batch)),
+        ('nested', collections.OrderedDict([
+            ('d', np.stack([np.random.randint(2, size=batch), np.random.randint(3, size=batch)], axis=-1)),
+            ('e', np.random.uniform(0, 10, size=batch).astype(np.float32))])),
+    ])
+    expected = np.concatenate([d.spaces[k].flat_map(x[k]) for k in ['a', 'b', 'c', 'nested']], axis=-1)
+
+    out = np.zeros(batch + d.flattened.shape)
+    assert d.flat_map(x, out=out) is out
+    assert np.allclose(out, expected)
+    unmapped = d.unmap(out)
+    assert_equal_recursive(unmapped, x, atol=1e-5, ignore=['c'])
+    assert np.array_equal(unmapped['c'], x['c'])
+
+    # Missing keys are flattened as no-ops.
+    partial = d.flat_map(collections.OrderedDict([('b', 2)]))
+    assert partial.shape == d.flattened.shape
+    assert np.allclose(partial[7:9], d.spaces['c'].flat_map('x'))
+
+
+def _packable_dict():
+    from minerl.herobraine.hero.spaces import DiscreteRange, Text
+    return Dict({
+        'pov': Box(low=0, high=255, shape=[4, 4, 3], dtype=np.uint8),
+        'life': Box(low=0, high=20, shape=[], dtype=np.float32),
+        'key': Discrete(2),
+        'slot': DiscreteRange(-1, 9),
+        'item': Enum('none', 'dirt', 'stone'),
+        'buttons': MultiDiscrete([3, 4]),
+        'chat': Text([1]),
+        'stats': Dict({'kills': Box(low=0, high=100, shape=[], dtype=np.int64)}),
+    })
+
+
+def test_pack_unpack_round_trip():
+    d = _packable_dict()
+    x = d.no_op()
+    x['pov'] = np.random.randint(0, 256, size=(4, 4, 3), dtype=np.uint8)
+    x['life'] = np.array(17.5, dtype=np.float32)
+    x.update(key=1, slot=-1, item='stone', buttons=np.array([2, 3]), chat=np.array(['/kill @e']))
+    x['stats']['kills'] = np.array(3)
+
+    record = d.pack(x)
+    assert record.dtype == d.packed_dtype() and record.shape == ()
+    assert record.dtype['item'] == np.uint8
+    unpacked = d.unpack(record)
+    assert unpacked['item'] == 'stone' and unpacked['chat'].tolist() == ['/kill @e']
+    assert unpacked['key'] == 1 and unpacked['slot'] == -1
+    assert_equal_recursive(unpacked, x, ignore=['item', 'chat'])
+
+
+def test_pack_action_space_samples():
+    from minerl.herobraine.env_specs.human_survival_specs import HumanSurvival
+    space = HumanSurvival().action_space
+    space.seed(0)
+    samples = [space.sample() for _ in range(6)]
+
+    for x in samples:
+        unpacked = space.unpack(space.pack(x))
+        assert unpacked in space and unpacked['chat'].shape == (1,)
+        assert_equal_recursive(unpacked, x, ignore=['chat'])
+        assert unpacked['chat'].tolist() == x['chat'].tolist()
+
+    records = space.pack_many(samples)
+    assert records.shape == (6,) and records['chat'].shape == (6, 1)
+    batch = space.unpack(records)
+    assert space.contains_batch(batch).all()
+    assert batch['chat'].tolist() == [x['chat'].tolist() for x in samples]
+
+    # Batched samples pack the same, and the no-op's chat ("") packs as a text of shape [1].
+    batch = space.sample(5)
+    assert np.array_equal(space.unpack(space.pack_many(batch))['chat'], batch['chat'])
+    assert space.unpack(space.pack(space.no_op()))['chat'].tolist() == ['']
+
+
+def test_pack_many_into_preallocated_buffer():
+    d = _packable_dict()
+    samples = []
+    for i in range(5):
+        x = d.no_op()
+        x.update(key=i % 2, slot=i, item=['none', 'dirt', 'stone'][i % 3], chat=str(i))
+        x['stats']['kills'] = np.array(i)
+        samples.append(x)
+
+    out = np.zeros(8, dtype=d.packed_dtype())
+    assert d.pack_many(samples, out=out[2:7]).base is out
+    assert list(out['slot']) == [0, 0, 0, 1, 2, 3, 4, 0]
+
+    batch = d.unpack(out[2:7])
+    assert list(batch['item']) == ['none', 'dirt', 'stone', 'none', 'dirt']
+    assert list(batch['stats']['kills']) == list(range(5))
+
+    # Batched values pack the same as sequences of them.
+    assert np.array_equal(d.pack_many(batch), out[2:7])
+
+
+def test_batched_sample_and_contains():
+    d = _packable_dict()
+    d.seed(0)
+    batch = d.sample(32)
+    assert batch['pov'].shape == (32, 4, 4, 3) and batch['chat'].shape == (32, 1)
+    assert batch['item'].shape == (32,) and batch['buttons'].shape == (32, 2)
+    assert d.contains_batch(batch).tolist() == [True] * 32
+    assert d.sample() in d
+
+    batch['slot'][3] = 9
+    batch['item'][5] = 'gold'
+    batch['buttons'][7, 1] = 4
+    batch['stats']['kills'][9] = -1
+    assert np.flatnonzero(~d.contains_batch(batch)).tolist() == [3, 5, 7, 9]
+
+
+def test_text_sample_is_seeded():
+    from minerl.herobraine.hero.spaces import Text
+    t = Text([1])
+    t.seed(1)
+    first = t.sample(8)
+    t.seed(1)
+    assert np.array_equal(first, t.sample(8))
+    assert all(len(s) <= Text.MAX_STR_LEN and s.islower() or s == '' for s in first.ravel())
+
+
+def test_int_box_with_infinite_bounds():
+    b = Box(low=0, high=np.inf, shape=(), dtype=int)
+    assert b.high == np.iinfo(int).max
+    assert np.array(12345) in b and np.array(-1) not in b
+    assert np.all(b.sample(100) >= 0)
+    assert b.contains_batch(np.array([0, 5, -3])).tolist() == [True, True, False]
+    assert b.bounded_below and not b.bounded_above
+
+    # Scalar and array bounds give the same box.
+    scalar = Box(low=-np.inf, high=7, shape=(2,), dtype=np.int32)
+    array = Box(low=np.array([-np.inf, -np.inf]), high=np.array([7.0, 7.0]), dtype=np.int32)
+    for attr in ('low', 'high', 'bounded_below', 'bounded_above'):
+        assert np.array_equal(getattr(scalar, attr), getattr(array, attr))
+    assert not scalar.bounded_below.any() and scalar.bounded_above.all()
+
+
+def test_multidiscrete_one_hot_matches_per_component():
+    md = MultiDiscrete([3, 1, 5, 2])
+    x = md.sample(64).reshape(8, 8, 4)
+    flat = md.flat_map(x)
+    expected = np.concatenate([np.eye(n, dtype=np.float32)[x[..., i]] for i, n in enumerate(md.nvec)], axis=-1)
+    assert flat.shape == (8, 8, 11) and np.array_equal(flat, expected)
+
+    out = np.full((8, 8, 11), 7, dtype=np.float32)
+    assert md.flat_map(x, out=out) is out and np.array_equal(out, expected)
+
+    # Ties resolve to the first maximum, as np.argmax does.
+    logits = np.random.randn(8, 8, 11)
+    logits[0, 0, :3] = 1
+    expected = np.stack([np.argmax(logits[..., o:o + n], axis=-1) for o, n in zip(md.offsets, md.nvec)], axis=-1)
+    assert np.array_equal(md.unmap(logits), expected)
+    idx = np.zeros((8, 8, 4), dtype=np.int64)
+    assert md.unmap(logits, out=idx) is idx and np.array_equal(idx, expected)
@@ -3,3 +3,4 @@
 
 import minerl.utils.test
 import minerl.utils.process_watcher
+import minerl.utils.process_supervisor
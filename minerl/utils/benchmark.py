@@ -0,0 +1,344 @@
+"""Benchmarks for the Python side hot paths of MineRL.
+
+Every benchmark times a single operation (one message, one observation, one step, ...) and reports the
+best time per operation over a few repeats. Results can be saved as a baseline and later runs compared
+against it, failing when an operation got slower than a threshold allows::
+
+    python scripts/run_benchmarks.py --save baseline.json
+    ...
+    python scripts/run_benchmarks.py --compare baseline.json --threshold 0.2
+
+Baselines depend on the machine they were recorded on, so compare runs on the same machine only.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Benchmark = collections.namedtuple('Benchmark', ['name', 'setup'])
+
+BENCHMARKS = []  # type: List[Benchmark]
+
+
+def benchmark(name):
+    """Registers a benchmark.
+
+    The decorated function sets the benchmark up and returns the operation to time, a function without
+    arguments.
+    """
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+    return decorator
+
+
+def time_operation(op: Callable[[], None], repeat: int = 5, min_time: float = 0.2) -> float:
+    """Gets the best time in seconds per call of op over repeat runs of at least min_time seconds."""
+    op()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * min_time / 10 / max(elapsed, 1e-9)))
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run(pattern: str = None, repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Runs the benchmarks whose names match the pattern and gets their seconds per operation."""
+    results = collections.OrderedDict()
+    for bench in BENCHMARKS:
+        if pattern and not re.search(pattern, bench.name):
+            continue
+        op = bench.setup()
+        results[bench.name] = time_operation(op, repeat=repeat, min_time=min_time)
+        logger.debug("{:<50} {}".format(bench.name, format_time(results[bench.name])))
+    return results
+
+
+def compare(baseline: Dict[str, float], results: Dict[str, float], threshold: float) -> List[str]:
+    """Gets the names of the benchmarks which are more than threshold (a fraction) slower than the baseline."""
+    return [name for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return "{:.3f} {}".format(seconds / scale, unit)
+    return "{:.1f} ns".format(seconds / 1e-9)
+
+
+###########################
+##### BENCHMARKS ##########
+###########################
+def _specs():
+    from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
+    from minerl.herobraine.env_specs.navigate_specs import Navigate
+    from minerl.herobraine.env_specs.obtain_specs import ObtainDiamondShovelEnvSpec
+    return [Navigate(dense=False, extreme=False), PunchCowEnvSpec(), ObtainDiamondShovelEnvSpec()]
+
+
+def _framing(size):
+    def setup():
+        from minerl.env import comms
+        ours, theirs = socket.socketpair()
+        message = b'x' * size
+
+        # Echo every message back so both directions of the framing are exercised.
+        def echo():
+            while True:
+                msg = comms.recv_message(theirs)
+                if msg is None:
+                    return
+                comms.send_message(theirs, msg)
+        threading.Thread(target=echo, daemon=True).start()
+
+        def op():
+            comms.send_message(ours, message)
+            comms.recv_message(ours)
+        return op
+    return setup
+
+
+benchmark('comms.framing[64B]')(_framing(64))
+benchmark('comms.framing[64KiB]')(_framing(64 * 1024))
+benchmark('comms.framing[POV 640x360]')(_framing(640 * 360 * 3))
+
+
+def _env_benchmarks():
+    from minerl.env.payloads import HeroPayloadGenerator
+
+    for spec in _specs():
+        def process_observation(spec=spec):
+            env = spec.make(fake=True).unwrapped
+            generator = HeroPayloadGenerator.from_env_spec(env.task)
+            frame = None
+            if generator.pov_handler is not None:
+                frame = np.random.randint(0, 256, size=generator.pov_handler.raw_shape, dtype=np.uint8)
+            pov, info = generator.encode(generator.no_op(frame))
+            agent = env.task.agent_names[0]
+            return lambda: env._process_observation(agent, pov, info)
+
+        def process_action(spec=spec):
+            env = spec.make(fake=True).unwrapped
+            action = env.task.action_space.no_op()
+            agent = env.task.agent_names[0]
+            return lambda: env._process_action(agent, action)
+
+        def to_xml(spec=spec):
+            return spec.to_xml
+
+        benchmark('_process_observation[{}]'.format(spec.name))(process_observation)
+        benchmark('_process_action[{}]'.format(spec.name))(process_action)
+        benchmark('EnvSpec.to_xml[{}]'.format(spec.name))(to_xml)
+
+
+_env_benchmarks()
+
+
+@benchmark('Dict.flat_map')
+def _flat_map():
+    from minerl.herobraine.env_specs.navigate_specs import Navigate
+    space = Navigate(dense=False, extreme=False).action_space
+    x = space.no_op()
+    return lambda: space.flat_map(x)
+
+
+@benchmark('Dict.unmap')
+def _unmap():
+    from minerl.herobraine.env_specs.navigate_specs import Navigate
+    space = Navigate(dense=False, extreme=False).action_space
+    x = space.flat_map(space.no_op())
+    return lambda: space.unmap(x)
+
+
+@benchmark('Enum.__getitem__[str]')
+def _enum_getitem():
+    from minerl.herobraine.hero import mc, spaces
+    space = spaces.Enum(*mc.ALL_ITEMS)
+    item = mc.ALL_ITEMS[len(mc.ALL_ITEMS) // 2]
+    return lambda: space[item]
+
+
+@benchmark('Enum.__getitem__[array of 1024]')
+def _enum_getitem_array():
+    from minerl.herobraine.hero import mc, spaces
+    space = spaces.Enum(*mc.ALL_ITEMS)
+    items = np.random.RandomState(0).choice(mc.ALL_ITEMS, size=1024)
+    return lambda: space[items]
+
+
+@benchmark('FlatInventoryObservation.from_hero')
+def _inventory_from_hero():
+    from minerl.herobraine.hero import handlers, mc
+    handler = handlers.FlatInventoryObservation(mc.ALL_ITEMS)
+    rng = np.random.RandomState(0)
+    info = {'inventory': [{'type': item, 'quantity': int(rng.randint(1, 64))}
+                          for item in rng.choice(mc.ALL_ITEMS, size=36)]}
+    return lambda: handler.from_hero(info)
+
+
+def _pov_from_hero(**pipeline):
+    def setup():
+        from minerl.herobraine.hero import handlers
+        handler = handlers.POVObservation((640, 360), **pipeline)
+        frame = np.random.RandomState(0).randint(0, 256, size=handler.raw_shape, dtype=np.uint8)
+        info = {'pov': frame.tobytes()}
+        return lambda: handler.from_hero(info)
+    return setup
+
+
+benchmark('POVObservation.from_hero[640x360]')(_pov_from_hero())
+benchmark('POVObservation.from_hero[640x360 -> 64x64]')(_pov_from_hero(resize=(64, 64)))
+benchmark('POVObservation.from_hero[640x360 -> 64x64 gray CHW]')(
+    _pov_from_hero(resize=(64, 64), grayscale=True, channels_first=True))
+
+
+@benchmark('ObserveFromFullStats(None).from_hero')
+def _full_stats_from_hero():
+    from minerl.herobraine.hero import handlers, mc
+    handler = handlers.ObserveFromFullStats(None)
+    rng = np.random.RandomState(0)
+    info = {}
+    for i in rng.choice(len(mc.ALL_STAT_KEYS), size=200, replace=False):
+        category, stat = mc.ALL_STAT_KEYS[i]
+        info.setdefault(category, {})[stat] = int(rng.randint(1, 100))
+    return lambda: handler.from_hero(info)
+
+
+def _equipment_from_hero(per_slot):
+    def setup():
+        from minerl.env.payloads import load_recorded_info
+        from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
+        from minerl.herobraine.hero.handlers.translation import TranslationHandlerGroup
+        spec = PunchCowEnvSpec(observe_pov=False)
+        handler = next(h for h in spec.observables if h.to_string() == 'equipped_items')
+        # The info as a Malmo instance sent it.
+        info = load_recorded_info()
+        del info['pov']
+        if per_slot:
+            return lambda: TranslationHandlerGroup.from_hero(handler, info)
+        return lambda: handler.from_hero(info)
+    return setup
+
+
+benchmark('EquippedItemObservation.from_hero[armor]')(_equipment_from_hero(per_slot=False))
+benchmark('EquippedItemObservation.from_hero[armor, per slot handlers]')(_equipment_from_hero(per_slot=True))
+
+
+@benchmark('NearbyEntitiesObservation.from_hero')
+def _nearby_entities_from_hero():
+    from minerl.herobraine.hero import handlers
+    handler = handlers.NearbyEntitiesObservation()
+    rng = np.random.RandomState(0)
+    info = {'xpos': 0.0, 'ypos': 64.0, 'zpos': 0.0, 'nearby_entities': [
+        {'name': name, 'x': float(x), 'y': 64.0 + float(y), 'z': float(z), 'yaw': float(yaw), 'life': 20.0}
+        for name, x, y, z, yaw in zip(rng.choice(['Zombie', 'Skeleton', 'Cow', 'Pig'], size=16),
+                                      *rng.uniform(-8, 8, size=(4, 16)) * [[2], [1], [2], [45]])]}
+    return lambda: handler.from_hero(info)
+
+
+@benchmark('RewardEngine.step[combat]')
+def _reward_step():
+    from minerl.env.rewards import RewardEngine
+    from minerl.herobraine.env_specs.combat_specs import COMBAT_REWARDS, PunchCowEnvSpec
+    engine = RewardEngine(**COMBAT_REWARDS)
+    obs = PunchCowEnvSpec().observation_space.no_op()
+    engine.reset()
+    return lambda: engine.step(obs, False)
+
+
+@benchmark('RewardEngine.relabel[combat, 1000 steps x 16 envs]')
+def _reward_relabel():
+    from minerl.env.rewards import RewardEngine
+    from minerl.herobraine.env_specs.combat_specs import COMBAT_REWARDS
+    engine = RewardEngine(**COMBAT_REWARDS)
+    rng = np.random.RandomState(0)
+    stats = np.cumsum(rng.randint(0, 3, size=(1000, 16, len(engine.stats))), axis=0)
+    return lambda: engine.relabel(stats)
+
+
+@benchmark('fake MineRLPunchCow-v0 step')
+def _fake_combat_step():
+    import gym
+    import minerl  # noqa: F401
+    from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
+    env = gym.make(PunchCowEnvSpec().name, fake=True)
+    env.reset()
+    action = env.action_space.no_op()
+
+    def op():
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    return op
+
+
+@benchmark('import minerl')
+def _import_time():
+    # Includes the startup of the interpreter, which is the same for all versions of MineRL.
+    return lambda: subprocess.check_call([sys.executable, '-c', 'import minerl'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Python side hot paths of MineRL.")
+    parser.add_argument('pattern', nargs='?', default=None, help="Only run benchmarks matching this regex.")
+    parser.add_argument('--save', metavar='PATH', help="Save the results as a baseline.")
+    parser.add_argument('--compare', metavar='PATH', help="Compare the results against a saved baseline.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="The fraction by which a benchmark may be slower than its baseline.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min_time', type=float, default=0.2, help="The minimum seconds of every repeat.")
+    parser.add_argument('--list', action='store_true', help="List the benchmarks and exit.")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for bench in BENCHMARKS:
+            print(bench.name)
+        return 0
+
+    results = run(args.pattern, repeat=args.repeat, min_time=args.min_time)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    for name, seconds in results.items():
+        line = "{:<50} {:>12}".format(name, format_time(seconds))
+        if name in baseline:
+            line += "  {:+.1%}".format(seconds / baseline[name] - 1)
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = compare(baseline, results, args.threshold)
+    for name in regressions:
+        print("REGRESSION: {} is {:.1%} slower than its baseline of {}".format(
+            name, results[name] / baseline[name] - 1, format_time(baseline[name])))
+    return 1 if regressions else 0
@@ -0,0 +1,220 @@
+"""Measures how environment throughput scales with the number of environments and worker processes.
+
+For every combination of environment count M and process count P, M environments are spread over P worker
+processes, each of which steps its environments in turn for a fixed duration. The steps and resets per
+second and the p50/p99 step latencies are written as CSV::
+
+    python -m minerl.utils.loadtest --mode standin --envs 1,4,16 --processes 1,2,4 --output scaling.csv
+
+Modes:
+    fake: fake environments, which measure the Python side of MineRL alone.
+    standin: environments connected to local stand-in MalmoEnv servers (see ``minerl.env.local_server``),
+        which add the socket protocol and a simulated tick latency.
+    real: environments with real Minecraft instances.
+"""
+
+import argparse
+import csv
+import importlib
+import logging
+import multiprocessing
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from minerl.herobraine.hero import spaces
+
+logger = logging.getLogger(__name__)
+
+MODES = ('fake', 'standin', 'real')
+
+FIELDS = ['env', 'mode', 'policy', 'envs', 'processes', 'seconds', 'steps', 'resets', 'steps_per_sec',
+          'resets_per_sec', 'p50_step_ms', 'p99_step_ms']
+
+
+###########################
+##### POLICIES ############
+###########################
+def random_policy(action_space, rng: np.random.RandomState) -> Callable[[Any], Dict[str, Any]]:
+    """Uniformly random actions, without chat messages or ESC (which would end BASALT episodes)."""
+    keys = [k for k, space in action_space.spaces.items()
+            if k not in ('chat', 'ESC') and hasattr(space, 'n')]
+
+    def policy(obs):
+        action = action_space.no_op()
+        for k in keys:
+            space = action_space.spaces[k]
+            i = rng.randint(space.n)
+            # Enum actions are their values, e.g. the item to place, not indices.
+            action[k] = space.values[i] if isinstance(space, spaces.Enum) else i
+        if 'camera' in action:
+            action['camera'] = rng.uniform(-10, 10, size=2).astype(np.float32)
+        return action
+    return policy
+
+
+def combat_policy(action_space, rng: np.random.RandomState) -> Callable[[Any], Dict[str, Any]]:
+    """Walks forward attacking while slowly looking around, as an agent fighting a mob would."""
+    def policy(obs):
+        action = action_space.no_op()
+        action['forward'] = 1
+        action['attack'] = 1
+        action['camera'] = np.array([rng.normal(0, 2), rng.normal(0, 5)], dtype=np.float32)
+        return action
+    return policy
+
+
+POLICIES = {
+    'random': random_policy,
+    'combat': combat_policy,
+}
+
+
+def get_policy(name):
+    """Gets a policy by its name or as ``module:function`` for scripted ones.
+
+    A policy is created from the action space and a random state and maps observations to actions.
+    """
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+
+###########################
+##### WORKERS #############
+###########################
+def _make_env(env_id, mode, servers, tick_latency, episode_length, seed):
+    import gym
+    import minerl  # noqa: F401
+    kwargs = {}
+    if mode == 'fake':
+        kwargs.update(fake=True, fake_episode_length=episode_length)
+    elif mode == 'standin':
+        from minerl.env.local_server import LocalMalmoServer
+        from minerl.env.malmo import InstanceManager
+        from minerl.herobraine.env_specs.combat_specs import resolve_env_spec
+        spec = resolve_env_spec(**gym.spec(env_id)._kwargs)
+        server = LocalMalmoServer(spec, tick_latency=tick_latency, episode_length=episode_length, seed=seed)
+        servers.append(server.start())
+        kwargs['instances'] = [InstanceManager.add_existing_instance(server.port)]
+    return gym.make(env_id, **kwargs)
+
+
+def _worker(index, num_envs, args, barrier, results):
+    servers = []
+    envs = []
+    try:
+        rng = np.random.RandomState(args.seed + index)
+        for i in range(num_envs):
+            envs.append(_make_env(args.env, args.mode, servers, args.tick_latency, args.episode_length,
+                                  args.seed + index * 1000 + i))
+        policies = [get_policy(args.policy)(env.action_space, rng) for env in envs]
+        obs = [env.reset() for env in envs]
+
+        barrier.wait()
+        latencies, resets = [], 0
+        start = time.perf_counter()
+        deadline = start + args.duration
+        while time.perf_counter() < deadline:
+            for i, env in enumerate(envs):
+                action = policies[i](obs[i])
+                step_start = time.perf_counter()
+                obs[i], _, done, _ = env.step(action)
+                latencies.append(time.perf_counter() - step_start)
+                if done:
+                    obs[i] = env.reset()
+                    resets += 1
+        results.put((index, time.perf_counter() - start, latencies, resets, None))
+    except Exception as e:
+        logger.exception("Load test worker {} failed".format(index))
+        barrier.abort()
+        results.put((index, 0, [], 0, repr(e)))
+    finally:
+        for env in envs:
+            env.close()
+        for server in servers:
+            server.stop()
+
+
+def measure(args, num_envs: int, num_processes: int) -> Dict[str, Any]:
+    """Runs num_envs environments in num_processes workers for args.duration seconds."""
+    ctx = multiprocessing.get_context('spawn')
+    shares = [len(s) for s in np.array_split(np.arange(num_envs), num_processes) if len(s)]
+    barrier = ctx.Barrier(len(shares))
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(i, share, args, barrier, results), daemon=True)
+               for i, share in enumerate(shares)]
+    for w in workers:
+        w.start()
+
+    seconds, latencies, resets, errors = 0.0, [], 0, []
+    for _ in workers:
+        _, elapsed, lat, res, error = results.get()
+        if error is not None:
+            errors.append(error)
+        seconds = max(seconds, elapsed)
+        latencies.extend(lat)
+        resets += res
+    for w in workers:
+        w.join()
+    if errors:
+        raise RuntimeError("Load test workers failed: {}".format(', '.join(errors)))
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'env': args.env,
+        'mode': args.mode,
+        'policy': args.policy,
+        'envs': num_envs,
+        'processes': len(workers),
+        'seconds': round(seconds, 3),
+        'steps': len(latencies),
+        'resets': resets,
+        'steps_per_sec': round(len(latencies) / seconds, 2) if seconds else 0.0,
+        'resets_per_sec': round(resets / seconds, 3) if seconds else 0.0,
+        'p50_step_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else float('nan'),
+        'p99_step_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else float('nan'),
+    }
+
+
+def _int_list(s):
+    return [int(x) for x in s.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures how environment throughput scales.")
+    parser.add_argument('--env', default='MineRLPunchCow-v0', help="The environment id.")
+    parser.add_argument('--mode', choices=MODES, default='fake')
+    parser.add_argument('--envs', type=_int_list, default=[1], help="Comma separated environment counts.")
+    parser.add_argument('--processes', type=_int_list, default=[1], help="Comma separated process counts.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to step every configuration.")
+    parser.add_argument('--policy', default='random',
+                        help="'random', 'combat' or a scripted policy as module:function.")
+    parser.add_argument('--tick_latency', type=float, default=0.0,
+                        help="Seconds every step of a stand-in server takes.")
+    parser.add_argument('--episode_length', type=int, default=None,
+                        help="Steps after which fake and stand-in episodes end.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="The CSV file to write. Defaults to stdout.")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for num_processes in args.processes:
+            for num_envs in args.envs:
+                if num_envs < num_processes:
+                    continue
+                writer.writerow(measure(args, num_envs, num_processes))
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+# Copyright (c) 2020 All Rights Reserved
+# Author: William H. Guss, Brandon Houghton
+
+"""A single per-host supervisor for Minecraft instances.
+
+Where :mod:`minerl.utils.process_watcher` launches one watcher interpreter per
+instance, the supervisor is launched once per host (and user) and every
+``MinecraftInstance`` registers its parent/child PID pair with it through a
+local unix socket. The supervisor watches all registered processes in a single
+selector loop using pidfds where the platform supports them (falling back to
+polling otherwise), reaps the child process tree when its parent dies and
+removes the temporary directories registered with it.
+
+Note: The watched processes are not children of the supervisor, so ``waitpid``
+cannot be used on them; pidfds are the only event driven option.
+"""
+
+import argparse
+import errno
+import json
+import logging
+import os
+import selectors
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import coloredlogs
+import psutil
+
+from minerl.utils.process_watcher import reap_process_and_children
+
+logger = logging.getLogger('process_supervisor')
+
+MINERL_SUPERVISOR_SOCKET = 'MINERL_SUPERVISOR_SOCKET'
+POLL_INTERVAL = 0.1
+IDLE_TIMEOUT = 60
+STARTUP_TIMEOUT = 10
+REQUEST_TIMEOUT = 2
+
+
+def default_socket_path():
+    """Gets the path of the supervisor socket for the current user.
+
+    The path can be overridden with the MINERL_SUPERVISOR_SOCKET environment variable.
+    """
+    path = os.environ.get(MINERL_SUPERVISOR_SOCKET)
+    if path:
+        return path
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), 'minerl_supervisor_{}.sock'.format(uid))
+
+
+def _request(message, path=None, timeout=REQUEST_TIMEOUT):
+    """Sends a single JSON request to the supervisor and returns its reply.
+
+    Raises:
+        OSError: If the supervisor cannot be reached.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("The process supervisor requires unix domain sockets.")
+    path = path or default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(message).encode() + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("The process supervisor closed the connection.")
+            reply += chunk
+    finally:
+        sock.close()
+    return json.loads(reply.decode())
+
+
+def is_running(path=None):
+    """Checks whether a supervisor is answering on the socket."""
+    try:
+        return _request({'cmd': 'ping'}, path).get('ok', False)
+    except (OSError, ValueError):
+        return False
+
+
+def ensure_running(path=None, timeout=STARTUP_TIMEOUT):
+    """Launches the supervisor daemon unless one is already running.
+
+    Raises:
+        OSError: If the supervisor did not come up within the timeout.
+    """
+    path = path or default_socket_path()
+    if is_running(path):
+        return
+    logger.info("Launching process supervisor on {}.".format(path))
+    subprocess.check_call([sys.executable, '-m', 'minerl.utils.process_supervisor', '--socket', path])
+
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if is_running(path):
+            logger.info("Process supervisor launched successfully.")
+            return
+        time.sleep(POLL_INTERVAL)
+    raise OSError("The process supervisor did not start within {} seconds.".format(timeout))
+
+
+def register(parent_pid, child_pid, *temp_dirs, path=None):
+    """Registers a parent/child pair with the supervisor, launching it if needed.
+
+    Args:
+        parent_pid (int): The parent PID.
+        child_pid (int): The child PID which is reaped (with its children) if the parent dies.
+        temp_dirs (str): Temporary directories which are deleted along with the child.
+
+    Raises:
+        OSError: If the supervisor cannot be reached or refuses the registration.
+    """
+    path = path or default_socket_path()
+    ensure_running(path)
+    reply = _request({
+        'cmd': 'register',
+        'parent_pid': parent_pid,
+        'child_pid': child_pid,
+        'temp_dirs': list(temp_dirs)}, path)
+    if not reply.get('ok', False):
+        raise OSError("The process supervisor refused to watch {}: {}".format(child_pid, reply.get('error')))
+
+
+def unregister(child_pid, path=None):
+    """Stops watching a child, e.g. because it was shut down by its parent.
+
+    Returns:
+        bool: Whether the supervisor was reached and knew about the child.
+    """
+    try:
+        return _request({'cmd': 'unregister', 'child_pid': child_pid}, path).get('ok', False)
+    except (OSError, ValueError):
+        return False
+
+
+class _Watch(object):
+    """A registered parent/child pair."""
+
+    def __init__(self, parent, child, temp_dirs):
+        self.parent = parent
+        self.child = child
+        self.temp_dirs = temp_dirs
+        self.fds = []
+
+    def __repr__(self):
+        return "Watch[parent={}, child={}]".format(self.parent.pid, self.child.pid)
+
+
+class Supervisor(object):
+    """The supervisor event loop.
+
+    Args:
+        path (str): The unix socket path to listen on.
+        idle_timeout (float, optional): Exit once nothing has been watched for this long.
+            None means the supervisor never exits on its own.
+    """
+
+    def __init__(self, path, idle_timeout=IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.watches = {}
+        self._use_pidfd = hasattr(os, 'pidfd_open')
+        self._selector = selectors.DefaultSelector()
+        self._buffers = {}
+        self._should_stop = False
+        self._listener = self._bind(path)
+        self._selector.register(self._listener, selectors.EVENT_READ, self._accept)
+
+    @staticmethod
+    def _bind(path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE:
+                raise
+            if is_running(path):
+                sock.close()
+                raise RuntimeError("A process supervisor is already running on {}.".format(path))
+            # A stale socket left behind by a supervisor that was killed.
+            os.unlink(path)
+            sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen(64)
+        sock.setblocking(False)
+        return sock
+
+    def serve_forever(self):
+        logger.info("Process supervisor serving on {} (pidfd={}).".format(self.path, self._use_pidfd))
+        idle_since = time.time()
+        try:
+            while not self._should_stop:
+                for key, _ in self._selector.select(timeout=POLL_INTERVAL):
+                    key.data(key.fileobj)
+
+                if not self._use_pidfd:
+                    self._poll_watches()
+
+                if self.watches or len(self._buffers) > 0:
+                    idle_since = time.time()
+                elif self.idle_timeout is not None and time.time() - idle_since > self.idle_timeout:
+                    logger.info("Nothing to watch for {} seconds; exiting.".format(self.idle_timeout))
+                    break
+        finally:
+            self.close()
+
+    def shutdown(self):
+        self._should_stop = True
+
+    def close(self):
+        for conn in list(self._buffers):
+            self._disconnect(conn)
+        for watch in list(self.watches.values()):
+            self._forget(watch)
+        try:
+            self._selector.unregister(self._listener)
+        except (KeyError, ValueError):
+            pass
+        self._listener.close()
+        self._selector.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    ###########################
+    ##### CONNECTIONS #########
+    ###########################
+    def _accept(self, listener):
+        try:
+            conn, _ = listener.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._buffers[conn] = b''
+        self._selector.register(conn, selectors.EVENT_READ, self._read)
+
+    def _read(self, conn):
+        try:
+            data = conn.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._disconnect(conn)
+            return
+
+        self._buffers[conn] += data
+        while b'\n' in self._buffers[conn]:
+            line, self._buffers[conn] = self._buffers[conn].split(b'\n', 1)
+            try:
+                reply = self._handle(json.loads(line.decode()))
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'ok': False, 'error': str(e)}
+            try:
+                conn.setblocking(True)
+                conn.sendall(json.dumps(reply).encode() + b'\n')
+                conn.setblocking(False)
+            except OSError:
+                self._disconnect(conn)
+                return
+
+    def _disconnect(self, conn):
+        self._buffers.pop(conn, None)
+        try:
+            self._selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def _handle(self, message):
+        cmd = message['cmd']
+        if cmd == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        elif cmd == 'register':
+            return self._register(int(message['parent_pid']), int(message['child_pid']),
+                                  list(message.get('temp_dirs', [])))
+        elif cmd == 'unregister':
+            watch = self.watches.get(int(message['child_pid']))
+            if watch is not None:
+                self._forget(watch)
+            return {'ok': watch is not None}
+        elif cmd == 'status':
+            return {'ok': True, 'watches': [[w.parent.pid, w.child.pid] for w in self.watches.values()]}
+        else:
+            return {'ok': False, 'error': "Unknown command {}".format(cmd)}
+
+    ###########################
+    ##### WATCHING ############
+    ###########################
+    def _register(self, parent_pid, child_pid, temp_dirs):
+        try:
+            parent = psutil.Process(parent_pid)
+            child = psutil.Process(child_pid)
+        except psutil.NoSuchProcess as e:
+            return {'ok': False, 'error': str(e)}
+
+        old = self.watches.get(child_pid)
+        if old is not None:
+            self._forget(old)
+
+        watch = _Watch(parent, child, temp_dirs)
+        self.watches[child_pid] = watch
+        logger.info("Watching {}.".format(watch))
+
+        if self._use_pidfd:
+            for proc, callback in [(parent, self._on_parent_exit), (child, self._on_child_exit)]:
+                try:
+                    fd = os.pidfd_open(proc.pid)
+                except ProcessLookupError:
+                    callback(watch)
+                    break
+                watch.fds.append(fd)
+                self._selector.register(fd, selectors.EVENT_READ, lambda _, w=watch, cb=callback: cb(w))
+        return {'ok': True}
+
+    def _poll_watches(self):
+        for watch in list(self.watches.values()):
+            if not watch.parent.is_running():
+                self._on_parent_exit(watch)
+            elif not watch.child.is_running():
+                self._on_child_exit(watch)
+
+    def _forget(self, watch):
+        if self.watches.get(watch.child.pid) is watch:
+            del self.watches[watch.child.pid]
+        for fd in watch.fds:
+            try:
+                self._selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+            os.close(fd)
+        watch.fds = []
+
+    def _on_parent_exit(self, watch):
+        if self.watches.get(watch.child.pid) is not watch:
+            return
+        logger.info("Parent of {} is not running, hence we need to terminate the child.".format(watch))
+        self._forget(watch)
+        # Reaping can take several seconds per process, so keep the event loop responsive.
+        thread = threading.Thread(target=self._reap, args=(watch,))
+        thread.daemon = True
+        thread.start()
+
+    def _on_child_exit(self, watch):
+        if self.watches.get(watch.child.pid) is not watch:
+            return
+        logger.info("Child of {} is not running anymore.".format(watch))
+        self._forget(watch)
+
+    @staticmethod
+    def _reap(watch):
+        try:
+            reap_process_and_children(watch.child)
+        except psutil.NoSuchProcess:
+            pass
+        for temp_dir in watch.temp_dirs:
+            try:
+                shutil.rmtree(temp_dir)
+            except OSError:
+                logger.warning(
+                    "Failed to delete temporary child directory {}. It may have already been removed.".format(
+                        temp_dir))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='A per-host supervisor which ensures that Minecraft instances '
+                    'terminate along with the processes which launched them.')
+    parser.add_argument('--socket', type=str, default=None,
+                        help='The unix socket to listen on.')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help='Exit after this many seconds without anything to watch.')
+    parser.add_argument('--foreground', action='store_true',
+                        help='Do not daemonize.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    socket_path = args.socket or default_socket_path()
+
+    if not args.foreground:
+        from daemoniker import daemonize
+
+        pid_file = socket_path + '.pid'
+        if os.path.isfile(pid_file) and not is_running(socket_path):
+            # Left behind by a supervisor which did not exit cleanly.
+            os.remove(pid_file)
+        daemonize(pid_file)
+
+    coloredlogs.install(level=logging.DEBUG, stream=open(socket_path + '.log', 'a'))
+
+    try:
+        supervisor = Supervisor(socket_path, idle_timeout=args.idle_timeout)
+    except RuntimeError as e:
+        logger.info(str(e))
+        exit()
+    supervisor.serve_forever()
+    exit()
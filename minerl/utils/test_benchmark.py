@@ -0,0 +1,28 @@
+import json
+
+from minerl.utils import benchmark
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    results = {'a': 1.1, 'b': 1.3, 'new': 5.0}
+    assert benchmark.compare(baseline, results, threshold=0.2) == ['b']
+
+
+def test_time_operation():
+    calls = []
+    seconds = benchmark.time_operation(lambda: calls.append(1), repeat=2, min_time=0.01)
+    assert 0 < seconds < 1e-3 and len(calls) > 2
+
+
+def test_run_and_compare(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    args = [r'^(Enum|Dict)\.', '--repeat', '1', '--min_time', '0.01']
+    assert benchmark.main(args + ['--save', str(baseline)]) == 0
+    results = json.loads(baseline.read_text())
+    assert set(results) == {'Dict.flat_map', 'Dict.unmap', 'Enum.__getitem__[str]',
+                            'Enum.__getitem__[array of 1024]'}
+
+    baseline.write_text(json.dumps({name: seconds / 100 for name, seconds in results.items()}))
+    assert benchmark.main(args + ['--compare', str(baseline)]) == 1
+    assert 'REGRESSION: Dict.flat_map' in capsys.readouterr().out
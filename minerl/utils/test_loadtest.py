@@ -0,0 +1,45 @@
+import csv
+
+import numpy as np
+
+from minerl.herobraine.env_specs.combat_specs import PunchCowEnvSpec
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.utils import loadtest
+
+
+def test_policies_produce_valid_actions():
+    space = PunchCowEnvSpec().action_space
+    rng = np.random.RandomState(0)
+    for name in ('random', 'combat'):
+        policy = loadtest.get_policy(name)(space, rng)
+        for _ in range(10):
+            action = policy(None)
+            assert set(action) == set(space.spaces)
+            assert action['chat'] == '' and action['ESC'] == 0
+            assert action in space
+
+    # Navigate places items through an Enum action.
+    space = Navigate(dense=False, extreme=False).action_space
+    policy = loadtest.random_policy(space, rng)
+    places = set()
+    for _ in range(50):
+        action = policy(None)
+        assert action in space
+        places.add(action['place'])
+    assert places == set(space.spaces['place'].values)
+
+
+def test_scripted_policy_by_name():
+    assert loadtest.get_policy('minerl.utils.loadtest:combat_policy') is loadtest.combat_policy
+
+
+def test_writes_csv_for_fake_envs(tmp_path):
+    output = tmp_path / 'scaling.csv'
+    loadtest.main(['--envs', '1,2', '--processes', '1', '--duration', '0.5', '--episode_length', '20',
+                   '--output', str(output)])
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [(r['envs'], r['processes']) for r in rows] == [('1', '1'), ('2', '1')]
+    for row in rows:
+        assert int(row['steps']) > 0 and int(row['resets']) > 0
+        assert float(row['p50_step_ms']) <= float(row['p99_step_ms'])
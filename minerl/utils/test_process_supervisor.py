@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import psutil
+import pytest
+
+from minerl.utils import process_supervisor
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="requires unix sockets")
+
+
+@pytest.fixture
+def supervisor(tmp_path):
+    path = str(tmp_path / 'supervisor.sock')
+    sup = process_supervisor.Supervisor(path, idle_timeout=None)
+    thread = threading.Thread(target=sup.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield sup
+    sup.shutdown()
+    thread.join(timeout=5)
+
+
+def _wait_for(predicate, timeout=10):
+    start = time.time()
+    while time.time() - start < timeout:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_ping(supervisor):
+    assert process_supervisor.is_running(supervisor.path)
+
+
+def test_reaps_child_when_parent_dies(supervisor, tmp_path):
+    parent = subprocess.Popen(['sleep', '60'])
+    child = subprocess.Popen(['sleep', '60'])
+    temp_dir = tmp_path / 'instance'
+    temp_dir.mkdir()
+    try:
+        process_supervisor.register(parent.pid, child.pid, str(temp_dir), path=supervisor.path)
+        assert child.pid in supervisor.watches
+
+        parent.kill()
+        parent.wait()
+
+        assert _wait_for(lambda: child.poll() is not None)
+        assert _wait_for(lambda: not temp_dir.exists())
+        assert child.pid not in supervisor.watches
+    finally:
+        for proc in [parent, child]:
+            if proc.poll() is None:
+                proc.kill()
+
+
+def test_forgets_child_which_exits(supervisor):
+    child = subprocess.Popen(['sleep', '60'])
+    try:
+        process_supervisor.register(os.getpid(), child.pid, path=supervisor.path)
+        child.kill()
+        child.wait()
+        assert _wait_for(lambda: child.pid not in supervisor.watches)
+        assert psutil.Process(os.getpid()).is_running()
+    finally:
+        if child.poll() is None:
+            child.kill()
+
+
+def test_unregister(supervisor):
+    child = subprocess.Popen(['sleep', '60'])
+    try:
+        process_supervisor.register(os.getpid(), child.pid, path=supervisor.path)
+        assert process_supervisor.unregister(child.pid, path=supervisor.path)
+        assert child.pid not in supervisor.watches
+        assert not process_supervisor.unregister(child.pid, path=supervisor.path)
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_register_dead_process_is_refused(supervisor):
+    child = subprocess.Popen(['true'])
+    child.wait()
+    with pytest.raises(OSError):
+        process_supervisor.register(os.getpid(), child.pid, path=supervisor.path)
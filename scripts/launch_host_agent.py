@@ -0,0 +1,9 @@
+import minerl
+import coloredlogs
+import logging
+
+coloredlogs.install(logging.DEBUG)
+from minerl.env.broker import launch_host_agent
+
+if __name__ == "__main__":
+    launch_host_agent()
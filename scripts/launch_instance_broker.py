@@ -0,0 +1,9 @@
+import minerl
+import coloredlogs
+import logging
+
+coloredlogs.install(logging.DEBUG)
+from minerl.env.broker import launch_instance_broker
+
+if __name__ == "__main__":
+    launch_instance_broker()